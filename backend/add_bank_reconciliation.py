@@ -3,55 +3,13 @@ add_bank_reconciliation.py - Add bank reconciliation content to Tally AI knowled
 """
 
 import json
-import requests
-from bs4 import BeautifulSoup
-import html2text
 import os
-from datetime import datetime
+
+from html_extractor import scrape_tally_url as extract_tally_url
 
 def scrape_tally_url(url):
     """Scrape content from Tally help URL"""
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Remove navigation, header, footer elements
-        for element in soup(['nav', 'header', 'footer', 'script', 'style']):
-            element.decompose()
-        
-        # Convert to markdown
-        h = html2text.HTML2Text()
-        h.ignore_links = False
-        h.ignore_images = True
-        h.ignore_emphasis = False
-        h.body_width = 0
-        
-        content = h.handle(str(soup))
-        
-        # Get title
-        title = soup.find('title')
-        if title:
-            title = title.get_text().strip()
-        else:
-            title = "Bank Reconciliation Procedures"
-            
-        return {
-            'title': title,
-            'content': content,
-            'url': url,
-            'category': 'Banking',
-            'scraped_at': datetime.now().isoformat()
-        }
-        
-    except Exception as e:
-        print(f"Error scraping {url}: {e}")
-        return None
+    return extract_tally_url(url, category="Banking", default_title="Bank Reconciliation Procedures")
 
 def add_to_knowledge_base(new_doc):
     """Add new document to existing knowledge base"""
@@ -82,12 +40,10 @@ def add_to_knowledge_base(new_doc):
 def update_vector_store():
     """Update the vector store with new content"""
     try:
-        from qa_system import TallyQASystem
-        
-        qa_system = TallyQASystem()
-        qa_system.load_documents()
-        qa_system.create_vector_store()
-        
+        from ingest_pipeline import run_pipeline
+
+        run_pipeline()
+
         print("✅ Vector store updated successfully")
         return True
         
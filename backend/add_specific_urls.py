@@ -1,57 +1,12 @@
 import json
-import requests
-from bs4 import BeautifulSoup
-import html2text
 import os
-from datetime import datetime
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_core.documents import Document
+
+from html_extractor import scrape_tally_url as extract_tally_url
+from ingest_pipeline import run_pipeline
 
 def scrape_tally_url(url):
     """Scrape content from Tally help URL"""
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Remove navigation, header, footer elements
-        for element in soup(['nav', 'header', 'footer', 'script', 'style']):
-            element.decompose()
-        
-        # Convert to markdown
-        h = html2text.HTML2Text()
-        h.ignore_links = False
-        h.ignore_images = True
-        h.ignore_emphasis = False
-        h.body_width = 0
-        
-        content = h.handle(str(soup))
-        
-        # Get title
-        title = soup.find('title')
-        if title:
-            title = title.get_text().strip()
-        else:
-            title = "Unknown Title"
-            
-        return {
-            'title': title,
-            'content': content,
-            'url': url,
-            'category': 'Additional',
-            'scraped_at': datetime.now().isoformat()
-        }
-        
-    except Exception as e:
-        print(f"Error scraping {url}: {e}")
-        return None
+    return extract_tally_url(url, category="Additional", default_title="Unknown Title")
 
 def add_specific_urls():
     """Add specific URLs to existing knowledge base"""
@@ -100,45 +55,14 @@ def add_specific_urls():
     
     return docs
 
-def update_vector_store(docs):
+def update_vector_store():
     """Update vector store with all documents"""
     print("\n🔄 Updating vector store...")
-    
-    # Convert to LangChain documents
-    documents = [
-        Document(
-            page_content=item["content"],
-            metadata={
-                "source": item["url"],
-                "title": item["title"],
-                "category": item.get("category", "")
-            },
-        )
-        for item in docs
-    ]
-    
-    # Create embeddings
-    embeddings = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2"
-    )
-    
-    # Split documents
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200
-    )
-    splits = text_splitter.split_documents(documents)
-    print(f"📄 Split into {len(splits)} chunks")
-    
-    # Create new vector store
-    vectorstore = Chroma.from_documents(
-        documents=splits,
-        embedding=embeddings,
-        persist_directory="./tally_chroma_db"
-    )
-    
+
+    # Only the stages whose inputs changed are recomputed
+    run_pipeline()
+
     print("✅ Vector store updated successfully")
-    return vectorstore
 
 def main():
     print("🎯 Adding specific URLs without losing existing content\n")
@@ -147,7 +71,7 @@ def main():
     docs = add_specific_urls()
     
     # Update vector store
-    update_vector_store(docs)
+    update_vector_store()
     
     print("\n🚀 Done! Restart backend server to use updated content")
 
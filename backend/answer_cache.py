@@ -0,0 +1,261 @@
+"""
+answer_cache.py
+Thread-safe LRU cache of /ask responses.
+
+Replaces functools.lru_cache so the server can look an answer up without
+computing it (e.g. while the model and index are still loading).
+
+Each answer can carry its dependencies: the chunk IDs and source URLs that
+went into its context. Reverse indexes from chunk and source to questions
+let a re-index invalidate only the answers built from pages that changed
+(invalidate()), or mark them stale so they keep being served until a
+background refresh replaces them (stale-while-revalidate). Answers with no
+recorded dependencies are treated as depending on everything.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+WARM_CACHE_FILE = "warm_cache.json"
+WARM_CACHE_VERSION = 1
+INDEX_CHANGES_FILE = "index_changes.json"
+
+
+def normalize_question(question):
+    return question.lower().strip()
+
+
+def normalize_source(source):
+    return source.split("#")[0].split("?")[0].strip().lower()
+
+
+def answer_dependencies(docs):
+    """{"chunks", "sources"} for the docs an answer was generated from."""
+    return {
+        "chunks": sorted({d.id for d in docs if d.id}),
+        "sources": sorted({normalize_source(d.metadata["source"]) for d in docs if d.metadata.get("source")}),
+    }
+
+
+def is_usable(answer):
+    """Whether an /ask response may be cached: generated from retrieved
+    docs, not degraded and not an error."""
+    return bool(
+        not answer.get("degraded")
+        and not answer.get("error")
+        and answer.get("sources")
+        and not answer.get("short_answer", "").startswith("An internal error")
+    )
+
+
+class AnswerCache:
+
+    def __init__(self, maxsize=1000):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        # Dependency tracking: question -> (chunks, sources) and the reverse
+        self._dependencies = {}
+        self._by_chunk = {}
+        self._by_source = {}
+        self._stale = set()
+        self.invalidated = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, question):
+        key = normalize_question(question)
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+    def put(self, question, answer, dependencies=None):
+        """Cache answer. dependencies ({"chunks", "sources"}) replace the
+        recorded ones; None keeps what an existing entry already has."""
+        key = normalize_question(question)
+        with self._lock:
+            self._entries[key] = answer
+            self._entries.move_to_end(key)
+            self._stale.discard(key)
+            if dependencies is not None:
+                self._untrack(key)
+                self._track(key, dependencies)
+            while len(self._entries) > self.maxsize:
+                evicted, _ = self._entries.popitem(last=False)
+                self._untrack(evicted)
+                self._stale.discard(evicted)
+
+    def _track(self, key, dependencies):
+        chunks = tuple(dependencies.get("chunks", ()))
+        sources = tuple(normalize_source(s) for s in dependencies.get("sources", ()))
+        self._dependencies[key] = (chunks, sources)
+        for chunk in chunks:
+            self._by_chunk.setdefault(chunk, set()).add(key)
+        for source in sources:
+            self._by_source.setdefault(source, set()).add(key)
+
+    def _untrack(self, key):
+        chunks, sources = self._dependencies.pop(key, ((), ()))
+        for index, values in ((self._by_chunk, chunks), (self._by_source, sources)):
+            for value in values:
+                keys = index.get(value)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del index[value]
+
+    def dependents(self, sources=(), chunk_ids=()):
+        """Cached questions built from any of these sources or chunks, plus
+        every entry whose dependencies are unknown."""
+        with self._lock:
+            keys = {k for k in self._entries if k not in self._dependencies}
+            for source in sources:
+                keys |= self._by_source.get(normalize_source(source), set())
+            for chunk in chunk_ids:
+                keys |= self._by_chunk.get(chunk, set())
+            return keys
+
+    def invalidate(self, sources=(), chunk_ids=(), stale=False):
+        """Drop (or with stale=True, mark stale) the dependent answers;
+        returns their questions."""
+        keys = self.dependents(sources, chunk_ids)
+        with self._lock:
+            keys = {k for k in keys if k in self._entries}
+            for key in keys:
+                if stale:
+                    self._stale.add(key)
+                else:
+                    del self._entries[key]
+                    self._untrack(key)
+                    self._stale.discard(key)
+            self.invalidated += len(keys)
+        return sorted(keys)
+
+    def stale_questions(self):
+        with self._lock:
+            return [k for k in self._entries if k in self._stale]
+
+    def discard(self, question):
+        key = normalize_question(question)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._untrack(key)
+            self._stale.discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._dependencies.clear()
+            self._by_chunk.clear()
+            self._by_source.clear()
+            self._stale.clear()
+
+    def info(self):
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "tracked": len(self._dependencies),
+            "stale": len(self._stale),
+            "invalidated": self.invalidated,
+        }
+
+
+# ------------------ WARM CACHE FILE ------------------
+
+def save_warm_cache(path, entries, index_key):
+    """Write {question: answer} pairs built against index_key."""
+    payload = {
+        "format_version": WARM_CACHE_VERSION,
+        "index_key": index_key,
+        "created_at": datetime.now().isoformat(),
+        "entries": [{"question": q, "answer": a} for q, a in entries.items()],
+    }
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def read_warm_cache(path):
+    with open(path, "r", encoding="utf-8") as f:
+        payload = json.load(f)
+    if payload.get("format_version") != WARM_CACHE_VERSION:
+        raise ValueError(f"Unsupported warm cache version in {path}")
+    return payload
+
+
+def unaffected_entries(entries, changes):
+    """Warm cache entries that used none of the changed or removed pages
+    (entries without recorded dependencies are dropped)."""
+    dirty = {normalize_source(u) for u in changes["changed"] + changes["removed"]}
+    return [
+        e for e in entries
+        if e["answer"].get("dependencies") is not None
+        and not dirty.intersection(map(normalize_source, e["answer"]["dependencies"]["sources"]))
+    ]
+
+
+def load_warm_cache(cache, path, index_key, changes=None):
+    """Fill cache from path if it was built against index_key, or against
+    the index that changes (see read_index_changes) leads from, minus the
+    answers that depend on a changed page. Returns the number of answers
+    loaded (0 when missing or stale)."""
+    if not os.path.exists(path):
+        return 0
+
+    payload = read_warm_cache(path)
+    entries = payload["entries"]
+    if payload.get("index_key") != index_key:
+        if changes is None or changes["from_index"] != payload.get("index_key") or changes["to_index"] != index_key:
+            print(f"⚠️ Warm cache {path} is for index {payload.get('index_key')}, not {index_key}; ignoring")
+            return 0
+        entries = unaffected_entries(entries, changes)
+        print(f"♻️ Warm cache {path} carried over to index {index_key}, "
+              f"{len(payload['entries']) - len(entries)} answers dropped")
+
+    for entry in entries:
+        answer = dict(entry["answer"])
+        cache.put(entry["question"], answer, answer.pop("dependencies", None))
+    return len(entries)
+
+
+# ------------------ INDEX CHANGES ------------------
+
+def save_index_changes(path, from_index, to_index, changed, removed, added):
+    """Record which source URLs differ between two index builds."""
+    payload = {
+        "from_index": from_index,
+        "to_index": to_index,
+        "created_at": datetime.now().isoformat(),
+        "changed": sorted(changed),
+        "removed": sorted(removed),
+        "added": sorted(added),
+    }
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def read_index_changes(path, to_index, from_index=None):
+    """The changes leading to to_index (from exactly from_index, if given),
+    else None: the caller must then assume everything changed."""
+    if not to_index or not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        changes = json.load(f)
+    if changes.get("to_index") != to_index or (from_index and changes.get("from_index") != from_index):
+        return None
+    return changes
@@ -0,0 +1,166 @@
+"""
+baked_artifacts.py
+Build-time warming for the Docker image and the matching startup check.
+
+`build` (run by the Dockerfile) bakes everything startup would otherwise
+fetch or compute into the image:
+    - the sentence-transformers weights, saved to models/<name>
+    - a checksum-verified index snapshot (exported from tally_chroma_db/ if
+      only the Chroma directory was shipped)
+    - the warm answer cache, validated against the snapshot's index key
+and records them in build_manifest.json.
+
+`check` (run by the server before loading when REQUIRE_BAKED_ARTIFACTS=1)
+fails fast if any artifact is missing or does not match the manifest, so a
+broken image dies at startup instead of reaching for the network.
+
+Usage:
+    python baked_artifacts.py build
+    python baked_artifacts.py check
+"""
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime
+
+from answer_cache import WARM_CACHE_FILE, read_warm_cache, save_warm_cache
+from embedding_cache import EMBEDDING_MODEL
+from index_snapshot import SNAPSHOT_FILE, export_from_chroma, load_snapshot
+
+BUILD_MANIFEST = "build_manifest.json"
+MODEL_DIR = os.path.join("models", EMBEDDING_MODEL.rsplit("/", 1)[-1])
+PERSIST_DIR = "./tally_chroma_db"
+
+# Files sentence-transformers needs to load a saved model without the Hub
+MODEL_FILES = ["modules.json", "config.json", "config_sentence_transformers.json"]
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# =========================
+# BUILD
+# =========================
+def bake_model():
+    from sentence_transformers import SentenceTransformer
+
+    print(f"⬇️  Saving {EMBEDDING_MODEL} to {MODEL_DIR}")
+    model = SentenceTransformer(EMBEDDING_MODEL)
+    model.save(MODEL_DIR)
+
+    # Prove the saved copy loads and embeds on its own
+    SentenceTransformer(MODEL_DIR).encode(["Gateway of Tally"])
+    return MODEL_DIR
+
+
+def bake_snapshot():
+    if not os.path.exists(SNAPSHOT_FILE):
+        if not os.path.isdir(PERSIST_DIR):
+            raise FileNotFoundError(f"Neither {SNAPSHOT_FILE} nor {PERSIST_DIR} is present")
+        print(f"📦 Exporting {PERSIST_DIR} to {SNAPSHOT_FILE}")
+        export_from_chroma(PERSIST_DIR, SNAPSHOT_FILE)
+
+    snapshot = load_snapshot(SNAPSHOT_FILE, verify=True)
+    model = snapshot.manifest.get("embedding_model")
+    if model != EMBEDDING_MODEL:
+        raise ValueError(f"{SNAPSHOT_FILE} was built with {model}, expected {EMBEDDING_MODEL}")
+    return snapshot
+
+
+def bake_warm_cache(index_key):
+    if not os.path.exists(WARM_CACHE_FILE):
+        print(f"ℹ️  No {WARM_CACHE_FILE}; baking an empty one for index {index_key}")
+        save_warm_cache(WARM_CACHE_FILE, {}, index_key)
+
+    payload = read_warm_cache(WARM_CACHE_FILE)
+    if payload.get("index_key") != index_key:
+        raise ValueError(
+            f"{WARM_CACHE_FILE} was generated for index {payload.get('index_key')}, "
+            f"but the snapshot is {index_key}. Regenerate it or remove it."
+        )
+    return len(payload["entries"])
+
+
+def build():
+    model_dir = bake_model()
+    snapshot = bake_snapshot()
+    index_key = snapshot.manifest.get("index_key") or snapshot.checksum[:16]
+    warm_entries = bake_warm_cache(index_key)
+
+    manifest = {
+        "built_at": datetime.now().isoformat(),
+        "embedding_model": EMBEDDING_MODEL,
+        "model_dir": model_dir,
+        "snapshot": SNAPSHOT_FILE,
+        "snapshot_checksum": snapshot.checksum,
+        "index_key": index_key,
+        "warm_cache": WARM_CACHE_FILE,
+        "warm_cache_sha256": _file_sha256(WARM_CACHE_FILE),
+        "warm_cache_entries": warm_entries,
+    }
+    with open(BUILD_MANIFEST, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    print(f"✅ Baked artifacts recorded in {BUILD_MANIFEST}")
+    return manifest
+
+
+# =========================
+# STARTUP CHECK
+# =========================
+def check(verify_checksum=False):
+    """Raise RuntimeError describing every missing or mismatched artifact."""
+    if not os.path.exists(BUILD_MANIFEST):
+        raise RuntimeError(f"{BUILD_MANIFEST} missing: image was built without baked artifacts")
+
+    with open(BUILD_MANIFEST, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    problems = []
+
+    for name in MODEL_FILES:
+        if not os.path.exists(os.path.join(manifest["model_dir"], name)):
+            problems.append(f"model file {manifest['model_dir']}/{name} missing")
+
+    model_path = os.getenv("EMBEDDING_MODEL_PATH")
+    if model_path and os.path.realpath(model_path) != os.path.realpath(manifest["model_dir"]):
+        problems.append(f"EMBEDDING_MODEL_PATH={model_path} is not the baked {manifest['model_dir']}")
+
+    try:
+        snapshot = load_snapshot(manifest["snapshot"], verify=verify_checksum)
+        if snapshot.checksum != manifest["snapshot_checksum"]:
+            problems.append("snapshot checksum differs from the build manifest")
+        if snapshot.manifest.get("embedding_model") != manifest["embedding_model"]:
+            problems.append("snapshot embedding model differs from the build manifest")
+    except (OSError, ValueError) as e:
+        problems.append(f"snapshot unusable: {e}")
+
+    try:
+        if _file_sha256(manifest["warm_cache"]) != manifest["warm_cache_sha256"]:
+            problems.append("warm cache differs from the build manifest")
+    except OSError as e:
+        problems.append(f"warm cache unusable: {e}")
+
+    if problems:
+        raise RuntimeError("Baked artifact check failed: " + "; ".join(problems))
+
+    return manifest
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else "check"
+    if command == "build":
+        build()
+    else:
+        manifest = check(verify_checksum=True)
+        print(f"✅ Baked artifacts OK (index {manifest['index_key']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+bench_startup.py
+Cold-start benchmark for the backend.
+
+1. Import time: runs `python -X importtime -c "import <module>"` in a fresh
+   interpreter and reports the slowest top-level packages.
+2. Time-to-ready: starts uvicorn on a free port and reports how long until
+   it accepts connections and until /status says ready, with the per-stage
+   breakdown the server records while loading (import, vectorstore,
+   embedding model, QA chain).
+
+Usage:
+    python bench_startup.py                 # server + qa_system imports, time-to-ready
+    python bench_startup.py --imports-only
+    python bench_startup.py --runs 3
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+import requests
+
+READY_TIMEOUT = 300
+
+
+# =========================
+# IMPORT TIME
+# =========================
+def import_times(module):
+    """Return {package: cumulative seconds} for importing module, counting
+    interpreter-startup imports and the module's own direct imports."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    totals = defaultdict(float)
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split(":", 1)[1].split("|", 2)
+        # Nested imports are indented two spaces per level under their parent
+        name = name.rstrip()[1:]
+        depth = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        if depth > 1 or name == module:
+            continue
+        totals[name.split(".")[0]] += int(cumulative_us) / 1e6
+    return dict(totals)
+
+
+def report_imports(module, top=15):
+    times = import_times(module)
+    total = sum(times.values())
+    print(f"\n📦 import {module}: {total:.2f}s")
+    for name, seconds in sorted(times.items(), key=lambda kv: kv[1], reverse=True)[:top]:
+        print(f"   {seconds:7.3f}s  {name}")
+    return total, times
+
+
+# =========================
+# TIME TO READY
+# =========================
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_ready():
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+    accepting = None
+    status = {}
+    try:
+        while time.perf_counter() - start < READY_TIMEOUT:
+            try:
+                status = requests.get(f"{base}/status", timeout=1).json()
+                if accepting is None:
+                    accepting = time.perf_counter() - start
+                if status.get("status") in ("ready", "error"):
+                    break
+            except requests.RequestException:
+                pass
+            time.sleep(0.05)
+        ready = time.perf_counter() - start
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+    return {
+        "accepting_connections_s": round(accepting or -1, 3),
+        "ready_s": round(ready, 3),
+        "status": status.get("status"),
+        "stages": status.get("init", {}).get("stages", {}),
+        "error": status.get("initialization_error"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend cold-start benchmark")
+    parser.add_argument("--imports-only", action="store_true")
+    parser.add_argument("--runs", type=int, default=1)
+    args = parser.parse_args()
+
+    report_imports("server")
+    report_imports("qa_system")
+
+    if args.imports_only:
+        return
+
+    for run in range(args.runs):
+        result = time_to_ready()
+        print(f"\n⏱️  run {run + 1}: accepting connections after {result['accepting_connections_s']}s, "
+              f"{result['status']} after {result['ready_s']}s")
+        for stage, seconds in result["stages"].items():
+            print(f"   {seconds:7.3f}s  {stage}")
+        if result["error"]:
+            print("   ❌", result["error"])
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+boilerplate.py
+Corpus-level boilerplate detection for tally_docs.json records.
+
+Lines that survive the per-page chrome removal but repeat across a large share
+of pages ("Was this helpful?", breadcrumbs, sidebar lists, footers) are
+stripped before chunking, so they stop being embedded into every chunk.
+
+Only whole block-level lines (a sentence, a heading, a list item) and runs of
+short lines count: a short inline fragment such as "Gateway of Tally" or
+"Ctrl+A" repeats on many pages because it is content, not chrome. Lines with
+a keyboard shortcut or a menu path (">") are never stripped.
+"""
+import re
+from collections import Counter
+
+BOILERPLATE_VERSION = 2  # bump when the detection rules change (keys cached clean stages)
+LINE_FRACTION = 0.25    # a line on >= 25% of pages is boilerplate
+BLOCK_FRACTION = 0.10   # a run of short lines on >= 10% of pages is too
+BLOCK_SIZE = 3
+MAX_BLOCK_LINE = 120    # only short lines can form chrome blocks
+MIN_DOCS = 5            # never call anything boilerplate below this many pages
+MIN_LINE_WORDS = 5      # shorter lines need sentence punctuation or a block marker
+
+_SPACE_RE = re.compile(r"\s+")
+_BLOCK_MARKER_RE = re.compile(r"^(?:#{1,6}\s|[-*+]\s|\d+[.)]\s|\|)")
+_KEEP_RE = re.compile(r"\b(?:alt|ctrl)\s*\+|>")
+
+
+def _normalize(line):
+    return _SPACE_RE.sub(" ", line).strip().lower()
+
+
+def _is_kept(line):
+    return bool(_KEEP_RE.search(line))
+
+
+def _is_block_line(line):
+    """A normalized line that is a whole block, not an inline fragment."""
+    if not line or _is_kept(line):
+        return False
+    return (
+        line.endswith((".", "?", "!", ":"))
+        or bool(_BLOCK_MARKER_RE.match(line))
+        or len(line.split()) >= MIN_LINE_WORDS
+    )
+
+
+def _blocks(lines):
+    for i in range(len(lines) - BLOCK_SIZE + 1):
+        window = lines[i:i + BLOCK_SIZE]
+        if all(line and len(line) <= MAX_BLOCK_LINE and not _is_kept(line) for line in window):
+            yield i, "\n".join(window)
+
+
+def find_boilerplate(texts, line_fraction=LINE_FRACTION, block_fraction=BLOCK_FRACTION):
+    """Return (line_set, block_set) of normalized boilerplate lines / blocks."""
+    line_df = Counter()
+    block_df = Counter()
+
+    for text in texts:
+        lines = [_normalize(line) for line in text.splitlines()]
+        line_df.update({line for line in lines if _is_block_line(line)})
+        block_df.update({block for _, block in _blocks(lines)})
+
+    total = len(texts)
+    line_min = max(MIN_DOCS, line_fraction * total)
+    block_min = max(MIN_DOCS, block_fraction * total)
+
+    lines = {line for line, df in line_df.items() if df >= line_min}
+    blocks = {block for block, df in block_df.items() if df >= block_min}
+    return lines, blocks
+
+
+def strip_text(text, boiler_lines, boiler_blocks):
+    raw = text.splitlines()
+    lines = [_normalize(line) for line in raw]
+    drop = [line in boiler_lines for line in lines]
+
+    if boiler_blocks:
+        for i, block in _blocks(lines):
+            if block in boiler_blocks:
+                for j in range(i, i + BLOCK_SIZE):
+                    drop[j] = True
+
+    return "\n".join(line for line, gone in zip(raw, drop) if not gone)
+
+
+def strip_boilerplate(docs, line_fraction=LINE_FRACTION, block_fraction=BLOCK_FRACTION):
+    """Strip corpus-wide boilerplate from each doc's "content" in place.
+
+    Returns (docs, report) where the report lists bytes removed overall and
+    per page plus the most common boilerplate lines that were found.
+    """
+    texts = [doc.get("content", "") for doc in docs]
+    boiler_lines, boiler_blocks = find_boilerplate(texts, line_fraction, block_fraction)
+
+    bytes_before = 0
+    bytes_after = 0
+    per_doc = []
+
+    for doc, text in zip(docs, texts):
+        cleaned = strip_text(text, boiler_lines, boiler_blocks)
+        before = len(text.encode("utf-8"))
+        after = len(cleaned.encode("utf-8"))
+
+        doc["content"] = cleaned
+        bytes_before += before
+        bytes_after += after
+        if before != after:
+            per_doc.append({"url": doc.get("url", ""), "bytes_removed": before - after})
+
+    per_doc.sort(key=lambda d: d["bytes_removed"], reverse=True)
+
+    report = {
+        "bytes_before": bytes_before,
+        "bytes_after": bytes_after,
+        "bytes_removed": bytes_before - bytes_after,
+        "boilerplate_lines": sorted(boiler_lines),
+        "boilerplate_blocks": sorted(boiler_blocks),
+        "pages": per_doc,
+    }
+    return docs, report
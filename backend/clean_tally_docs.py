@@ -1,49 +1,83 @@
 import json
 
-with open("tally_docs.json", "r", encoding="utf-8") as f:
-    docs = json.load(f)
+from boilerplate import strip_boilerplate
+from near_dedupe import dedupe_near_duplicates
 
-clean_docs = []
-removed = []
+FILTER_RULES_VERSION = 1  # bump when filter_docs changes (keys cached clean stages)
 
-for doc in docs:
-    url = doc.get("url", "").lower()
-    content = doc.get("content", "").lower()
-    title = doc.get("title", "")
 
-    # Remove ERP9 URLs
-    if "tally.erp9" in url:
-        removed.append(url)
-        continue
+def filter_docs(docs):
+    clean_docs = []
+    removed = []
 
-    # Remove search pages
-    if "?s=" in url:
-        removed.append(url)
-        continue
+    for doc in docs:
+        url = doc.get("url", "").lower()
+        content = doc.get("content", "").lower()
+        title = doc.get("title", "")
 
-    # Remove search page titles
-    if "you searched for" in title.lower():
-        removed.append(url)
-        continue
+        # Remove ERP9 URLs
+        if "tally.erp9" in url:
+            removed.append(url)
+            continue
 
-    # Remove ERP9 content mentions
-    if "tally.erp 9" in content:
-        removed.append(url)
-        continue
+        # Remove search pages
+        if "?s=" in url:
+            removed.append(url)
+            continue
 
-    if "shoper 9" in content:
-        removed.append(url)
-        continue
+        # Remove search page titles
+        if "you searched for" in title.lower():
+            removed.append(url)
+            continue
 
-    if "shoper9" in url:
-        removed.append(url)
-        continue
+        # Remove ERP9 content mentions
+        if "tally.erp 9" in content:
+            removed.append(url)
+            continue
 
-    clean_docs.append(doc)
+        if "shoper 9" in content:
+            removed.append(url)
+            continue
 
-print("Before:", len(docs))
-print("After:", len(clean_docs))
-print("Removed:", len(removed))
+        if "shoper9" in url:
+            removed.append(url)
+            continue
 
-with open("tally_docs_clean.json", "w", encoding="utf-8") as f:
-    json.dump(clean_docs, f, indent=2, ensure_ascii=False)
+        clean_docs.append(doc)
+
+    return clean_docs, removed
+
+
+def main():
+    with open("tally_docs.json", "r", encoding="utf-8") as f:
+        docs = json.load(f)
+
+    clean_docs, removed = filter_docs(docs)
+
+    # Strip lines repeated across many pages (sidebars, breadcrumbs, footers)
+    clean_docs, boilerplate_report = strip_boilerplate(clean_docs)
+
+    # Collapse near-identical pages (same article via several URLs, search pages
+    # repeating article bodies) to one representative that lists its aliases
+    filtered_count = len(clean_docs)
+    clean_docs, clusters = dedupe_near_duplicates(clean_docs)
+
+    print("Before:", len(docs))
+    print("After:", len(clean_docs))
+    print("Removed:", len(removed))
+    print("Boilerplate bytes removed:", boilerplate_report["bytes_removed"],
+          "of", boilerplate_report["bytes_before"])
+    print("Near-duplicates merged:", filtered_count - len(clean_docs), "in", len(clusters), "clusters")
+
+    with open("boilerplate_report.json", "w", encoding="utf-8") as f:
+        json.dump(boilerplate_report, f, indent=2, ensure_ascii=False)
+
+    with open("duplicate_clusters.json", "w", encoding="utf-8") as f:
+        json.dump(clusters, f, indent=2, ensure_ascii=False)
+
+    with open("tally_docs_clean.json", "w", encoding="utf-8") as f:
+        json.dump(clean_docs, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
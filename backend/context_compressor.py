@@ -0,0 +1,145 @@
+"""
+context_compressor.py
+Extractive compression of retrieved chunks before generation.
+
+Each chunk is split into lines, and prose lines into sentences. Every unit
+is scored by cosine similarity to the query embedding; a chunk keeps its
+best TOP_PER_CHUNK units plus anything above MIN_SIMILARITY. Step lines
+(numbered items, bullets, "A > B > C" menu paths) are kept as whole runs:
+if any line of a procedure, or the line introducing it, is kept, the whole
+procedure is, so numbered steps reach the prompt intact.
+
+Sentences are embedded through the shared MicroBatchEmbedder (not the raw
+model), so they batch with concurrent queries on the one worker thread.
+Sentence vectors are cached in memory (the same chunks keep coming back),
+so repeated questions only pay for the matrix products.
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.documents import Document
+
+COMPRESSION_ENABLED = os.getenv("CONTEXT_COMPRESSION", "1") != "0"
+TOP_PER_CHUNK = int(os.getenv("COMPRESS_TOP_PER_CHUNK", "2"))
+MIN_SIMILARITY = float(os.getenv("COMPRESS_MIN_SIMILARITY", "0.35"))
+MAX_RUN = 15            # longest step run kept whole
+CACHE_SIZE = 50000      # sentence vectors kept in memory
+
+STEP_RE = re.compile(r"^\s*(\d+[.)]|step\s+\d+|[-*•]|[a-z][.)]\s)|\s>\s", re.IGNORECASE)
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9])")
+
+
+def split_units(text):
+    """[(line number, unit text, is_step)] for one chunk."""
+    units = []
+    for line_no, line in enumerate(text.splitlines()):
+        line = line.strip()
+        if not line:
+            continue
+        if STEP_RE.search(line):
+            units.append((line_no, line, True))
+        else:
+            units.extend((line_no, sentence, False) for sentence in SENTENCE_RE.split(line) if sentence)
+    return units
+
+
+def _step_runs(units):
+    """Index ranges [start, end) of consecutive step units."""
+    runs, start = [], None
+    for i, (_, _, is_step) in enumerate(units + [(None, "", False)]):
+        if is_step and start is None:
+            start = i
+        elif not is_step and start is not None:
+            runs.append((start, i))
+            start = None
+    return runs
+
+
+def select_units(units, scores, top_per_chunk=TOP_PER_CHUNK, min_similarity=MIN_SIMILARITY):
+    keep = set(int(i) for i in np.argsort(-scores)[:top_per_chunk])
+    keep.update(int(i) for i in np.flatnonzero(scores >= min_similarity))
+
+    for start, end in _step_runs(units):
+        lead = start - 1 if start > 0 and not units[start - 1][2] else start
+        if keep.intersection(range(lead, end)):
+            keep.update(range(lead, min(end, start + MAX_RUN)))
+    return sorted(keep)
+
+
+def join_units(units, kept):
+    """Rebuild text from kept units: same-line units joined with spaces,
+    lines with newlines, "…" where something was cut."""
+    lines, previous_line, previous_index = [], None, None
+    for i in kept:
+        line_no, text, _ = units[i]
+        if previous_index is not None and i != previous_index + 1:
+            lines.append("…")
+            previous_line = None
+        if line_no == previous_line:
+            lines[-1] += " " + text
+        else:
+            lines.append(text)
+        previous_line, previous_index = line_no, i
+    return "\n".join(lines)
+
+
+class ContextCompressor:
+
+    def __init__(self, embedder):
+        # query_embedder.MicroBatchEmbedder; sentences skip the on-disk chunk cache
+        self.embedder = embedder
+        self._vectors = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _embed(self, texts):
+        with self._lock:
+            cached = {t: self._vectors[t] for t in texts if t in self._vectors}
+        missing = list(dict.fromkeys(t for t in texts if t not in cached))
+
+        if missing:
+            fresh = np.asarray(self.embedder.embed_many(missing), dtype=np.float32)
+            with self._lock:
+                for text, vector in zip(missing, fresh):
+                    self._vectors[text] = vector
+                    cached[text] = vector
+                while len(self._vectors) > CACHE_SIZE:
+                    self._vectors.popitem(last=False)
+
+        return np.stack([cached[t] for t in texts])
+
+    def compress(self, docs, query_vector):
+        """Returns (compressed docs, stats). Metadata is untouched."""
+        per_doc = [split_units(d.page_content) for d in docs]
+        texts = [text for units in per_doc for _, text, _ in units]
+        chars_before = sum(len(d.page_content) for d in docs)
+        if not texts:
+            return docs, {"chars_before": chars_before, "chars_after": chars_before, "ratio": 1.0}
+
+        vectors = self._embed(texts)
+        vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        q = np.asarray(query_vector, dtype=np.float32)
+        scores = vectors @ (q / max(float(np.linalg.norm(q)), 1e-12))
+
+        compressed, offset, kept_units = [], 0, 0
+        for doc, units in zip(docs, per_doc):
+            doc_scores = scores[offset:offset + len(units)]
+            offset += len(units)
+            kept = select_units(units, doc_scores) if units else []
+            kept_units += len(kept)
+            compressed.append(Document(
+                id=doc.id,
+                page_content=join_units(units, kept) if kept else doc.page_content,
+                metadata=doc.metadata,
+            ))
+
+        chars_after = sum(len(d.page_content) for d in compressed)
+        return compressed, {
+            "chars_before": chars_before,
+            "chars_after": chars_after,
+            "ratio": round(chars_after / chars_before, 3) if chars_before else 1.0,
+            "units_kept": kept_units,
+            "units_total": len(texts),
+        }
@@ -0,0 +1,65 @@
+"""
+context_store.py
+Short-lived server-side store of packed prompt contexts, keyed by answer ID.
+
+In short-first mode /ask generates only SHORT_ANSWER and keeps the context
+it was generated from here; POST /ask/long reuses it to write LONG_ANSWER
+without retrieving, compressing or packing again. Entries expire after
+CONTEXT_TTL seconds and the store is per process, so callers must cope with
+a miss (the answer is rebuilt from the question).
+"""
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+CONTEXT_TTL = float(os.getenv("LONG_ANSWER_CONTEXT_TTL", "600"))
+CONTEXT_MAXSIZE = int(os.getenv("LONG_ANSWER_CONTEXT_MAXSIZE", "500"))
+
+
+class ContextStore:
+
+    def __init__(self, ttl=CONTEXT_TTL, maxsize=CONTEXT_MAXSIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # answer id -> (expiry, entry)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _expire(self, now):
+        while self._entries:
+            answer_id, (expiry, _) = next(iter(self._entries.items()))
+            if expiry > now and len(self._entries) <= self.maxsize:
+                break
+            del self._entries[answer_id]
+
+    def put(self, entry):
+        """Store entry (a dict); returns its new answer ID."""
+        answer_id = uuid.uuid4().hex
+        now = time.monotonic()
+        with self._lock:
+            self._entries[answer_id] = (now + self.ttl, entry)
+            self._expire(now)
+        return answer_id
+
+    def get(self, answer_id):
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            item = self._entries.get(answer_id)
+            if item is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return item[1]
+
+    def info(self):
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_s": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,190 @@
+"""
+crawl_planner.py
+Sitemap-seeded, de-duplicating crawl frontier for prime_scraper.py
+
+URLs are canonicalized before they are enqueued, so fragment, tracking-param
+and trailing-slash variants of one page are fetched once. Sitemap entries are
+served newest-lastmod first, then links discovered while crawling (FIFO).
+"""
+import gzip
+import heapq
+import itertools
+import posixpath
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import requests
+
+HEADERS = {"User-Agent": "Mozilla/5.0"}
+
+SITEMAP_PATHS = ["/sitemap.xml", "/sitemap_index.xml", "/wp-sitemap.xml"]
+MAX_SITEMAP_DEPTH = 3
+
+# Query params that never change the page content
+TRACKING_PARAMS = {
+    "geot_debug", "fbclid", "gclid", "msclkid", "ref", "_ga", "_gl",
+    "mc_cid", "mc_eid", "replytocom", "amp",
+}
+TRACKING_PREFIXES = ("utm_",)
+
+# Frontier tiers: lower pops first
+TIER_SITEMAP_DATED = 0
+TIER_SITEMAP_UNDATED = 1
+TIER_DISCOVERED = 2
+
+
+# =========================
+# URL CANONICALIZATION
+# =========================
+def canonicalize_url(url):
+    """Normalize scheme/host/path case and slashes, drop the fragment and
+    tracking params, and sort what is left of the query string."""
+    parts = urlsplit(url.strip())
+
+    scheme = parts.scheme.lower() or "https"
+    netloc = parts.netloc.lower()
+    if netloc.endswith(":80") and scheme == "http":
+        netloc = netloc[:-3]
+    if netloc.endswith(":443") and scheme == "https":
+        netloc = netloc[:-4]
+
+    path = parts.path.lower() or "/"
+    trailing = path.endswith("/")
+    path = posixpath.normpath(path)
+    if path == ".":
+        path = "/"
+    path = "/" + path.lstrip("/")
+
+    # WordPress serves pages with a trailing slash; keep files (x.pdf) bare
+    last = path.rsplit("/", 1)[-1]
+    if trailing or (last and "." not in last):
+        path = path.rstrip("/") + "/"
+
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in TRACKING_PARAMS
+        and not k.lower().startswith(TRACKING_PREFIXES)
+    ]
+    query.sort()
+
+    return urlunsplit((scheme, netloc, path, urlencode(query), ""))
+
+
+# =========================
+# SITEMAPS
+# =========================
+def _parse_lastmod(value):
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def _fetch(url):
+    response = requests.get(url, headers=HEADERS, timeout=20)
+    response.raise_for_status()
+    body = response.content
+    if body[:2] == b"\x1f\x8b":
+        body = gzip.decompress(body)
+    return body
+
+
+def sitemap_urls_from_robots(base_url):
+    try:
+        text = _fetch(base_url.rstrip("/") + "/robots.txt").decode("utf-8", "replace")
+    except Exception:
+        return []
+    return [
+        line.split(":", 1)[1].strip()
+        for line in text.splitlines()
+        if line.lower().startswith("sitemap:")
+    ]
+
+
+def read_sitemap(url, depth=0, seen=None):
+    """Yield (loc, lastmod_timestamp) for every page in a sitemap or sitemap index."""
+    seen = seen if seen is not None else set()
+    if url in seen or depth > MAX_SITEMAP_DEPTH:
+        return
+    seen.add(url)
+
+    try:
+        root = ET.fromstring(_fetch(url))
+    except Exception as e:
+        print(f"⚠️ Sitemap unavailable {url}: {e}")
+        return
+
+    kind = _local(root.tag)
+    for entry in root:
+        fields = {_local(child.tag): (child.text or "").strip() for child in entry}
+        loc = fields.get("loc")
+        if not loc:
+            continue
+        if kind == "sitemapindex":
+            yield from read_sitemap(loc, depth + 1, seen)
+        else:
+            yield loc, _parse_lastmod(fields.get("lastmod"))
+
+
+def discover_sitemap_entries(base_url):
+    sitemaps = sitemap_urls_from_robots(base_url)
+    if not sitemaps:
+        sitemaps = [base_url.rstrip("/") + path for path in SITEMAP_PATHS]
+
+    seen = set()
+    for sitemap in sitemaps:
+        yield from read_sitemap(sitemap, seen=seen)
+
+
+# =========================
+# FRONTIER
+# =========================
+class CrawlPlanner:
+
+    def __init__(self, is_allowed=None):
+        self.is_allowed = is_allowed or (lambda url: True)
+        self.seen = set()
+        self._heap = []
+        self._order = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def mark_seen(self, url):
+        self.seen.add(canonicalize_url(url))
+
+    def add(self, url, lastmod=None, tier=TIER_DISCOVERED):
+        """Enqueue the canonical form of url; returns False for duplicates."""
+        url = canonicalize_url(url)
+        if url in self.seen or not self.is_allowed(url):
+            return False
+
+        self.seen.add(url)
+        if tier != TIER_DISCOVERED:
+            tier = TIER_SITEMAP_DATED if lastmod is not None else TIER_SITEMAP_UNDATED
+
+        # Newest lastmod first within a tier, then insertion order
+        heapq.heappush(self._heap, (tier, -(lastmod or 0), next(self._order), url))
+        return True
+
+    def seed_from_sitemaps(self, base_url):
+        added = 0
+        for loc, lastmod in discover_sitemap_entries(base_url):
+            if self.add(loc, lastmod=lastmod, tier=TIER_SITEMAP_DATED):
+                added += 1
+        return added
+
+    def pop(self):
+        if not self._heap:
+            return None
+        return heapq.heappop(self._heap)[-1]
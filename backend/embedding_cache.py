@@ -0,0 +1,152 @@
+"""
+embedding_cache.py
+Persistent, content-addressed embedding cache shared by every index build.
+
+Vectors are keyed by (model name, sha256 of the chunk text). Each model gets
+its own directory holding an append-only float32 matrix (vectors.f32, read
+back through np.memmap) and a key index (keys.txt, one hash per row), so a
+rebuild only embeds chunk texts it has never seen before.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+CACHE_DIR = ".embedding_cache"
+
+
+def text_key(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+
+    def __init__(self, model_name=EMBEDDING_MODEL, cache_dir=CACHE_DIR):
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "__", model_name)
+        self.model_name = model_name
+        self.directory = os.path.join(cache_dir, slug)
+        self.vectors_path = os.path.join(self.directory, "vectors.f32")
+        self.keys_path = os.path.join(self.directory, "keys.txt")
+        self.meta_path = os.path.join(self.directory, "meta.json")
+
+        self.dim = None
+        self.rows = {}
+        self.vectors = None
+        self._lock = threading.Lock()
+        self._load()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _load(self):
+        if not os.path.exists(self.meta_path):
+            return
+
+        with open(self.meta_path, "r", encoding="utf-8") as f:
+            self.dim = json.load(f)["dim"]
+
+        with open(self.keys_path, "r", encoding="utf-8") as f:
+            keys = f.read().split()
+
+        # Vectors are appended before keys, so a crash can only leave extra
+        # vectors behind; never trust more rows than both files hold.
+        stored = os.path.getsize(self.vectors_path) // (4 * self.dim)
+        keys = keys[:stored]
+
+        self.rows = {key: row for row, key in enumerate(keys)}
+        self.vectors = np.memmap(
+            self.vectors_path, dtype=np.float32, mode="r", shape=(len(keys), self.dim)
+        ) if keys else None
+
+    def lookup(self, keys):
+        """Return (matrix or None, missing positions) for a list of keys."""
+        # add() swaps rows / vectors under the lock (and briefly sets vectors
+        # to None), so read them under it too
+        with self._lock:
+            rows = [self.rows.get(key) for key in keys]
+            missing = [i for i, row in enumerate(rows) if row is None]
+            if self.dim is None:
+                return None, missing
+
+            out = np.zeros((len(keys), self.dim), dtype=np.float32)
+            hits = [(i, row) for i, row in enumerate(rows) if row is not None]
+            if hits:
+                positions, stored = zip(*hits)
+                out[list(positions)] = self.vectors[list(stored)]
+        return out, missing
+
+    def add(self, keys, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock:
+            fresh = {}
+            for key, vector in zip(keys, vectors):
+                if key not in self.rows:
+                    fresh.setdefault(key, vector)
+            if not fresh:
+                return
+
+            os.makedirs(self.directory, exist_ok=True)
+            self.vectors = None  # release the map before the file grows
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"model": self.model_name, "dim": self.dim}, f)
+                open(self.keys_path, "w").close()
+
+            with open(self.vectors_path, "ab") as f:
+                f.write(np.stack(list(fresh.values())).tobytes())
+            with open(self.keys_path, "a", encoding="utf-8") as f:
+                f.write("".join(key + "\n" for key in fresh))
+
+            self._load()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that serves embed_documents from EmbeddingCache and
+    only loads the underlying model when some text is missing."""
+
+    def __init__(self, model_name=EMBEDDING_MODEL, cache_dir=CACHE_DIR, embeddings=None,
+                 model_path=None):
+        self.model_name = model_name
+        # Local copy of the same weights (e.g. baked into the image); cache
+        # keys and manifests keep using model_name
+        self.model_path = model_path
+        self.cache = EmbeddingCache(model_name, cache_dir)
+        self._embeddings = embeddings
+
+    @property
+    def embeddings(self):
+        if self._embeddings is None:
+            from langchain_huggingface import HuggingFaceEmbeddings
+            self._embeddings = HuggingFaceEmbeddings(model_name=self.model_path or self.model_name)
+        return self._embeddings
+
+    def embed_documents_array(self, texts):
+        keys = [text_key(t) for t in texts]
+        matrix, missing = self.cache.lookup(keys)
+
+        if missing:
+            print(f"🧠 Embedding {len(missing)} new texts ({len(texts) - len(missing)} cached)")
+            fresh = np.asarray(
+                self.embeddings.embed_documents([texts[i] for i in missing]),
+                dtype=np.float32,
+            )
+            self.cache.add([keys[i] for i in missing], fresh)
+            if matrix is None:
+                matrix = np.zeros((len(texts), fresh.shape[1]), dtype=np.float32)
+            matrix[missing] = fresh
+
+        if matrix is None:
+            return np.zeros((0, 0), dtype=np.float32)
+        return matrix
+
+    def embed_documents(self, texts):
+        return self.embed_documents_array(texts).tolist()
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
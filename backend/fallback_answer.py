@@ -0,0 +1,155 @@
+"""
+fallback_answer.py
+Retrieval-only (extractive) answers for when the LLM is slow or failing.
+
+The retrieved, compressed chunks are already ranked by relevance, so the
+degraded answer is built from them directly: the leading passages, the
+navigation paths ("Gateway of Tally > Vouchers > F5") and keyboard
+shortcuts found in them, and the source links. No model call.
+
+ask() switches to it when the LLM call would miss ANSWER_SLO (the call only
+gets the time that is left), when the circuit breaker is open, or when the
+call fails. FallbackMetrics counts how often, per reason, for /metrics.
+"""
+import os
+import re
+import threading
+from collections import Counter
+
+ANSWER_SLO = float(os.getenv("ANSWER_SLO", "15"))   # seconds per answer, under server.py's 20 s
+FALLBACK_MARGIN = 0.5       # kept back for building the fallback
+MIN_LLM_BUDGET = 1.0        # with less than this left, skip the LLM call
+MAX_PASSAGES = 3
+PASSAGE_CHARS = 600
+MAX_ITEMS = 6               # paths / shortcuts listed
+
+NOTICE = "Quick answer from the documentation (the AI assistant is busy right now)."
+
+SHORTCUT_RE = re.compile(
+    r"\b(?:(?:Alt|Ctrl|Shift)\s*\+\s*)+(?:F\d{1,2}|[A-Z0-9])\b|\bF(?:1[0-2]|[1-9])\b(?:\s*\([A-Z][^)]{0,30}\))?"
+)
+NAV_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n")
+NAV_CONNECTORS = {"of", "and", "&", "for", "/"}
+NAV_VERBS = {"go", "then", "open", "press", "select", "click", "choose", "navigate", "alternatively", "also", "next", "now"}
+
+
+# ------------------ EXTRACTION ------------------
+
+def _is_name(word):
+    return word[:1].isupper() or word[:1].isdigit() or word[:1] == "(" or word[-1:] == ")"
+
+
+def _name_run(words):
+    """Leading run of menu-name words ("Gateway of Tally", "F5 (Payment)")."""
+    run = []
+    for word in words:
+        if word.lower().strip(",") in NAV_VERBS:
+            break
+        if _is_name(word) or (run and word.lower() in NAV_CONNECTORS):
+            run.append(word)
+        else:
+            break
+    while run and run[-1].lower() in NAV_CONNECTORS:
+        run.pop()
+    return run[:6]
+
+
+def find_nav_paths(text):
+    """Menu paths written as "A > B > C", trimmed to the menu names."""
+    paths = []
+    for sentence in NAV_SENTENCE_RE.split(text):
+        parts = sentence.split(" > ")
+        if len(parts) < 2:
+            continue
+        segments = [" ".join(reversed(_name_run(reversed(parts[0].split()))))]
+        for part in parts[1:]:
+            words = part.split()
+            while words and words[0].lower() in NAV_VERBS:
+                words.pop(0)  # "> press F5 (Payment)"
+            segment = " ".join(_name_run(words))
+            if not segment:
+                break
+            segments.append(segment)
+        segments = [s.strip(" .,;:") for s in segments]
+        if segments[0] and len(segments) >= 2:
+            paths.append(" > ".join(segments))
+    return paths
+
+
+def find_shortcuts(text):
+    return [re.sub(r"\s*\+\s*", "+", s) for s in SHORTCUT_RE.findall(text)]
+
+
+def _unique(items, limit=MAX_ITEMS):
+    return list(dict.fromkeys(items))[:limit]
+
+
+def _passage(text, limit=PASSAGE_CHARS):
+    text = text.strip()
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    return cut[:cut.rfind(" ")] + " …" if " " in cut else cut + " …"
+
+
+def extractive_answer(docs):
+    """{short_answer, long_answer, nav_paths, shortcuts} from ranked
+    (ideally compressed) docs."""
+    text = "\n".join(d.page_content for d in docs)
+    nav_paths = _unique(find_nav_paths(text))
+    shortcuts = _unique(find_shortcuts(text))
+
+    lead_text = docs[0].page_content.strip() if docs else ""
+    # The headline path must come from the best match, not any retrieved doc
+    lead_paths = find_nav_paths(lead_text)
+    lead = lead_text.split("\n")[0]
+    short_lines = [NOTICE]
+    if lead_paths:
+        short_lines.append(f"Path: **{lead_paths[0]}**")
+    short_lines.append(_passage(lead, 300))
+
+    long_lines = []
+    if nav_paths:
+        long_lines.append("**Navigation paths:**")
+        long_lines.extend(f"- {p}" for p in nav_paths)
+        long_lines.append("")
+    if shortcuts:
+        long_lines.append("**Shortcuts:** " + ", ".join(shortcuts))
+        long_lines.append("")
+    for doc in docs[:MAX_PASSAGES]:
+        long_lines.append(f"**{doc.metadata.get('title') or 'Documentation'}**")
+        long_lines.append(_passage(doc.page_content))
+        long_lines.append("")
+
+    return {
+        "short_answer": "\n\n".join(line for line in short_lines if line),
+        "long_answer": "\n".join(long_lines).strip(),
+        "nav_paths": nav_paths,
+        "shortcuts": shortcuts,
+    }
+
+
+# ------------------ METRICS ------------------
+
+class FallbackMetrics:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.answers = 0
+        self.reasons = Counter()    # timeout | circuit_open | llm_error | no_budget
+
+    def record(self, reason=None):
+        with self._lock:
+            self.answers += 1
+            if reason:
+                self.reasons[reason] += 1
+
+    def snapshot(self):
+        with self._lock:
+            degraded = sum(self.reasons.values())
+            return {
+                "answers": self.answers,
+                "degraded": degraded,
+                "rate": round(degraded / self.answers, 4) if self.answers else 0.0,
+                "reasons": dict(self.reasons),
+            }
@@ -0,0 +1,29 @@
+"""
+gunicorn.conf.py
+Multi-worker deployment: `gunicorn -c gunicorn.conf.py server:app`
+
+The app is imported once in the master (preload_app) with PRELOAD_QA_SYSTEM=1,
+which loads the embedding model weights and maps the index snapshot before
+forking. Workers share those pages copy-on-write / through the page cache and
+each only builds its own light handles (Anthropic client, answer cache).
+Needs tally_index.snap; without it every worker opens its own Chroma client.
+/admin/index/swap reaches one worker; the others follow through
+ACTIVE_INDEX_FILE (see server.py).
+"""
+import os
+
+os.environ.setdefault("PRELOAD_QA_SYSTEM", "1")
+
+bind = f"0.0.0.0:{os.getenv('PORT', '7860')}"
+# Set in the environment too: the preloaded app sizes its torch threads by it
+os.environ.setdefault("WEB_CONCURRENCY", "2")
+workers = int(os.environ["WEB_CONCURRENCY"])
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = True
+timeout = 120
+
+
+def post_fork(server, worker):
+    import importlib
+
+    importlib.import_module("server").configure_worker(workers)
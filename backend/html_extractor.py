@@ -0,0 +1,280 @@
+"""
+html_extractor.py
+Shared HTML -> text extraction for every scraper in this folder.
+
+Uses lxml (C parser) instead of BeautifulSoup's pure-Python html.parser,
+detects the main article body so sidebars / menus / breadcrumbs are dropped,
+and offers a batch API that spreads pages across a process pool.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from urllib.parse import urljoin
+
+import lxml.etree
+import lxml.html
+import requests
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+}
+
+# Elements that never carry article content
+CHROME_TAGS = [
+    "nav", "header", "footer", "aside", "script", "style",
+    "noscript", "form", "iframe", "svg", "button",
+]
+
+# Whole class / id tokens the help-site theme uses for page chrome. Matched as
+# tokens, not substrings, so content classes like "menu-path" or "shared-note"
+# are left alone.
+CHROME_HINTS = {
+    "sidebar", "widget-area", "breadcrumb", "breadcrumbs", "menu", "main-menu",
+    "nav-menu", "navbar", "site-header", "site-footer", "share", "sharing",
+    "sharedaddy", "social", "social-links", "comments", "comment-respond",
+    "related", "related-posts", "cookie-notice", "cookie-banner", "widget",
+    "pagination", "feedback", "was-this-helpful", "toc", "skip-link",
+}
+# A hinted element holding more than this share of the page is a theme
+# wrapper around the content, not chrome
+MAX_CHROME_SHARE = 0.5
+
+# Tried in order; the first one holding enough text wins
+MAIN_CONTENT_XPATHS = [
+    "//main",
+    "//article",
+    "//*[@role='main']",
+    "//*[contains(concat(' ', normalize-space(@class), ' '), ' entry-content ')]",
+    "//*[contains(concat(' ', normalize-space(@class), ' '), ' post-content ')]",
+    "//*[@id='content']",
+]
+
+MIN_MAIN_TEXT = 200
+BLOCK_TAGS = ["p", "li", "pre", "td", "dd", "h2", "h3", "h4"]
+
+# Elements that start a new line in the plain-text output; everything else
+# (a, b, span, code, kbd ...) is inline and joined with its neighbours
+LINE_BREAK_TAGS = {
+    "p", "li", "div", "h1", "h2", "h3", "h4", "h5", "h6", "tr", "br",
+    "pre", "ul", "ol", "dl", "dt", "dd", "table", "blockquote",
+    "section", "article", "main",
+}
+
+# Below this many pages the pool start-up costs more than it saves
+MIN_POOL_BATCH = 16
+
+_PARSER = lxml.html.HTMLParser(remove_comments=True, encoding="utf-8")
+
+
+# =========================
+# PARSING
+# =========================
+def parse_html(html):
+    if isinstance(html, str):
+        html = html.encode("utf-8", errors="replace")
+    return lxml.html.document_fromstring(html, parser=_PARSER)
+
+
+def _text_of(node):
+    """Plain text with one line per block element; inline markup such as
+    "press <kbd>Ctrl+A</kbd> to accept" stays on one line."""
+    parts = []
+    for event, el in lxml.etree.iterwalk(node, events=("start", "end")):
+        if not isinstance(el.tag, str):
+            continue
+        if event == "start":
+            if el.tag in LINE_BREAK_TAGS:
+                parts.append("\n")
+            if el.text:
+                parts.append(el.text)
+        else:
+            if el.tag in LINE_BREAK_TAGS:
+                parts.append("\n")
+            if el.tail and el is not node:
+                parts.append(el.tail)
+
+    lines = (" ".join(line.split()) for line in "".join(parts).split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def _find_title(root, title_tags, default_title):
+    for tag in title_tags:
+        found = root.find(f".//{tag}")
+        if found is not None:
+            text = " ".join(found.text_content().split())
+            if text:
+                return text
+    return default_title
+
+
+def extract_links(root, base_url):
+    links = []
+    for href in root.xpath("//a/@href"):
+        href = href.strip()
+        if href and not href.startswith(("javascript:", "mailto:", "tel:")):
+            links.append(urljoin(base_url, href))
+    return links
+
+
+# =========================
+# CHROME REMOVAL
+# =========================
+def _is_chrome(el):
+    tokens = f"{el.get('class', '')} {el.get('id', '')}".lower().split()
+    return any(token in CHROME_HINTS for token in tokens)
+
+
+def strip_chrome_tags(node):
+    for el in node.xpath("|".join(f".//{tag}" for tag in CHROME_TAGS)):
+        if el.getparent() is not None:
+            el.drop_tree()
+
+
+def strip_chrome_hints(node):
+    total = len(node.text_content())
+    for el in node.xpath(".//*[@class or @id]"):
+        if el.tag == "body" or el.getparent() is None or not _is_chrome(el):
+            continue
+        if len(el.text_content()) > MAX_CHROME_SHARE * total:
+            continue
+        el.drop_tree()
+
+
+# =========================
+# MAIN CONTENT DETECTION
+# =========================
+def _densest_block(root):
+    """Readability-style fallback: credit each text block's parent (and half to
+    the grandparent) with its text length, and return the best scoring node."""
+    scores = {}
+    for block in root.xpath("|".join(f"//{tag}" for tag in BLOCK_TAGS)):
+        length = len(block.text_content().strip())
+        if length < 25:
+            continue
+        parent = block.getparent()
+        if parent is None:
+            continue
+        scores[parent] = scores.get(parent, 0) + length
+        grandparent = parent.getparent()
+        if grandparent is not None:
+            scores[grandparent] = scores.get(grandparent, 0) + length / 2
+
+    if not scores:
+        return None
+    return max(scores, key=scores.get)
+
+
+def find_article(root):
+    """The element the theme marks as the article body, if it holds enough text."""
+    for xpath in MAIN_CONTENT_XPATHS:
+        for node in root.xpath(xpath):
+            if len(node.text_content().strip()) >= MIN_MAIN_TEXT:
+                return node
+    return None
+
+
+def find_main_content(root):
+    node = find_article(root)
+    if node is not None:
+        return node
+
+    node = _densest_block(root)
+    if node is not None and len(node.text_content().strip()) >= MIN_MAIN_TEXT:
+        return node
+
+    body = root.find("body")
+    return body if body is not None else root
+
+
+# =========================
+# PAGE EXTRACTION
+# =========================
+def _to_markdown(node):
+    import html2text
+
+    h = html2text.HTML2Text()
+    h.ignore_links = False
+    h.ignore_images = True
+    h.ignore_emphasis = False
+    h.body_width = 0
+    return h.handle(lxml.html.tostring(node, encoding="unicode"))
+
+
+def extract_page(html, url="", markdown=False, with_links=False,
+                 title_tags=("h1", "title"), default_title="Untitled"):
+    """Return {"url", "title", "content"} (plus "links" when asked) for one page."""
+    root = parse_html(html)
+
+    title = _find_title(root, title_tags, default_title)
+    links = extract_links(root, url) if with_links else None
+
+    # Tag-level chrome goes before detection so menus cannot outscore the
+    # article. A marked-up article body is taken as is; only without one are
+    # class / id hints applied, so sidebars cannot win the density fallback.
+    strip_chrome_tags(root)
+    main = find_article(root)
+    if main is None:
+        strip_chrome_hints(root)
+        main = find_main_content(root)
+
+    content = _to_markdown(main) if markdown else _text_of(main)
+
+    page = {"url": url, "title": title, "content": content}
+    if with_links:
+        page["links"] = links
+    return page
+
+
+def _extract_one(args):
+    url, html, options = args
+    try:
+        return extract_page(html, url=url, **options)
+    except Exception as e:
+        print(f"❌ Error extracting {url}: {e}")
+        return None
+
+
+def extract_batch(pages, workers=None, chunksize=8, **options):
+    """Extract many (url, html) pairs, in order, across a process pool.
+
+    Returns one dict per input page, or None where extraction failed.
+    Keyword options are passed through to extract_page.
+    """
+    jobs = [(url, html, options) for url, html in pages]
+
+    if len(jobs) < MIN_POOL_BATCH or workers == 1:
+        return [_extract_one(job) for job in jobs]
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_extract_one, jobs, chunksize=chunksize))
+
+
+# =========================
+# FETCH + EXTRACT
+# =========================
+def scrape_tally_url(url, category="Additional", default_title="Unknown Title"):
+    """Scrape one Tally help URL into a tally_docs.json record (markdown body)."""
+    try:
+        response = requests.get(url, headers=HEADERS, timeout=30)
+        response.raise_for_status()
+
+        page = extract_page(
+            response.content,
+            url=url,
+            markdown=True,
+            title_tags=("title",),
+            default_title=default_title,
+        )
+
+        return {
+            "title": page["title"],
+            "content": page["content"],
+            "url": url,
+            "category": category,
+            "scraped_at": datetime.now().isoformat()
+        }
+
+    except Exception as e:
+        print(f"Error scraping {url}: {e}")
+        return None
@@ -0,0 +1,478 @@
+"""
+index_snapshot.py
+Single-file, versioned snapshot of the searchable state (no pickle).
+
+Layout:
+    8 bytes   magic  b"TQSNAP\\x00\\x01"
+    8 bytes   header length (little-endian u64)
+    header    JSON: format_version, manifest, sections, checksum
+    payload   64-byte aligned sections:
+              vectors            float32 (count, dim)
+              ids / texts / meta.<key>
+                                 string columns: <name>.offsets (u64, count+1)
+                                 + <name>.data (utf-8 bytes)
+              pages.*            optional document-level index: one title +
+                                 summary vector per page, its [start, end)
+                                 chunk rows and source/title/topic/text
+
+The manifest records the embedding model, chunk params and corpus hash; the
+checksum is the sha256 of the payload. With a partition key (the pipeline
+uses "topic") rows are grouped by that metadata value and the manifest maps
+each value to its contiguous [start, end) row range. Loading maps the file and slices
+numpy views out of it, so it takes milliseconds regardless of index size.
+
+Usage:
+    python index_snapshot.py export --chroma ./tally_chroma_db --out tally_index.snap
+    python index_snapshot.py verify tally_index.snap
+    python index_snapshot.py import tally_index.snap --chroma ./tally_chroma_db_new
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+from datetime import datetime
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from embedding_cache import EMBEDDING_MODEL
+
+MAGIC = b"TQSNAP\x00\x01"
+FORMAT_VERSION = 1
+ALIGN = 64
+SNAPSHOT_FILE = "tally_index.snap"
+PAGE_COLLECTION = "tally_pages"  # Chroma collection holding the document-level index
+PAGE_METADATA = ("source", "title", "topic")
+
+
+def _pad(n):
+    return (-n) % ALIGN
+
+
+def _string_column(values):
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    offsets[1:] = np.cumsum([len(e) for e in encoded], dtype=np.uint64)
+    return offsets, b"".join(encoded)
+
+
+# =========================
+# WRITE
+# =========================
+def _group_rows(ids, texts, metadatas, vectors, keys):
+    """Stable-sort rows by the given metadata keys so equal values of each
+    key occupy one contiguous run; returns the reordered columns."""
+    values = [tuple(str((m or {}).get(k) or "") for k in keys) for m in metadatas]
+    order = sorted(range(len(values)), key=values.__getitem__)
+    return (
+        [ids[i] for i in order],
+        [texts[i] for i in order],
+        [metadatas[i] for i in order],
+        vectors[order],
+    )
+
+
+def _runs(values):
+    """{value: [start, end)} for a column whose equal values are contiguous."""
+    runs = {}
+    for row, value in enumerate(values):
+        runs.setdefault(value, [row, row])[1] = row + 1
+    return runs
+
+
+def write_snapshot(path, ids, texts, metadatas, vectors, manifest, partition_key=None,
+                   pages=None, page_vectors=None):
+    """pages (optional) is the document-level index: one {"text", "metadata":
+    {source, title, topic}} entry per page, with page_vectors alongside."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    count = len(ids)
+    if vectors.shape[0] != count or len(texts) != count or len(metadatas) != count:
+        raise ValueError("ids, texts, metadatas and vectors must have the same length")
+
+    manifest = dict(manifest)
+    group_keys = [
+        key for key in (partition_key, "source" if pages else None)
+        if key and any(key in (m or {}) for m in metadatas)
+    ]
+    if group_keys:
+        ids, texts, metadatas, vectors = _group_rows(ids, texts, metadatas, vectors, group_keys)
+    if partition_key in group_keys:
+        partitions = _runs([str(m.get(partition_key) or "") for m in metadatas])
+        manifest.update(partition_key=partition_key, partitions=partitions)
+
+    columns = {"ids": list(ids), "texts": list(texts)}
+    meta_keys = sorted({k for m in metadatas for k in (m or {})})
+    for key in meta_keys:
+        columns[f"meta.{key}"] = ["" if (m or {}).get(key) is None else str(m[key]) for m in metadatas]
+
+    blobs = [("vectors", "float32", list(vectors.shape), vectors.tobytes())]
+    for name, values in columns.items():
+        offsets, data = _string_column(values)
+        blobs.append((f"{name}.offsets", "uint64", [count + 1], offsets.tobytes()))
+        blobs.append((f"{name}.data", "uint8", [len(data)], data))
+
+    if pages:
+        page_vectors = np.ascontiguousarray(page_vectors, dtype=np.float32)
+        chunk_rows = _runs([(m or {}).get("source", "") for m in metadatas])
+        rows = np.array([chunk_rows.get(p["metadata"]["source"], [0, 0]) for p in pages], dtype=np.uint64)
+        blobs.append(("pages.vectors", "float32", list(page_vectors.shape), page_vectors.tobytes()))
+        blobs.append(("pages.rows", "uint64", list(rows.shape), rows.tobytes()))
+        page_columns = {key: [str(p["metadata"].get(key) or "") for p in pages] for key in PAGE_METADATA}
+        page_columns["text"] = [p["text"] for p in pages]
+        for key, values in page_columns.items():
+            offsets, data = _string_column(values)
+            blobs.append((f"pages.{key}.offsets", "uint64", [len(pages) + 1], offsets.tobytes()))
+            blobs.append((f"pages.{key}.data", "uint8", [len(data)], data))
+        manifest["pages"] = len(pages)
+
+    sections = {}
+    payload_offset = 0
+    for name, dtype, shape, blob in blobs:
+        sections[name] = {"offset": payload_offset, "length": len(blob), "dtype": dtype, "shape": shape}
+        payload_offset += len(blob) + _pad(len(blob))
+
+    digest = hashlib.sha256()
+    for _, _, _, blob in blobs:
+        digest.update(blob)
+        digest.update(b"\x00" * _pad(len(blob)))
+
+    manifest.update(count=count, dim=int(vectors.shape[1]) if count else 0,
+                    metadata_keys=meta_keys, created_at=datetime.now().isoformat())
+
+    header = json.dumps({
+        "format_version": FORMAT_VERSION,
+        "manifest": manifest,
+        "sections": sections,
+        "checksum": digest.hexdigest(),
+    }).encode("utf-8")
+    header += b" " * _pad(len(MAGIC) + 8 + len(header))
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for _, _, _, blob in blobs:
+            f.write(blob)
+            f.write(b"\x00" * _pad(len(blob)))
+    os.replace(tmp, path)
+
+    print(f"📦 Snapshot written: {path} ({count} vectors)")
+    return manifest
+
+
+# =========================
+# READ
+# =========================
+class StringColumn:
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self.data[int(self.offsets[i]):int(self.offsets[i + 1])]).decode("utf-8")
+
+
+class Snapshot:
+    """Memory-mapped snapshot; every array is a read-only view into the file."""
+
+    def __init__(self, path, verify=False):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a Tally index snapshot")
+
+        (header_len,) = struct.unpack("<Q", self._map[len(MAGIC):len(MAGIC) + 8])
+        self.payload_start = len(MAGIC) + 8 + header_len
+        header = json.loads(self._map[len(MAGIC) + 8:self.payload_start])
+
+        if header["format_version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {header['format_version']}")
+
+        self.manifest = header["manifest"]
+        self.checksum = header["checksum"]
+        self.sections = header["sections"]
+
+        if verify:
+            self.verify()
+
+        self.vectors = self._array("vectors")
+        self.ids = self._strings("ids")
+        self.texts = self._strings("texts")
+        self.metadata = {
+            key: self._strings(f"meta.{key}") for key in self.manifest["metadata_keys"]
+        }
+
+        # Document-level index (title + summary per page), if one was written
+        self.page_vectors = self.page_rows = None
+        self.page_columns = {}
+        if "pages.vectors" in self.sections:
+            self.page_vectors = self._array("pages.vectors")
+            self.page_rows = self._array("pages.rows")
+            self.page_columns = {key: self._strings(f"pages.{key}") for key in PAGE_METADATA + ("text",)}
+
+    def __len__(self):
+        return self.manifest["count"]
+
+    def _array(self, name):
+        section = self.sections[name]
+        dtype = np.dtype(section["dtype"])
+        array = np.frombuffer(
+            self._map,
+            dtype=dtype,
+            count=section["length"] // dtype.itemsize,
+            offset=self.payload_start + section["offset"],
+        )
+        return array.reshape(section["shape"])
+
+    def _strings(self, name):
+        return StringColumn(self._array(f"{name}.offsets"), self._array(f"{name}.data"))
+
+    def verify(self):
+        digest = hashlib.sha256()
+        view = memoryview(self._map)[self.payload_start:]
+        for start in range(0, len(view), 1 << 24):
+            digest.update(view[start:start + (1 << 24)])
+        view.release()
+        if digest.hexdigest() != self.checksum:
+            raise ValueError(f"Snapshot checksum mismatch: {self.path}")
+        return True
+
+    def metadata_at(self, i):
+        return {key: column[i] for key, column in self.metadata.items()}
+
+    def document(self, i):
+        return Document(id=self.ids[i], page_content=self.texts[i], metadata=self.metadata_at(i))
+
+
+def load_snapshot(path=SNAPSHOT_FILE, verify=False):
+    return Snapshot(path, verify=verify)
+
+
+# =========================
+# VECTOR STORE
+# =========================
+class SnapshotVectorStore(VectorStore):
+    """Read-only vector store over a Snapshot. Scores are squared L2
+    distances (lower is closer), matching the Chroma collections we build."""
+
+    def __init__(self, snapshot, embedding):
+        self.snapshot = snapshot
+        self._embedding = embedding
+        self._norms = np.einsum("ij,ij->i", snapshot.vectors, snapshot.vectors)
+
+        self._page_norms = self._page_topics = None
+        self._page_index = {}
+        if snapshot.page_vectors is not None:
+            pages = snapshot.page_columns
+            self._page_norms = np.einsum("ij,ij->i", snapshot.page_vectors, snapshot.page_vectors)
+            self._page_topics = np.array([pages["topic"][i] for i in range(len(pages["topic"]))])
+            self._page_index = {pages["source"][i]: i for i in range(len(pages["source"]))}
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    def count(self):
+        return len(self.snapshot)
+
+    def partitions(self):
+        return self.snapshot.manifest.get("partitions", {})
+
+    def has_pages(self):
+        return self._page_norms is not None
+
+    def _rows(self, filter=None):
+        """Rows matching a Chroma-style filter: a slice for the whole index or
+        for {partition_key: value}, an index array for the chunks of
+        {"source": {"$in": [...]}} pages (needs the page table)."""
+        if not filter:
+            return slice(0, len(self.snapshot))
+
+        key = self.snapshot.manifest.get("partition_key")
+        if list(filter) == [key] and not isinstance(filter[key], dict):
+            return slice(*self.partitions().get(str(filter[key]), (0, 0)))
+
+        sources = filter.get("source", {}).get("$in") if list(filter) == ["source"] else None
+        if sources is None or not self.has_pages():
+            raise ValueError(f"Snapshot stores can only filter on {key} or on source $in (with a page table)")
+
+        ranges = [self.snapshot.page_rows[self._page_index[s]] for s in sources if s in self._page_index]
+        return np.concatenate([np.arange(a, b) for a, b in ranges] or [np.zeros(0)]).astype(np.int64)
+
+    def _distances(self, query_vector, rows=slice(None)):
+        q = np.asarray(query_vector, dtype=np.float32)
+        return self._norms[rows] - 2 * (self.snapshot.vectors[rows] @ q) + q @ q
+
+    def _nearest(self, query_vector, k, filter=None):
+        """(global row ids, distances) of the k nearest rows, nearest first."""
+        rows = self._rows(filter)
+        distances = self._distances(query_vector, rows)
+        k = min(k, len(distances))
+        if k == 0:
+            return np.zeros(0, dtype=np.int64), distances[:0]
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top])]
+        ids = rows.start + top if isinstance(rows, slice) else rows[top]
+        return ids, distances[top]
+
+    def search_pages(self, embedding, m=10, filter=None):
+        """Document-level search: sources of the m nearest page summaries,
+        optionally only pages whose topic matches a {partition_key: value}
+        filter."""
+        q = np.asarray(embedding, dtype=np.float32)
+        distances = self._page_norms - 2 * (self.snapshot.page_vectors @ q) + q @ q
+        if filter:
+            key = self.snapshot.manifest.get("partition_key")
+            distances = np.where(self._page_topics == str(filter.get(key)), distances, np.inf)
+
+        m = min(m, int(np.isfinite(distances).sum()))
+        if m == 0:
+            return []
+        top = np.argpartition(distances, m - 1)[:m]
+        top = top[np.argsort(distances[top])]
+        return [self.snapshot.page_columns["source"][int(i)] for i in top]
+
+    def search_with_vectors(self, embedding, k=4, filter=None):
+        """Nearest k as (docs, distances, vectors): one scan, no re-query."""
+        rows, distances = self._nearest(embedding, k, filter)
+        return (
+            [self.snapshot.document(int(i)) for i in rows],
+            distances.tolist(),
+            self.snapshot.vectors[rows],
+        )
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4, filter=None):
+        docs, distances, _ = self.search_with_vectors(embedding, k, filter)
+        return list(zip(docs, distances))
+
+    def similarity_search_with_score(self, query, k=4, filter=None, **kwargs):
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k, filter)
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, filter)]
+
+    def similarity_search(self, query, k=4, filter=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def max_marginal_relevance_search(self, query, k=4, fetch_k=20, lambda_mult=0.5, filter=None, **kwargs):
+        from langchain_core.vectorstores.utils import maximal_marginal_relevance
+
+        query_vector = np.asarray(self._embedding.embed_query(query), dtype=np.float32)
+        candidates, _ = self._nearest(query_vector, fetch_k, filter)
+        if len(candidates) == 0:
+            return []
+        picked = maximal_marginal_relevance(
+            query_vector, self.snapshot.vectors[candidates], lambda_mult=lambda_mult, k=k
+        )
+        return [self.snapshot.document(int(candidates[i])) for i in picked]
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        raise NotImplementedError("Snapshots are built with index_snapshot.py export")
+
+
+# =========================
+# EXPORT / IMPORT
+# =========================
+def export_from_chroma(persist_directory, out_path, manifest=None, partition_key="topic"):
+    from langchain_chroma import Chroma
+
+    store = Chroma(persist_directory=persist_directory)
+    data = store._collection.get(include=["documents", "metadatas", "embeddings"])
+
+    pages = page_vectors = None
+    if PAGE_COLLECTION in [getattr(c, "name", c) for c in store._client.list_collections()]:
+        page_data = store._client.get_collection(PAGE_COLLECTION).get(
+            include=["documents", "metadatas", "embeddings"]
+        )
+        pages = [
+            {"id": id_, "text": text, "metadata": metadata}
+            for id_, text, metadata in zip(page_data["ids"], page_data["documents"], page_data["metadatas"])
+        ]
+        page_vectors = np.asarray(page_data["embeddings"], dtype=np.float32)
+
+    manifest = dict(manifest or {})
+    manifest.setdefault("source", persist_directory)
+    manifest.setdefault("embedding_model", EMBEDDING_MODEL)
+    key_file = os.path.join(persist_directory, ".ingest_key")
+    if os.path.exists(key_file):
+        with open(key_file, "r", encoding="utf-8") as f:
+            manifest.setdefault("index_key", f.read().strip())
+
+    return write_snapshot(
+        out_path,
+        data["ids"],
+        data["documents"],
+        data["metadatas"],
+        np.asarray(data["embeddings"], dtype=np.float32),
+        manifest,
+        partition_key=partition_key,
+        pages=pages,
+        page_vectors=page_vectors,
+    )
+
+
+def import_to_chroma(snapshot_path, persist_directory):
+    from ingest_pipeline import build_chroma_index, page_id
+
+    snapshot = load_snapshot(snapshot_path, verify=True)
+    chunks = [
+        {"id": snapshot.ids[i], "text": snapshot.texts[i], "metadata": snapshot.metadata_at(i)}
+        for i in range(len(snapshot))
+    ]
+    count = build_chroma_index(chunks, np.array(snapshot.vectors), persist_directory)
+
+    if snapshot.page_vectors is not None:
+        columns = snapshot.page_columns
+        pages = [
+            {
+                "id": page_id(columns["source"][i]),
+                "text": columns["text"][i],
+                "metadata": {key: columns[key][i] for key in PAGE_METADATA},
+            }
+            for i in range(len(snapshot.page_vectors))
+        ]
+        build_chroma_index(pages, np.array(snapshot.page_vectors), persist_directory, PAGE_COLLECTION)
+    print(f"✅ Imported {count} vectors into {persist_directory}")
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tally index snapshots")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export")
+    export.add_argument("--chroma", default="./tally_chroma_db")
+    export.add_argument("--out", default=SNAPSHOT_FILE)
+
+    verify = sub.add_parser("verify")
+    verify.add_argument("path", nargs="?", default=SNAPSHOT_FILE)
+
+    imp = sub.add_parser("import")
+    imp.add_argument("path", nargs="?", default=SNAPSHOT_FILE)
+    imp.add_argument("--chroma", default="./tally_chroma_db_new")
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_from_chroma(args.chroma, args.out)
+    elif args.command == "verify":
+        snapshot = load_snapshot(args.path, verify=True)
+        print(f"✅ {args.path}: {len(snapshot)} vectors, checksum OK")
+        print(json.dumps(snapshot.manifest, indent=2))
+    else:
+        import_to_chroma(args.path, args.chroma)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,445 @@
+"""
+ingest_pipeline.py
+Single staged pipeline that rebuilds the knowledge base:
+
+    crawl -> clean -> dedupe -> chunk -> embed -> index
+                      dedupe -> pages -> page_embed -> index
+                      dedupe -> lookup -> lookup_index.json
+
+The pages branch is the document-level index (one title + summary vector
+per page) used for coarse-to-fine retrieval. The lookup branch extracts the
+shortcut / menu path / GST form table (lookup_index.py), stamped with the
+index key like the warm cache.
+
+After a rebuild, index_changes.json lists the source URLs whose content
+changed, or that were removed or added, since the previous run. The server
+uses it to invalidate only the cached answers built from those pages.
+
+Every stage writes a content-addressed artifact to .ingest_cache/, keyed by
+its upstream artifact key plus its own parameters. A stage whose key already
+has an artifact is skipped (and not even loaded unless a later stage needs
+it), so changing only the chunk size re-runs chunk, embed and index.
+
+Usage:
+    python ingest_pipeline.py                      # rebuild ./tally_chroma_db
+    python ingest_pipeline.py --crawl              # run prime_scraper first
+    python ingest_pipeline.py --chunk-size 800 --chunk-overlap 150
+    python ingest_pipeline.py --output ./tally_chroma_db_new
+    python ingest_pipeline.py --snapshot tally_index.snap   # also the default
+    python ingest_pipeline.py --lookup-index ''             # skip the lookup table
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from collections import Counter
+
+import numpy as np
+
+from answer_cache import INDEX_CHANGES_FILE, save_index_changes
+from boilerplate import BLOCK_FRACTION, BOILERPLATE_VERSION, LINE_FRACTION, strip_boilerplate
+from clean_tally_docs import FILTER_RULES_VERSION, filter_docs
+from embedding_cache import CachedEmbeddings, EMBEDDING_MODEL
+from index_snapshot import PAGE_COLLECTION, SNAPSHOT_FILE, load_snapshot, write_snapshot
+from lookup_index import LOOKUP_INDEX_FILE, LOOKUP_INDEX_VERSION, build_lookup_table, save_lookup_index
+from near_dedupe import BANDS, NUM_PERM, THRESHOLD, dedupe_near_duplicates
+from topics import PAGE_TOPICS, page_topic
+
+DOCS_FILE = "tally_docs.json"
+CACHE_DIR = ".ingest_cache"
+PERSIST_DIR = "./tally_chroma_db"
+INDEX_KEY_FILE = ".ingest_key"
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+SUMMARY_CHARS = 400
+
+CHROMA_BATCH = 4000  # below chromadb's max batch size
+
+
+def _hash(payload):
+    if not isinstance(payload, bytes):
+        payload = json.dumps(payload, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+# =========================
+# ARTIFACT STORE
+# =========================
+def _write_atomic(path, write):
+    tmp = path + ".tmp"
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def save_artifact(path, value):
+    if path.endswith(".npy"):
+        def write(tmp):
+            with open(tmp, "wb") as f:
+                np.save(f, value)
+    else:
+        def write(tmp):
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+    _write_atomic(path, write)
+
+
+def load_artifact(path):
+    if path.endswith(".npy"):
+        return np.load(path)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class Stage:
+    """One pipeline step. The key is known without running anything; the
+    result is loaded from cache or computed (pulling upstream) on demand."""
+
+    def __init__(self, name, fn, params, upstream=None, ext="json",
+                 cache_dir=CACHE_DIR, force=False, key=None):
+        self.name = name
+        self.fn = fn
+        self.params = params
+        self.upstream = upstream
+        self.ext = ext
+        self.cache_dir = cache_dir
+        self.force = force
+        self.key = key or _hash({
+            "stage": name,
+            "input": upstream.key if upstream else None,
+            "params": params,
+        })
+        self._result = None
+        self._loaded = False
+
+    @property
+    def path(self):
+        return os.path.join(self.cache_dir, f"{self.name}-{self.key}.{self.ext}")
+
+    def is_cached(self):
+        return not self.force and os.path.exists(self.path)
+
+    def result(self):
+        if self._loaded:
+            return self._result
+
+        if self.is_cached():
+            print(f"⏭️  {self.name}: cached ({self.key})")
+            self._result = load_artifact(self.path)
+        else:
+            print(f"⚙️  {self.name}: running ({self.key})")
+            data = self.upstream.result() if self.upstream else None
+            self._result = self.fn(data, **self.params)
+            save_artifact(self.path, self._result)
+
+        self._loaded = True
+        return self._result
+
+
+# =========================
+# STAGES
+# =========================
+def crawl_stage(_, docs_file):
+    with open(docs_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def clean_stage(docs, line_fraction, block_fraction, rules_version):
+    # rules_version only keys the artifact to the filter / boilerplate code
+    # Pages added by hand (add_specific_urls.py & co.) carry their own category
+    # and are often search URLs, which the crawl filters would throw away
+    curated = [d for d in docs if d.get("category", "TallyPrime") not in ("TallyPrime", "")]
+    crawled = [d for d in docs if d.get("category", "TallyPrime") in ("TallyPrime", "")]
+
+    clean_docs, removed = filter_docs(crawled)
+    clean_docs += curated
+    clean_docs, report = strip_boilerplate(clean_docs, line_fraction, block_fraction)
+    print(f"   removed {len(removed)} pages, {report['bytes_removed']} boilerplate bytes")
+    return clean_docs
+
+
+def dedupe_stage(docs, threshold, bands, num_perm):
+    kept, clusters = dedupe_near_duplicates(docs, threshold, bands, num_perm)
+    print(f"   merged {len(docs) - len(kept)} near-duplicates in {len(clusters)} clusters")
+    return kept
+
+
+def chunk_id(source, index, text):
+    return _hash(f"{source}\n{index}\n{text}".encode("utf-8"))
+
+
+def chunk_stage(docs, chunk_size, chunk_overlap, topic_rules):
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+    )
+
+    chunks = []
+    for doc in docs:
+        source = doc["url"]
+        topic = page_topic(doc, topic_rules)
+        for i, text in enumerate(splitter.split_text(doc["content"])):
+            chunks.append({
+                "id": chunk_id(source, i, text),
+                "text": text,
+                "metadata": {
+                    "source": source,
+                    "title": doc.get("title", ""),
+                    "category": doc.get("category", ""),
+                    "topic": topic,
+                },
+            })
+
+    topics = Counter(c["metadata"]["topic"] for c in chunks)
+    print(f"   {len(chunks)} chunks", dict(topics))
+    return chunks
+
+
+def page_id(source):
+    return _hash(source.encode("utf-8"))
+
+
+def page_summary(doc, summary_chars):
+    """Title plus the lead of the page, cut at a sentence end when possible."""
+    lead = " ".join(doc["content"].split())[:summary_chars]
+    end = lead.rfind(". ")
+    if end > summary_chars // 2:
+        lead = lead[:end + 1]
+    return f"{doc.get('title', '')}\n{lead}"
+
+
+def pages_stage(docs, summary_chars, topic_rules):
+    pages = [
+        {
+            "id": page_id(doc["url"]),
+            "text": page_summary(doc, summary_chars),
+            "metadata": {
+                "source": doc["url"],
+                "title": doc.get("title", ""),
+                "topic": page_topic(doc, topic_rules),
+            },
+        }
+        for doc in docs
+    ]
+    print(f"   {len(pages)} page summaries")
+    return pages
+
+
+def lookup_stage(docs, version):
+    # version only keys the cached table to the extractor that built it
+    entries = build_lookup_table(docs)
+    print(f"   {len(entries)} lookup entries", dict(Counter(e["kind"] for e in entries)))
+    return entries
+
+
+def embed_stage(chunks, model_name):
+    # Chunk texts shared with earlier builds come straight from the cache
+    embeddings = CachedEmbeddings(model_name)
+    return embeddings.embed_documents_array([c["text"] for c in chunks])
+
+
+def build_chroma_index(chunks, vectors, persist_directory, collection_name=None):
+    from langchain_chroma import Chroma
+
+    options = {"collection_name": collection_name} if collection_name else {}
+    store = Chroma(persist_directory=persist_directory, **options)
+    for start in range(0, len(chunks), CHROMA_BATCH):
+        batch = chunks[start:start + CHROMA_BATCH]
+        store._collection.add(
+            ids=[c["id"] for c in batch],
+            documents=[c["text"] for c in batch],
+            metadatas=[c["metadata"] for c in batch],
+            embeddings=vectors[start:start + CHROMA_BATCH].tolist(),
+        )
+    return store._collection.count()
+
+
+def index_stage(stages, persist_directory, force=False):
+    """Build the Chroma directory next to the target and swap it in, so a
+    failed build never leaves a half-written index behind."""
+    key = _hash({
+        "chunks": stages["chunk"].key,
+        "vectors": stages["embed"].key,
+        "pages": stages["pages"].key,
+        "page_vectors": stages["page_embed"].key,
+    })
+    key_file = os.path.join(persist_directory, INDEX_KEY_FILE)
+
+    if os.path.exists(key_file) and not force:
+        with open(key_file, "r", encoding="utf-8") as f:
+            if f.read().strip() == key:
+                print(f"⏭️  index: {persist_directory} up to date ({key})")
+                return key
+
+    print(f"⚙️  index: building {persist_directory} ({key})")
+    chunks = stages["chunk"].result()
+    vectors = stages["embed"].result()
+
+    building = persist_directory.rstrip("/\\") + ".building"
+    if os.path.exists(building):
+        shutil.rmtree(building)
+
+    count = build_chroma_index(chunks, vectors, building)
+    build_chroma_index(stages["pages"].result(), stages["page_embed"].result(), building, PAGE_COLLECTION)
+    with open(os.path.join(building, INDEX_KEY_FILE), "w", encoding="utf-8") as f:
+        f.write(key)
+
+    if os.path.exists(persist_directory):
+        shutil.rmtree(persist_directory)
+    os.replace(building, persist_directory)
+
+    print(f"   {count} vectors in {persist_directory}")
+    return key
+
+
+def snapshot_stage(stages, index_key, snapshot_path):
+    """Write the portable snapshot for this index unless it is already current."""
+    if os.path.exists(snapshot_path):
+        try:
+            if load_snapshot(snapshot_path).manifest.get("index_key") == index_key:
+                print(f"⏭️  snapshot: {snapshot_path} up to date ({index_key})")
+                return
+        except ValueError:
+            pass
+
+    chunks = stages["chunk"].result()
+    write_snapshot(
+        snapshot_path,
+        [c["id"] for c in chunks],
+        [c["text"] for c in chunks],
+        [c["metadata"] for c in chunks],
+        stages["embed"].result(),
+        {
+            "embedding_model": stages["embed"].params["model_name"],
+            "chunk_size": stages["chunk"].params["chunk_size"],
+            "chunk_overlap": stages["chunk"].params["chunk_overlap"],
+            "summary_chars": stages["pages"].params["summary_chars"],
+            "corpus_hash": stages["crawl"].key,
+            "index_key": index_key,
+        },
+        partition_key="topic",
+        pages=stages["pages"].result(),
+        page_vectors=stages["page_embed"].result(),
+    )
+
+
+# =========================
+# PIPELINE
+# =========================
+def build_stages(docs_file=DOCS_FILE, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP,
+                 model_name=EMBEDDING_MODEL, dedupe_threshold=THRESHOLD,
+                 summary_chars=SUMMARY_CHARS, cache_dir=CACHE_DIR, force=False):
+    os.makedirs(cache_dir, exist_ok=True)
+    common = {"cache_dir": cache_dir, "force": force}
+
+    with open(docs_file, "rb") as f:
+        corpus_key = _hash(f.read())
+
+    crawl = Stage("crawl", crawl_stage, {"docs_file": docs_file}, key=corpus_key, **common)
+    clean = Stage("clean", clean_stage, {"line_fraction": LINE_FRACTION, "block_fraction": BLOCK_FRACTION,
+                                         "rules_version": [FILTER_RULES_VERSION, BOILERPLATE_VERSION]},
+                  upstream=crawl, **common)
+    dedupe = Stage("dedupe", dedupe_stage, {"threshold": dedupe_threshold, "bands": BANDS, "num_perm": NUM_PERM},
+                   upstream=clean, **common)
+    chunk = Stage("chunk", chunk_stage, {"chunk_size": chunk_size, "chunk_overlap": chunk_overlap,
+                                         "topic_rules": PAGE_TOPICS},
+                  upstream=dedupe, **common)
+    embed = Stage("embed", embed_stage, {"model_name": model_name}, upstream=chunk, ext="npy", **common)
+    pages = Stage("pages", pages_stage, {"summary_chars": summary_chars, "topic_rules": PAGE_TOPICS},
+                  upstream=dedupe, **common)
+    page_embed = Stage("page_embed", embed_stage, {"model_name": model_name}, upstream=pages, ext="npy", **common)
+    lookup = Stage("lookup", lookup_stage, {"version": LOOKUP_INDEX_VERSION}, upstream=dedupe, **common)
+
+    return {"crawl": crawl, "clean": clean, "dedupe": dedupe, "chunk": chunk, "embed": embed,
+            "pages": pages, "page_embed": page_embed, "lookup": lookup}
+
+
+def page_hashes(docs):
+    return {doc["url"]: _hash({"title": doc.get("title", ""), "content": doc["content"]}) for doc in docs}
+
+
+def changes_stage(stages, previous_run, index_key, changes_path):
+    """Diff this run's pages against the previous run's (if its dedupe
+    artifact is still cached) and write changes_path."""
+    previous_index = previous_run.get("index")
+    if not previous_index or previous_index == index_key:
+        return
+    previous_path = os.path.join(stages["dedupe"].cache_dir, f"dedupe-{previous_run.get('dedupe')}.json")
+    if not os.path.exists(previous_path):
+        print(f"ℹ️  changes: previous pages not cached; {changes_path} not written")
+        return
+
+    before = page_hashes(load_artifact(previous_path))
+    after = page_hashes(stages["dedupe"].result())
+    changed = [url for url in after if url in before and before[url] != after[url]]
+    removed = [url for url in before if url not in after]
+    added = [url for url in after if url not in before]
+
+    save_index_changes(changes_path, previous_index, index_key, changed, removed, added)
+    print(f"   {len(changed)} changed, {len(removed)} removed, {len(added)} added pages -> {changes_path}")
+
+
+def run_pipeline(output=PERSIST_DIR, crawl=False, snapshot=SNAPSHOT_FILE, lookup_index=LOOKUP_INDEX_FILE,
+                 changes=INDEX_CHANGES_FILE, **options):
+    if crawl:
+        import prime_scraper
+        prime_scraper.main()
+
+    last_run_path = os.path.join(options.get("cache_dir", CACHE_DIR), "last_run.json")
+    previous_run = load_artifact(last_run_path) if os.path.exists(last_run_path) else {}
+
+    stages = build_stages(**options)
+    index_key = index_stage(stages, output, force=options.get("force", False))
+    if snapshot:
+        snapshot_stage(stages, index_key, snapshot)
+    if lookup_index:
+        save_lookup_index(lookup_index, stages["lookup"].result(), index_key)
+    if changes:
+        changes_stage(stages, previous_run, index_key, changes)
+
+    manifest = {name: stage.key for name, stage in stages.items()}
+    manifest["index"] = index_key
+    manifest["output"] = output
+    manifest["snapshot"] = snapshot
+    manifest["lookup_index"] = lookup_index
+    save_artifact(last_run_path, manifest)
+
+    print("✅ Knowledge base up to date:", output)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the Tally knowledge base")
+    parser.add_argument("--crawl", action="store_true", help="run prime_scraper before ingesting")
+    parser.add_argument("--docs-file", default=DOCS_FILE)
+    parser.add_argument("--output", default=PERSIST_DIR)
+    parser.add_argument("--snapshot", default=SNAPSHOT_FILE, help="portable snapshot path ('' to skip)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--chunk-overlap", type=int, default=CHUNK_OVERLAP)
+    parser.add_argument("--changes", default=INDEX_CHANGES_FILE, help="changed-pages report for the server ('' to skip)")
+    parser.add_argument("--lookup-index", default=LOOKUP_INDEX_FILE, help="shortcut/path lookup table ('' to skip)")
+    parser.add_argument("--summary-chars", type=int, default=SUMMARY_CHARS, help="page summary length for the coarse index")
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--force", action="store_true", help="ignore cached artifacts")
+    args = parser.parse_args()
+
+    run_pipeline(
+        output=args.output,
+        crawl=args.crawl,
+        snapshot=args.snapshot,
+        lookup_index=args.lookup_index,
+        changes=args.changes,
+        docs_file=args.docs_file,
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        summary_chars=args.summary_chars,
+        model_name=args.model,
+        force=args.force,
+    )
+
+
+if __name__ == "__main__":
+    main()
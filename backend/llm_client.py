@@ -0,0 +1,396 @@
+"""
+llm_client.py
+Answer generation through the Anthropic SDK with a cached prompt prefix,
+hedged streaming requests, retries and a circuit breaker.
+
+Prompt: the fixed instructions are sent as a system block carrying a
+cache_control breakpoint; only the retrieved context and the question (the
+user turn) change between calls. Every call returns the API's token usage,
+including cache_creation_input_tokens / cache_read_input_tokens.
+
+Tail latency:
+    - Requests are streamed. If the first token has not arrived within the
+      HEDGE_PERCENTILE of recent time-to-first-token, an identical hedge
+      request is fired; whichever streams first wins and the other is
+      closed.
+    - 429 / 5xx / connection errors are retried with full-jitter
+      exponential backoff (honouring retry-after), within the deadline.
+    - After BREAKER_THRESHOLD consecutive failures the circuit opens and
+      calls fail fast with CircuitOpenError for BREAKER_COOLDOWN seconds,
+      then one trial call is let through.
+metrics() reports counters and latency percentiles for /metrics.
+
+The SDK honours ANTHROPIC_BASE_URL, so pointing it at stub_anthropic.py
+records exactly what would be sent (and can inject delays and errors).
+"""
+import os
+import queue
+import random
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+MODEL = os.getenv("ANTHROPIC_MODEL", "claude-3-haiku-20240307")
+MAX_TOKENS = int(os.getenv("ANTHROPIC_MAX_TOKENS", "1024"))
+
+HEDGING = os.getenv("LLM_HEDGING", "1") != "0"
+HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "90"))
+HEDGE_DEFAULT_DELAY = 3.0           # until MIN_SAMPLES first-token times are known
+HEDGE_MIN_DELAY = 0.5
+HEDGE_MAX_DELAY = 8.0
+MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+REQUEST_TIMEOUT = 30.0              # per HTTP attempt
+DEADLINE = float(os.getenv("LLM_DEADLINE", "17"))  # whole call, inside server.py's 20 s
+
+BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+SYSTEM_PROMPT = """You are a professional TallyPrime documentation assistant.
+
+Strict Instructions:
+
+1. If the question is procedural (how to, detailed, steps, process, configure, setup, create):
+- Provide clear step-by-step instructions.
+- Include exact navigation paths (e.g., Gateway of Tally > Vouchers > Ctrl+F4 (Payroll)).
+- Include keyboard shortcuts.
+- Use numbered steps.
+- Be practical, not descriptive.
+- Avoid marketing language.
+- Avoid generic feature explanations.
+
+2. If the question is conceptual:
+- Provide structured explanation with headings.
+
+3. Use only information from the provided context.
+4. Do not invent steps.
+5. Do not give high-level summaries when detailed steps are possible.
+Do not repeat the same information.
+Do not restate identical steps.
+Avoid duplication.
+
+Format:
+
+SHORT_ANSWER:
+(Concise summary in 2–3 lines)
+(Avoid long answer content here)
+LONG_ANSWER:
+(Detailed step-by-step explanation if applicable)"""
+
+# Trimmed variants per question class (question_classifier.PROFILES)
+FORMAT_RULES = """Use only information from the provided context. Do not invent steps or menu paths.
+
+Format:
+
+SHORT_ANSWER:
+(Concise summary in 2–3 lines)
+LONG_ANSWER:
+{long_answer}"""
+
+PROMPTS = {
+    "procedural": """You are a professional TallyPrime documentation assistant.
+
+Answer with clear, practical step-by-step instructions:
+- Numbered steps.
+- Exact navigation paths (e.g., Gateway of Tally > Vouchers > Ctrl+F4 (Payroll)).
+- Keyboard shortcuts.
+- No marketing language, no generic feature explanations, no repeated steps.
+
+""" + FORMAT_RULES.format(long_answer="(Detailed step-by-step explanation)"),
+
+    "conceptual": """You are a professional TallyPrime documentation assistant.
+
+Explain the concept briefly with a short structured answer (a heading or two,
+a few bullets). Mention where it is found in TallyPrime if the context says so.
+
+""" + FORMAT_RULES.format(long_answer="(Short structured explanation, at most ~200 words)"),
+
+    "lookup": """You are a professional TallyPrime documentation assistant.
+
+The question asks for one fact (a shortcut, a menu path, a form or code).
+Give the fact directly; no background.
+
+""" + FORMAT_RULES.format(long_answer="(The fact with its navigation path, 1–3 lines)"),
+
+    # Short-first mode: the summary alone; the class prompt writes the long
+    # answer later, on demand
+    "short": """You are a professional TallyPrime documentation assistant.
+
+Use only information from the provided context. Do not invent steps or menu paths.
+Answer in 2–3 lines: the key fact, menu path or first steps. No LONG_ANSWER section.
+
+Format:
+
+SHORT_ANSWER:
+(Concise summary in 2–3 lines)""",
+}
+SHORT_MAX_TOKENS = int(os.getenv("SHORT_ANSWER_MAX_TOKENS", "160"))
+
+USAGE_FIELDS = ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+def is_retryable(error):
+    import anthropic
+
+    if isinstance(error, anthropic.APIConnectionError):  # includes timeouts
+        return True
+    return isinstance(error, anthropic.APIStatusError) and (error.status_code == 429 or error.status_code >= 500)
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def _percentile(values, q):
+    return round(float(np.percentile(values, q)), 3) if values else None
+
+
+# ------------------ CIRCUIT BREAKER ------------------
+
+class CircuitBreaker:
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = "closed"       # closed | open | half_open
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = "half_open"
+                self._trial_running = False
+            if self.state == "half_open":
+                if self._trial_running:
+                    return False
+                self._trial_running = True
+                return True
+            return self.state == "closed"
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.threshold:
+                if self.state != "open":
+                    self.opens += 1
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self._trial_running = False
+
+
+# ------------------ CLIENT ------------------
+
+class LLMClient:
+
+    def __init__(self, model=MODEL, max_tokens=MAX_TOKENS, system_prompt=SYSTEM_PROMPT, client=None,
+                 hedging=HEDGING, max_retries=MAX_RETRIES):
+        import anthropic
+
+        self.model = model
+        self.max_tokens = max_tokens
+        self.system_prompt = system_prompt
+        # Retries are done here (with hedging and the breaker), not in the SDK
+        self.client = client or anthropic.Anthropic(max_retries=0, timeout=REQUEST_TIMEOUT)
+        self.hedging = hedging
+        self.max_retries = max_retries
+
+        self.breaker = CircuitBreaker()
+        self.counters = Counter()
+        self.ttft = deque(maxlen=LATENCY_WINDOW)
+        self.latency = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm")
+
+    def build_request(self, context, question, system_prompt=None, max_tokens=None):
+        return {
+            "model": self.model,
+            "max_tokens": max_tokens or self.max_tokens,
+            "temperature": 0,
+            # Static prefix: identical bytes on every call (per prompt variant), cached by the API
+            "system": [
+                {"type": "text", "text": system_prompt or self.system_prompt, "cache_control": {"type": "ephemeral"}},
+            ],
+            "messages": [
+                {"role": "user", "content": f"Context:\n{context}\n\nQuestion:\n{question}"},
+            ],
+        }
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def hedge_delay(self):
+        with self._lock:
+            samples = list(self.ttft)
+        if len(samples) < MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        return min(HEDGE_MAX_DELAY, max(HEDGE_MIN_DELAY, float(np.percentile(samples, HEDGE_PERCENTILE))))
+
+    # ------------------ ONE STREAMED ATTEMPT ------------------
+
+    def _attempt(self, index, request, cancel, streams, events):
+        """Runs in the pool; reports ("first_token" | "done" | "error", index,
+        value) on events. A cancelled attempt reports nothing."""
+        start = time.perf_counter()
+        try:
+            stream = self.client.messages.create(**request, stream=True)
+            streams[index] = stream
+            if cancel.is_set():
+                stream.close()
+                return
+
+            parts, usage, first = [], {}, False
+            for event in stream:
+                if event.type == "message_start":
+                    usage.update({f: getattr(event.message.usage, f, None) or 0 for f in USAGE_FIELDS})
+                elif event.type == "content_block_delta" and event.delta.type == "text_delta":
+                    if not first:
+                        first = True
+                        events.put(("first_token", index, time.perf_counter() - start))
+                    parts.append(event.delta.text)
+                elif event.type == "message_delta":
+                    usage["output_tokens"] = event.usage.output_tokens
+            events.put(("done", index, ("".join(parts), usage)))
+
+        except Exception as e:
+            if not cancel.is_set():
+                events.put(("error", index, e))
+
+    def _hedged_call(self, request, deadline):
+        """Primary attempt plus (at most) one hedge; returns (text, usage)."""
+        events = queue.Queue()
+        cancels, streams = [], {}
+
+        def launch():
+            cancel = threading.Event()
+            cancels.append(cancel)
+            self._pool.submit(self._attempt, len(cancels) - 1, request, cancel, streams, events)
+
+        def cancel_others(keep):
+            for i, cancel in enumerate(cancels):
+                if i != keep and not cancel.is_set():
+                    cancel.set()
+                    stream = streams.get(i)
+                    if stream is not None:
+                        stream.close()  # unblocks the reader thread
+                    self._count("hedges_cancelled")
+
+        launch()
+        hedge_at = time.monotonic() + self.hedge_delay() if self.hedging else None
+        winner, errors = None, 0
+
+        while True:
+            wake = deadline if hedge_at is None else min(hedge_at, deadline)
+            try:
+                kind, index, value = events.get(timeout=max(0.0, wake - time.monotonic()))
+            except queue.Empty:
+                if hedge_at is not None and time.monotonic() >= hedge_at and winner is None:
+                    hedge_at = None
+                    self._count("hedges_fired")
+                    launch()
+                    continue
+                if time.monotonic() >= deadline:
+                    cancel_others(keep=None)
+                    raise TimeoutError("LLM deadline exceeded")
+                continue
+
+            if kind == "first_token" and winner is None:
+                winner = index
+                hedge_at = None
+                with self._lock:
+                    self.ttft.append(value)
+                if index > 0:
+                    self._count("hedges_won")
+                cancel_others(keep=index)
+
+            elif kind == "done" and winner in (None, index):
+                cancel_others(keep=index)
+                return value
+
+            elif kind == "error":
+                errors += 1
+                if index == winner or errors == len(cancels):
+                    raise value
+
+    # ------------------ PUBLIC ------------------
+
+    def complete(self, context, question, deadline=None, system_prompt=None, max_tokens=None):
+        """Returns (answer text, usage dict). deadline is seconds from now."""
+        deadline = time.monotonic() + (deadline or DEADLINE)
+        request = self.build_request(context, question, system_prompt, max_tokens)
+        start = time.perf_counter()
+        self._count("requests")
+
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                self._count("breaker_rejected")
+                raise CircuitOpenError("LLM circuit breaker is open")
+
+            try:
+                text, usage = self._hedged_call(request, deadline)
+            except TimeoutError:
+                self.breaker.record_failure()
+                self._count("timeouts")
+                raise
+            except Exception as e:
+                if not is_retryable(e):
+                    # The API answered (e.g. 400); not an availability problem
+                    self.breaker.record_success()
+                    self._count("errors")
+                    raise
+                self.breaker.record_failure()
+                self._count(f"status_{getattr(e, 'status_code', 'connection')}")
+
+                backoff = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+                backoff = max(backoff, _retry_after(e) or 0)
+                if attempt == self.max_retries or time.monotonic() + backoff >= deadline:
+                    self._count("errors")
+                    raise
+                self._count("retries")
+                time.sleep(backoff)
+                continue
+
+            self.breaker.record_success()
+            self._count("successes")
+            with self._lock:
+                self.latency.append(time.perf_counter() - start)
+            return text, usage
+
+    def metrics(self):
+        with self._lock:
+            ttft, latency, counters = list(self.ttft), list(self.latency), dict(self.counters)
+        return {
+            "model": self.model,
+            "counters": counters,
+            "breaker": {"state": self.breaker.state, "failures": self.breaker.failures, "opens": self.breaker.opens},
+            "hedge_delay_s": round(self.hedge_delay(), 3) if self.hedging else None,
+            "ttft_s": {"p50": _percentile(ttft, 50), "p90": _percentile(ttft, 90), "p99": _percentile(ttft, 99)},
+            "latency_s": {"p50": _percentile(latency, 50), "p90": _percentile(latency, 90),
+                          "p99": _percentile(latency, 99)},
+            "samples": len(latency),
+        }
@@ -0,0 +1,274 @@
+"""
+lookup_index.py
+Structured table of keyboard shortcuts, menu paths and GST form names, and a
+matcher that answers clear lookup questions from it without the LLM.
+
+Index time (ingest_pipeline.py "lookup" stage): every sentence of every page
+is scanned for (lines are joined within a paragraph first, so a path or a
+"key (label)" pair that the extractor wrapped over several lines stays whole)
+    shortcut    "F11 (Features)", "Company (Alt+K)", "press Ctrl+A to accept"
+    path        "Gateway of Tally > Display More Reports > Reorder Status"
+    form        "GSTR-1", "CMP-08", "ITC-04" ...
+and each hit becomes an entry (kind, value, label, keywords, sources).
+Identical entries from different pages are merged; support counts the pages.
+
+Query time: only questions question_classifier calls "lookup" are tried.
+The question's content words must all be keywords of an entry (and, for a
+path, name its destination); among those entries the most specific wins.
+If different values tie (two shortcuts for the same words, two paths to the
+same screen), the question is ambiguous and goes through the full pipeline.
+So does a weak match: a shortcut or path whose label the question names less
+than MIN_COVERAGE of, or a form asked about in fewer than MIN_FORM_TERMS words.
+"""
+import json
+import os
+import re
+from collections import defaultdict
+from datetime import datetime
+
+from fallback_answer import SHORTCUT_RE, find_nav_paths
+from question_classifier import classify_question
+
+LOOKUP_INDEX_FILE = os.getenv("LOOKUP_INDEX", "lookup_index.json")
+LOOKUP_ENABLED = os.getenv("LOOKUP_ANSWERS", "1") != "0"
+LOOKUP_INDEX_VERSION = 2
+
+MAX_SOURCES = 3
+MIN_COVERAGE = 0.6          # share of a shortcut / path label the question must name
+MIN_FORM_TERMS = 2          # content words a form question needs
+AMBIGUITY_MARGIN = 0.15     # specificity within this of the best counts as a tie
+DOMINANT_SUPPORT = 2        # ...unless the best value is on this many times more pages
+
+GST_FORM_RE = re.compile(r"\b(?:GSTR|GST REG|GST PMT|CMP|ITC|DRC|PMT|RFD|REG)-\d{1,2}[A-Z]?\b")
+KEY = r"(?:(?:Alt|Ctrl|Shift)\s*\+\s*)+(?:F\d{1,2}|[A-Z0-9])\b|\bF(?:1[0-2]|[1-9])\b"
+KEY_THEN_LABEL_RE = re.compile(r"(" + KEY + r")\s*\(([^)]{2,40})\)")
+LABEL_THEN_KEY_RE = re.compile(r"([A-Z][\w/&' -]{1,40}?)\s*\((" + KEY + r")\)")
+KEY_TO_RE = re.compile(r"(" + KEY + r")\s+to\s+([a-z][\w/' -]{2,50}?)(?=[.,;:)]|$| and | or )")
+
+PARAGRAPH_RE = re.compile(r"\n\s*\n|\n(?=\s*(?:#{1,6}\s|[-*+]\s|\d+[.)]\s|\|))")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "for", "to", "and", "or", "is", "are", "be", "it", "its",
+    "i", "my", "me", "we", "you", "your", "do", "can", "how", "what", "which", "where", "there",
+    "this", "that", "with", "by", "from", "as", "at", "use", "used", "using", "will", "would",
+}
+# Words that say what kind of answer is wanted, not what it is about
+QUERY_NOISE = {
+    "shortcut", "hotkey", "hot", "key", "keyboard", "short", "cut", "press", "find", "locate",
+    "menu", "path", "option", "screen", "form", "number", "no", "tally", "tallyprime", "prime",
+    "erp", "get", "go", "open", "see", "show", "available", "located", "list",
+}
+SHORTCUT_QUESTION_RE = re.compile(r"\b(shortcut|hot ?key|key ?board|which key|what key|alt|ctrl)\b", re.IGNORECASE)
+FORM_QUESTION_RE = re.compile(r"\b(form|return)\b", re.IGNORECASE)
+
+
+def _stem(word):
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+
+
+def terms(text, drop=()):
+    return {_stem(w) for w in WORD_RE.findall(text.lower()) if w not in STOPWORDS and w not in drop}
+
+
+def _normalize_key(key):
+    return re.sub(r"\s*\+\s*", "+", key)
+
+
+# ------------------ INDEX TIME ------------------
+
+def _sentences(text):
+    """Sentences of text; single line breaks inside a paragraph are joined."""
+    for paragraph in PARAGRAPH_RE.split(text):
+        for sentence in SENTENCE_RE.split(" ".join(paragraph.split())):
+            if sentence:
+                yield sentence
+
+
+def extract_entries(doc):
+    """(kind, value, label, keywords, context) found in one page."""
+    found = []
+    for sentence in _sentences(doc["content"]):
+        key_terms = terms(" ".join(SHORTCUT_RE.findall(sentence)))
+
+        for path in find_nav_paths(sentence):
+            label = path.rsplit(" > ", 1)[-1]
+            keywords = terms(path) - key_terms
+            found.append(("path", path, label, keywords, sentence))
+
+        for key, label in KEY_THEN_LABEL_RE.findall(sentence):
+            found.append(("shortcut", _normalize_key(key), label.strip(), terms(label), sentence))
+        for label, key in LABEL_THEN_KEY_RE.findall(sentence):
+            found.append(("shortcut", _normalize_key(key), label.strip(), terms(label), sentence))
+        for key, action in KEY_TO_RE.findall(sentence):
+            found.append(("shortcut", _normalize_key(key), action.strip(), terms(action), sentence))
+
+        for form in set(GST_FORM_RE.findall(sentence)):
+            keywords = terms(sentence, drop=terms(form)) | terms(doc.get("title", ""))
+            found.append(("form", form, doc.get("title", ""), keywords, sentence))
+    return found
+
+
+def build_lookup_table(docs):
+    """Merged entries for a corpus of {url, title, content} pages."""
+    merged = {}
+    for doc in docs:
+        source = {"title": doc.get("title", ""), "source": doc["url"]}
+        for kind, value, label, keywords, context in extract_entries(doc):
+            if not keywords:
+                continue
+            entry = merged.setdefault((kind, value, label.lower()), {
+                "kind": kind,
+                "value": value,
+                "label": label,
+                "keywords": set(),
+                "context": context,
+                "sources": [],
+            })
+            entry["keywords"] |= keywords
+            if source not in entry["sources"]:
+                entry["sources"].append(source)
+
+    entries = []
+    for entry in merged.values():
+        entry["support"] = len(entry["sources"])
+        entry["sources"] = entry["sources"][:MAX_SOURCES]
+        entry["keywords"] = sorted(entry["keywords"])
+        entries.append(entry)
+    entries.sort(key=lambda e: (e["kind"], e["value"], e["label"]))
+    return entries
+
+
+def save_lookup_index(path, entries, index_key):
+    payload = {
+        "format_version": LOOKUP_INDEX_VERSION,
+        "index_key": index_key,
+        "created_at": datetime.now().isoformat(),
+        "entries": entries,
+    }
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def load_lookup_index(path, index_key):
+    """LookupIndex from path if it was built for index_key, else None."""
+    if not os.path.exists(path):
+        return None
+
+    with open(path, "r", encoding="utf-8") as f:
+        payload = json.load(f)
+    if payload.get("format_version") != LOOKUP_INDEX_VERSION:
+        print(f"⚠️ Unsupported lookup index version in {path}; ignoring")
+        return None
+    if payload.get("index_key") != index_key:
+        print(f"⚠️ Lookup index {path} is for index {payload.get('index_key')}, not {index_key}; ignoring")
+        return None
+    return LookupIndex(payload["entries"])
+
+
+# ------------------ QUERY TIME ------------------
+
+class LookupIndex:
+
+    def __init__(self, entries):
+        self.entries = entries
+        self._keywords = [set(e["keywords"]) for e in entries]
+        self._label_terms = [terms(e["label"]) for e in entries]
+        self._by_term = defaultdict(set)
+        for i, keywords in enumerate(self._keywords):
+            for term in keywords:
+                self._by_term[term].add(i)
+        self._has_key = [e["kind"] == "path" and bool(SHORTCUT_RE.search(e["value"])) for e in entries]
+        self.tried = 0
+        self.answered = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def info(self):
+        return {"entries": len(self.entries), "tried": self.tried, "answered": self.answered}
+
+    def _kinds(self, question):
+        if SHORTCUT_QUESTION_RE.search(question):
+            return {"shortcut", "path_with_key"}
+        if FORM_QUESTION_RE.search(question) and not GST_FORM_RE.search(question.upper()):
+            return {"form"}
+        return {"path"}
+
+    def _candidates(self, query, kinds):
+        ids = set.intersection(*(self._by_term.get(t, set()) for t in query))
+        for i in ids:
+            kind = self.entries[i]["kind"]
+            if kind == "path" and not query & self._label_terms[i]:
+                continue    # the words are on the way, not the destination
+            if kind not in kinds and not (self._has_key[i] and "path_with_key" in kinds):
+                continue
+            if kind == "form":
+                if len(query) < MIN_FORM_TERMS:
+                    continue
+            elif len(query & self._label_terms[i]) < MIN_COVERAGE * len(self._label_terms[i]):
+                continue    # "shortcut for master" does not pick "Create Master"
+            yield i, len(query) / len(self._keywords[i])
+
+    def match(self, question):
+        """(entry, stats) for a clear lookup question, else None."""
+        if classify_question(question) != "lookup":
+            return None
+
+        query = terms(question, drop=QUERY_NOISE)
+        if not query:
+            return None
+        self.tried += 1
+
+        candidates = sorted(
+            self._candidates(query, self._kinds(question)),
+            key=lambda c: (c[1], self.entries[c[0]]["support"]),
+            reverse=True,
+        )
+        if not candidates:
+            return None
+
+        best, best_score = candidates[0]
+        best_entry = self.entries[best]
+        for i, score in candidates[1:]:
+            entry = self.entries[i]
+            if score < best_score - AMBIGUITY_MARGIN:
+                break
+            if entry["value"] != best_entry["value"] and best_entry["support"] < DOMINANT_SUPPORT * entry["support"]:
+                return None     # two answers fit equally well
+
+        self.answered += 1
+        return best_entry, {
+            "kind": best_entry["kind"],
+            "value": best_entry["value"],
+            "specificity": round(best_score, 3),
+            "support": best_entry["support"],
+            "candidates": len(candidates),
+        }
+
+
+def lookup_answer(entry):
+    """/ask response body for a matched entry."""
+    value, label = entry["value"], entry["label"]
+    if entry["kind"] == "shortcut":
+        short = f"Press **{value}** ({label})."
+    elif entry["kind"] == "path":
+        short = f"{'Press' if SHORTCUT_RE.match(value) else 'Go to'} **{value}**."
+    else:
+        short = f"**{value}** ({label})."
+
+    sources = [
+        {"title": s["title"], "source": s["source"].split("#")[0].split("?")[0].strip().lower()}
+        for s in entry["sources"]
+    ]
+    return {
+        "short_answer": short,
+        "long_answer": f"{short}\n\nFrom the documentation: “{entry['context']}”",
+        "sources": sources,
+        "watch_video": False,
+        "video_links": [],
+        "dependencies": {"chunks": [], "sources": [s["source"] for s in sources]},
+    }
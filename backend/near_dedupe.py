@@ -0,0 +1,128 @@
+"""
+near_dedupe.py
+MinHash-LSH near-duplicate detection over tally_docs.json records.
+
+Each page becomes a MinHash signature of its word shingles; LSH banding puts
+likely duplicates in the same bucket so only bucket mates are compared
+(roughly linear in corpus size instead of all pairs). Each cluster keeps one
+representative and records the other URLs as its "aliases".
+"""
+import re
+import zlib
+
+import numpy as np
+
+NUM_PERM = 128
+BANDS = 16          # 16 bands x 8 rows -> candidates from ~0.7 Jaccard
+SHINGLE_SIZE = 5
+THRESHOLD = 0.8     # estimated Jaccard needed to merge two pages
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+_WORD_RE = re.compile(r"\w+")
+
+
+# =========================
+# SIGNATURES
+# =========================
+def _permutations(num_perm, seed=1):
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, np.iinfo(np.int64).max, size=num_perm, dtype=np.int64).astype(np.uint64)
+    b = rng.randint(0, np.iinfo(np.int64).max, size=num_perm, dtype=np.int64).astype(np.uint64)
+    return a, b
+
+
+def shingle_hashes(text, size=SHINGLE_SIZE):
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < size:
+        words = words + [""] * (size - len(words))
+    shingles = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    return np.fromiter(
+        (zlib.crc32(s.encode("utf-8")) for s in shingles),
+        dtype=np.uint64,
+        count=len(shingles),
+    )
+
+
+def minhash(text, perms):
+    a, b = perms
+    hashes = shingle_hashes(text)
+    # (a*x + b) mod p, truncated to 32 bits; uint64 wrap-around is intended
+    with np.errstate(over="ignore"):
+        values = (np.outer(hashes, a) + b) % _MERSENNE_PRIME & _MAX_HASH
+    return values.min(axis=0)
+
+
+def signatures(texts, num_perm=NUM_PERM):
+    perms = _permutations(num_perm)
+    return np.vstack([minhash(t, perms) for t in texts]) if texts else np.empty((0, num_perm), np.uint64)
+
+
+# =========================
+# CLUSTERING
+# =========================
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def cluster_near_duplicates(texts, threshold=THRESHOLD, bands=BANDS, num_perm=NUM_PERM):
+    """Return clusters (lists of indexes, size >= 2) of near-duplicate texts."""
+    sigs = signatures(texts, num_perm)
+    rows = num_perm // bands
+    parent = list(range(len(texts)))
+
+    for band in range(bands):
+        block = np.ascontiguousarray(sigs[:, band * rows:(band + 1) * rows])
+        buckets = {}
+        for i, key in enumerate(block):
+            buckets.setdefault(key.tobytes(), []).append(i)
+
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            # Compare against the bucket head only; union-find closes the rest
+            head = members[0]
+            others = np.array(members[1:])
+            similarity = (sigs[others] == sigs[head]).mean(axis=1)
+            for j in others[similarity >= threshold]:
+                ri, rj = _find(parent, head), _find(parent, int(j))
+                if ri != rj:
+                    parent[rj] = ri
+
+    clusters = {}
+    for i in range(len(texts)):
+        clusters.setdefault(_find(parent, i), []).append(i)
+    return [members for members in clusters.values() if len(members) > 1]
+
+
+def _representative_key(doc):
+    url = doc.get("url", "")
+    # Prefer real article URLs over search/query pages, then the fullest body
+    return ("?" in url, -len(doc.get("content", "")), len(url))
+
+
+def dedupe_near_duplicates(docs, threshold=THRESHOLD, bands=BANDS, num_perm=NUM_PERM):
+    """Keep one representative per near-duplicate cluster.
+
+    Returns (kept_docs, clusters) where each cluster is
+    {"kept": url, "aliases": [urls]} and the kept doc gains an "aliases" list.
+    """
+    groups = cluster_near_duplicates([d.get("content", "") for d in docs], threshold, bands, num_perm)
+
+    dropped = set()
+    clusters = []
+    for members in groups:
+        ordered = sorted(members, key=lambda i: _representative_key(docs[i]))
+        keep, rest = ordered[0], ordered[1:]
+
+        aliases = [docs[i].get("url", "") for i in rest]
+        docs[keep]["aliases"] = sorted(set(docs[keep].get("aliases", []) + aliases))
+        dropped.update(rest)
+        clusters.append({"kept": docs[keep].get("url", ""), "aliases": aliases})
+
+    kept = [d for i, d in enumerate(docs) if i not in dropped]
+    return kept, clusters
@@ -0,0 +1,203 @@
+"""
+precompute_faq.py
+Offline job that answers the most common questions and writes the warm
+answer cache (warm_cache.json) the server loads at startup.
+
+Questions come from a curated file (one per line, # for comments) and/or the
+server's question log (QUESTION_LOG, JSON lines), ranked by how often they
+were asked. Answers are generated through the normal TallyQASystem.ask()
+path, or with --batch through the Message Batches API (cheaper, but may take
+minutes to hours). Degraded and failed answers are left out, so they are
+never served as warm answers.
+
+The file is stamped with the active index key, and every answer records the
+chunks and pages it was built from. Answers already in the file are reused
+unless --force: all of them for the same index, and after a rebuild the ones
+whose pages did not change (per the pipeline's index_changes.json).
+
+Usage:
+    python precompute_faq.py --questions faq_questions.txt
+    python precompute_faq.py --log question_log.jsonl --top 200 --min-count 3
+    python precompute_faq.py --questions faq_questions.txt --batch
+"""
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from answer_cache import (
+    INDEX_CHANGES_FILE, WARM_CACHE_FILE,
+    is_usable, normalize_question, read_index_changes, read_warm_cache, save_warm_cache, unaffected_entries,
+)
+
+FAQ_FILE = "faq_questions.txt"
+TOP_QUESTIONS = 200
+MIN_COUNT = 2
+WORKERS = 4
+BATCH_POLL_SECONDS = 30
+
+
+# =========================
+# QUESTIONS
+# =========================
+def read_curated(path):
+    with open(path, "r", encoding="utf-8") as f:
+        lines = (line.strip() for line in f)
+        return [line for line in lines if line and not line.startswith("#")]
+
+
+def read_log(path, top=TOP_QUESTIONS, min_count=MIN_COUNT):
+    """Most asked questions in a QUESTION_LOG file, most frequent first."""
+    counts = Counter()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                counts[normalize_question(json.loads(line)["question"])] += 1
+            except (ValueError, KeyError):
+                continue  # partial last line, foreign record
+    return [q for q, n in counts.most_common(top) if n >= min_count]
+
+
+def collect_questions(curated=None, log=None, top=TOP_QUESTIONS, min_count=MIN_COUNT):
+    questions = []
+    if curated:
+        questions += read_curated(curated)
+    if log:
+        questions += read_log(log, top, min_count)
+    return list(dict.fromkeys(normalize_question(q) for q in questions))
+
+
+# =========================
+# GENERATION
+# =========================
+def warm_entry(answer):
+    # Per-request diagnostics and short-first IDs do not belong in the cache;
+    # dependencies stay, so a re-index only drops the answers it affects
+    return {k: v for k, v in answer.items() if k not in ("stats", "answer_id")}
+
+
+def answer_online(qa, questions, workers=WORKERS):
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(questions, pool.map(qa.ask, questions)))
+
+
+def answer_in_batch(qa, questions, poll_seconds=BATCH_POLL_SECONDS):
+    """Retrieve locally, generate through one Message Batch, assemble the
+    same response ask() would return."""
+    from answer_cache import answer_dependencies
+    from llm_client import PROMPTS
+    from lookup_index import lookup_answer
+    from question_classifier import PROFILES
+
+    answers, pending, requests = {}, {}, []
+    for i, question in enumerate(questions):
+        match = qa.lookup.match(question) if qa.lookup is not None else None
+        if match:
+            answers[question] = lookup_answer(match[0])
+            continue
+
+        docs, _, context, question_class, _ = qa._prepare(qa.vectorstore, question)
+        if context is None:
+            continue
+        profile = PROFILES[question_class]
+        custom_id = f"faq-{i}"
+        pending[custom_id] = (question, docs)
+        requests.append({
+            "custom_id": custom_id,
+            "params": qa.llm.build_request(context, question, PROMPTS[profile["prompt"]], profile["max_tokens"]),
+        })
+
+    if not requests:
+        return answers
+
+    batches = qa.llm.client.messages.batches
+    batch = batches.create(requests=requests)
+    print(f"📨 Batch {batch.id}: {len(requests)} requests")
+    while batch.processing_status != "ended":
+        time.sleep(poll_seconds)
+        batch = batches.retrieve(batch.id)
+        print(f"   {batch.processing_status}: {batch.request_counts}")
+
+    for item in batches.results(batch.id):
+        if item.result.type != "succeeded":
+            print(f"⚠️ {item.custom_id}: {item.result.type}")
+            continue
+        question, docs = pending[item.custom_id]
+        text = "".join(block.text for block in item.result.message.content if block.type == "text")
+        short, long = qa._parse_response(text)
+        sources, watch_video, video_links = qa._sources(docs)
+        answers[question] = {
+            "short_answer": short,
+            "long_answer": long,
+            "sources": sources[:5],
+            "watch_video": watch_video,
+            "video_links": video_links,
+            "degraded": False,
+            "dependencies": answer_dependencies(docs),
+        }
+    return answers
+
+
+# =========================
+# MAIN
+# =========================
+def precompute(questions, output=WARM_CACHE_FILE, batch=False, force=False, workers=WORKERS):
+    from qa_system import TallyQASystem
+
+    qa = TallyQASystem()
+    qa.load_vectorstore()
+    qa.create_qa_chain()
+    index_key = qa.index_key()
+
+    entries = {}
+    if os.path.exists(output) and not force:
+        payload = read_warm_cache(output)
+        changes = read_index_changes(INDEX_CHANGES_FILE, index_key, payload.get("index_key"))
+        if payload.get("index_key") == index_key:
+            entries = {e["question"]: e["answer"] for e in payload["entries"]}
+        elif changes is not None:
+            entries = {e["question"]: e["answer"] for e in unaffected_entries(payload["entries"], changes)}
+        print(f"⏭️  {len(entries)} answers still current for index {index_key}")
+
+    todo = [q for q in questions if q not in entries]
+    print(f"⚙️  Answering {len(todo)} of {len(questions)} questions ({'batch' if batch else 'online'})")
+    answers = answer_in_batch(qa, todo) if batch else answer_online(qa, todo, workers)
+
+    skipped = 0
+    for question in todo:
+        answer = answers.get(question)
+        if answer is None or not is_usable(answer):
+            skipped += 1
+            continue
+        entries[question] = warm_entry(answer)
+
+    # Keep the requested questions, in ranking order
+    entries = {q: entries[q] for q in questions if q in entries}
+    save_warm_cache(output, entries, index_key)
+    print(f"✅ {len(entries)} warm answers for index {index_key} in {output} ({skipped} skipped)")
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute answers for common questions")
+    parser.add_argument("--questions", help=f"curated questions, one per line (e.g. {FAQ_FILE})")
+    parser.add_argument("--log", help="question log written by the server (QUESTION_LOG)")
+    parser.add_argument("--top", type=int, default=TOP_QUESTIONS, help="most asked questions to take from the log")
+    parser.add_argument("--min-count", type=int, default=MIN_COUNT, help="ignore logged questions asked fewer times")
+    parser.add_argument("--output", default=WARM_CACHE_FILE)
+    parser.add_argument("--batch", action="store_true", help="generate through the Message Batches API")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="parallel online requests")
+    parser.add_argument("--force", action="store_true", help="regenerate answers already in the file")
+    args = parser.parse_args()
+
+    if not args.questions and not args.log:
+        parser.error("give --questions and/or --log")
+
+    questions = collect_questions(args.questions, args.log, args.top, args.min_count)
+    precompute(questions, args.output, batch=args.batch, force=args.force, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
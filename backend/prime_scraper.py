@@ -3,24 +3,29 @@ prime_scraper.py
 Clean TallyPrime-only crawler for building tally_docs.json
 """
 import os
+import sys
+import gzip
+import hashlib
 import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
 import json
 import time
 from datetime import datetime
 
+from html_extractor import extract_page, extract_batch
+from crawl_planner import CrawlPlanner, canonicalize_url
+
 BASE_URL = "https://help.tallysolutions.com"
 START_URL = "https://help.tallysolutions.com/tally-prime/"
 
 visited_urls = set()
 valid_docs = []
 MAX_PAGES = 800  # safety limit
+RAW_HTML_DIR = "raw_html"  # fetched pages, kept so the corpus can be re-extracted offline
 
 if os.path.exists("tally_docs.json"):
     with open("tally_docs.json", "r", encoding="utf-8") as f:
         valid_docs.extend(json.load(f))
-    visited_urls.update(doc["url"] for doc in valid_docs)
+    visited_urls.update(canonicalize_url(doc["url"]) for doc in valid_docs)
     print(f"🔄 Resuming from {len(valid_docs)} saved docs")
 
 
@@ -40,6 +45,7 @@ def is_valid_prime_url(url):
         "developer-reference",
         "/faq",
         "?s=",
+        "&s=",
         "wp-content",
         ".jpg",
         ".png",
@@ -75,77 +81,80 @@ def is_valid_content(content, title):
 
 
 # =========================
-# SCRAPE ARTICLE
+# RAW HTML STORE
 # =========================
-def scrape_page(url):
-    try:
-        headers = {"User-Agent": "Mozilla/5.0"}
-        response = requests.get(url, headers=headers, timeout=20)
-        response.raise_for_status()
+def save_raw_html(url, html):
+    os.makedirs(RAW_HTML_DIR, exist_ok=True)
+    name = hashlib.sha1(url.encode("utf-8")).hexdigest() + ".html.gz"
 
-        soup = BeautifulSoup(response.text, "html.parser")
+    with gzip.open(os.path.join(RAW_HTML_DIR, name), "wb") as f:
+        f.write(html)
 
-        # Remove navigation and unwanted elements
-        for tag in soup(["nav", "header", "footer", "script", "style"]):
-            tag.decompose()
+    with open(os.path.join(RAW_HTML_DIR, "index.jsonl"), "a", encoding="utf-8") as f:
+        f.write(json.dumps({"url": url, "file": name}) + "\n")
 
-        title_tag = soup.find("h1")
-        title = title_tag.get_text(strip=True) if title_tag else ""
 
-        content = soup.get_text(separator="\n", strip=True)
+def load_raw_html():
+    index_path = os.path.join(RAW_HTML_DIR, "index.jsonl")
+    if not os.path.exists(index_path):
+        return []
 
-        if not is_valid_content(content, title):
-            return None
+    files = {}
+    with open(index_path, "r", encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            files[entry["url"]] = entry["file"]  # last write wins
 
-        return {
-            "url": url,
-            "title": title,
-            "content": content,
-            "category": "TallyPrime",
-            "scraped_at": datetime.now().isoformat()
-        }
+    pages = []
+    for url, name in files.items():
+        with gzip.open(os.path.join(RAW_HTML_DIR, name), "rb") as f:
+            pages.append((url, f.read()))
+    return pages
 
-    except Exception as e:
-        print(f"❌ Error scraping {url}: {e}")
+
+# =========================
+# SCRAPE ARTICLE
+# =========================
+def to_doc(page):
+    if page is None:
         return None
 
-def extract_content(url, soup):
-    try:
-        for tag in soup(["nav", "header", "footer", "script", "style"]):
-            tag.decompose()
+    title = page["title"]
+    content = page["content"]
 
-        # ---- Better title extraction ----
-        title = ""
+    if not is_valid_content(content, title):
+        return None
 
-        # Try common patterns
-        h1 = soup.find("h1")
-        if h1:
-            title = h1.get_text(strip=True)
+    return {
+        "url": page["url"],
+        "title": title,
+        "content": content,
+        "category": "TallyPrime",
+        "scraped_at": datetime.now().isoformat()
+    }
 
-        if not title:
-            title_tag = soup.find("title")
-            if title_tag:
-                title = title_tag.get_text(strip=True)
 
-        if not title:
-            title = "Untitled"
+def scrape_page(url):
+    try:
+        headers = {"User-Agent": "Mozilla/5.0"}
+        response = requests.get(url, headers=headers, timeout=20)
+        response.raise_for_status()
+
+        return to_doc(extract_page(response.content, url=url))
 
-        content = soup.get_text(separator="\n", strip=True)
+    except Exception as e:
+        print(f"❌ Error scraping {url}: {e}")
+        return None
 
-        print("Content length:", len(content))
-        print("Title:", title)
+def extract_content(url, page):
+    try:
+        print("Content length:", len(page["content"]))
+        print("Title:", page["title"])
 
-        if not is_valid_content(content, title):
+        doc = to_doc(page)
+        if not doc:
             print("❌ Rejected:", url)
-            return None
-
-        return {
-            "url": url,
-            "title": title,
-            "content": content,
-            "category": "TallyPrime",
-            "scraped_at": datetime.now().isoformat()
-        }
+        return doc
 
     except Exception as e:
         print(f"❌ Error extracting {url}: {e}")
@@ -155,19 +164,18 @@ def extract_content(url, soup):
 # CRAWLER
 # =========================
 def crawl(start_url):
-    queue = [start_url]
-
-    while queue and len(valid_docs) < MAX_PAGES:
-        current_url = queue.pop(0)
+    planner = CrawlPlanner(is_allowed=is_valid_prime_url)
+    for url in visited_urls:
+        planner.mark_seen(url)
 
-        if current_url in visited_urls:
-            continue
+    seeded = planner.seed_from_sitemaps(BASE_URL)
+    print(f"🗺️ Seeded {seeded} URLs from sitemaps")
+    planner.add(start_url)
 
+    while len(planner) and len(valid_docs) < MAX_PAGES:
+        current_url = planner.pop()
         visited_urls.add(current_url)
 
-        if not is_valid_prime_url(current_url):
-            continue
-
         print(f"🔍 Crawling: {current_url}")
 
         try:
@@ -178,10 +186,11 @@ def crawl(start_url):
                 print(f"⚠️ Skipping {response.status_code}: {current_url}")
                 continue
 
-            soup = BeautifulSoup(response.text, "html.parser")
+            save_raw_html(current_url, response.content)
+            page = extract_page(response.content, url=current_url, with_links=True)
 
             # ---- Scrape content ----
-            doc = extract_content(current_url, soup)
+            doc = extract_content(current_url, page)
 
             if doc:
                 print(f"✅ Saved: {doc['title']}")
@@ -191,12 +200,8 @@ def crawl(start_url):
                 print("💾 Saved progress...")
 
             # ---- Discover links ----
-            for a in soup.find_all("a", href=True):
-                href = a["href"]
-                new_url = urljoin(current_url, href)
-
-                if new_url not in visited_urls and is_valid_prime_url(new_url):
-                    queue.append(new_url)
+            for new_url in page["links"]:
+                planner.add(new_url)
 
         except Exception as e:
             print(f"❌ Error crawling {current_url}: {e}")
@@ -204,10 +209,29 @@ def crawl(start_url):
         time.sleep(0.3)
 
 
+# =========================
+# RE-EXTRACT (no network)
+# =========================
+def reextract():
+    pages = load_raw_html()
+    print(f"♻️ Re-extracting {len(pages)} saved pages...")
+
+    docs = [doc for doc in map(to_doc, extract_batch(pages)) if doc]
+
+    with open("tally_docs.json", "w", encoding="utf-8") as f:
+        json.dump(docs, f, indent=2, ensure_ascii=False)
+
+    print(f"✅ Rebuilt tally_docs.json with {len(docs)} articles")
+
+
 # =========================
 # MAIN
 # =========================
 def main():
+    if "--reextract" in sys.argv:
+        reextract()
+        return
+
     print("🚀 Starting clean TallyPrime crawler...\n")
 
     crawl(START_URL)
@@ -1,13 +1,29 @@
 import os
-import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 from dotenv import load_dotenv
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_core.documents import Document
-from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from langchain_anthropic import ChatAnthropic
+
+from answer_cache import answer_dependencies
+from context_compressor import COMPRESSION_ENABLED, ContextCompressor
+from context_store import ContextStore
+from embedding_cache import CachedEmbeddings, EMBEDDING_MODEL
+from index_snapshot import SNAPSHOT_FILE, SnapshotVectorStore, load_snapshot
+from fallback_answer import ANSWER_SLO, FALLBACK_MARGIN, MIN_LLM_BUDGET, FallbackMetrics, extractive_answer
+from lookup_index import LOOKUP_ENABLED, LOOKUP_INDEX_FILE, load_lookup_index, lookup_answer
+from llm_client import PROMPTS, SHORT_MAX_TOKENS, CircuitOpenError
+from query_embedder import MicroBatchEmbedder
+from question_classifier import PROFILES, ClassMetrics, classify_question
+from retrieval import (
+    COARSE_PAGES, FETCH_K, MAX_DISTANCE, MAX_K, MIN_K,
+    choose_depth, depth_stats, fetch_candidates, fetch_pages, mmr,
+)
+from topics import classify_topics
+
+# Heavy libraries (chromadb, torch via langchain_huggingface, anthropic) are
+# imported inside the methods that need them, so importing this module is
+# cheap and a snapshot-backed deployment never loads chromadb at all.
 
 class TallyQASystem:
 
@@ -16,76 +32,102 @@ class TallyQASystem:
 
         self.docs_file = "tally_docs.json"
         self.persist_directory = "./tally_chroma_db"
+        self.snapshot_file = os.getenv("INDEX_SNAPSHOT", SNAPSHOT_FILE)
+        self.index_path = None
 
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
+        self.embeddings = CachedEmbeddings(
+            EMBEDDING_MODEL,
+            model_path=os.getenv("EMBEDDING_MODEL_PATH"),
         )
+        # Query vectors for concurrent requests are batched into one forward pass
+        self.query_embedder = MicroBatchEmbedder(self.embeddings)
+        self.compressor = ContextCompressor(self.query_embedder)
 
         self.vectorstore = None
+        self.lookup = None  # shortcut / menu path table for the active index
         self.llm = None
-        self.prompt = None
+        self.class_metrics = ClassMetrics()
+        self.contexts = ContextStore()  # short-first answers awaiting /ask/long
+        self.fallback_metrics = FallbackMetrics()
 
     # ------------------ VECTOR STORE ------------------
 
-    def load_vectorstore(self):
-        if not os.path.exists(self.persist_directory):
+    def open_vectorstore(self, path):
+        """Open a snapshot file (mmap, no pickle) or a Chroma directory."""
+        if not os.path.exists(path):
             raise FileNotFoundError("Chroma DB not found. Run create_vector_db.py first.")
 
-        self.vectorstore = Chroma(
-            persist_directory=self.persist_directory,
-            embedding_function=self.embeddings,
-        )
-
-        print("✅ Vectorstore loaded successfully.")
+        if os.path.isfile(path):
+            snapshot = load_snapshot(path)
+            model = snapshot.manifest.get("embedding_model")
+            if model and model != self.embeddings.model_name:
+                raise ValueError(f"Snapshot {path} was built with {model}, not {self.embeddings.model_name}")
+            return SnapshotVectorStore(snapshot, self.query_embedder)
 
-    # ------------------ QA CHAIN ------------------
-
-    def create_qa_chain(self):
+        from langchain_chroma import Chroma
 
-        self.llm = ChatAnthropic(
-            model="claude-3-haiku-20240307",
-            temperature=0,
+        return Chroma(
+            persist_directory=path,
+            embedding_function=self.query_embedder,
         )
 
-        self.prompt = PromptTemplate.from_template("""
-            You are a professional TallyPrime documentation assistant.
-
-            Strict Instructions:
-
-            1. If the question is procedural (how to, detailed, steps, process, configure, setup, create):
-            - Provide clear step-by-step instructions.
-            - Include exact navigation paths (e.g., Gateway of Tally > Vouchers > Ctrl+F4 (Payroll)).
-            - Include keyboard shortcuts.
-            - Use numbered steps.
-            - Be practical, not descriptive.
-            - Avoid marketing language.
-            - Avoid generic feature explanations.
-
-            2. If the question is conceptual:
-            - Provide structured explanation with headings.
-
-            3. Use only information from the provided context.
-            4. Do not invent steps.
-            5. Do not give high-level summaries when detailed steps are possible.
-            Do not repeat the same information.
-            Do not restate identical steps.
-            Avoid duplication.
-
-            Format:
-
-            SHORT_ANSWER:
-            (Concise summary in 2–3 lines)
-            (Avoid long answer content here)
-            LONG_ANSWER:
-            (Detailed step-by-step explanation if applicable)
+    def load_vectorstore(self):
+        path = self.snapshot_file if os.path.isfile(self.snapshot_file) else self.persist_directory
+        self.vectorstore = self.open_vectorstore(path)
+        self.index_path = path
+        self.load_lookup_index()
+
+        print(f"✅ Vectorstore loaded successfully ({path}).")
+
+    def swap_vectorstore(self, vectorstore, path):
+        # Single reference assignment: requests already running keep the
+        # store they captured at the start of ask(), new ones get this one.
+        self.vectorstore = vectorstore
+        self.index_path = path
+        self.load_lookup_index()
+
+        print(f"🔁 Vectorstore swapped to {path}")
+
+    def load_lookup_index(self):
+        # Only a table built for the active index is used
+        self.lookup = load_lookup_index(LOOKUP_INDEX_FILE, self.index_key()) if LOOKUP_ENABLED else None
+        if self.lookup is not None:
+            print(f"🔎 Lookup index: {len(self.lookup)} shortcuts / paths / forms")
+
+    def index_key(self, vectorstore=None):
+        """Build key of the active index (pipeline key), or None if unknown."""
+        vectorstore = vectorstore or self.vectorstore
+        if isinstance(vectorstore, SnapshotVectorStore):
+            snapshot = vectorstore.snapshot
+            return snapshot.manifest.get("index_key") or snapshot.checksum[:16]
+
+        key_file = os.path.join(self.index_path or self.persist_directory, ".ingest_key")
+        if os.path.exists(key_file):
+            with open(key_file, "r", encoding="utf-8") as f:
+                return f.read().strip()
+        return None
+
+    def load_embedding_model(self):
+        # Loads the sentence-transformers weights without running them
+        return self.embeddings.embeddings
+
+    def warm_up(self):
+        # Starts this process's batching worker and runs one forward pass
+        self.query_embedder.embed_query("Gateway of Tally")
+
+    def vector_count(self, vectorstore=None):
+        vectorstore = vectorstore or self.vectorstore
+        if isinstance(vectorstore, SnapshotVectorStore):
+            return vectorstore.count()
+        return vectorstore._collection.count()
 
-            Context:
-            {context}
+    # ------------------ QA CHAIN ------------------
 
-            Question:
-            {question}
-            """)
+    def create_qa_chain(self):
+        from llm_client import LLMClient
 
+        # Fixed instructions live in llm_client.SYSTEM_PROMPT as a cached prefix
+        self.llm = LLMClient()
 
         print("✅ QA chain initialized successfully.")
 
@@ -107,129 +149,222 @@ class TallyQASystem:
         return question  # ✅ ALWAYS return something
 
     # ------------------ ASK ------------------
-    def _hybrid_retrieve(self, question, k=20):
+    def _hybrid_retrieve(self, vectorstore, query_vector, filter=None):
+        """Coarse page search, then one scored chunk fetch (with vectors)
+        restricted to those pages, a depth cut from the distances
+        (retrieval.choose_depth) and NumPy MMR over the candidates that are
+        close enough. Returns (docs, depth stats)."""
         try:
-            keyword_docs = self.vectorstore.similarity_search(
-                question,
-                k=k
-            )
+            pages = fetch_pages(vectorstore, query_vector, COARSE_PAGES, filter) if COARSE_PAGES else None
+            fine_filter = {"source": {"$in": pages}} if pages else filter
+            docs, distances, vectors = fetch_candidates(vectorstore, query_vector, FETCH_K, fine_filter)
 
-            retriever = self.vectorstore.as_retriever(
-                search_type="mmr",
-                search_kwargs={"k": k}
-            )
-            mmr_docs = retriever.invoke(question)
+            if pages and len(docs) < MIN_K:
+                # The coarse stage missed; search the chunks directly
+                pages = None
+                docs, distances, vectors = fetch_candidates(vectorstore, query_vector, FETCH_K, filter)
 
-            combined = keyword_docs + mmr_docs
+            k, reason = choose_depth(distances)
 
-            unique = {}
-            for d in combined:
-                key = (d.metadata.get("source", ""), d.page_content[:100])
-                if key not in unique:
-                    unique[key] = d
+            # Diversify among the relevant candidates, never beyond them
+            pool = max(k, int(np.searchsorted(distances, MAX_DISTANCE, side="right")))
+            picked = mmr(query_vector, vectors[:pool], k)
 
-            return list(unique.values())[:k]
+            stats = depth_stats(distances, k, reason)
+            stats["pages"] = len(pages) if pages else 0
+            return [docs[i] for i in picked], stats
 
         except Exception as e:
             print("🔥 hybrid_retrieve ERROR:", str(e))
-            return []   # 🔥 ALWAYS RETURN SAFE VALUE
+            return [], depth_stats([], 0, "error")   # 🔥 ALWAYS RETURN SAFE VALUE
+
+    def _unique_docs(self, docs):
+        unique = {}
+        for d in docs:
+            key = d.id or (d.metadata.get("source", ""), d.page_content[:100])
+            if key not in unique:
+                unique[key] = d
+        return list(unique.values())
+
+    def _routed_retrieve(self, vectorstore, query_vector, topics):
+        """Search the topic partition(s) of the index; several topics are
+        searched in parallel and interleaved. Falls back to the global index
+        when nothing in the partitions is within MAX_DISTANCE (wrong route,
+        or an index built without topic metadata) and tops up from it when
+        they come back short. Returns (docs, stats)."""
+        stats = {"topics": topics, "partitions": {}, "fallback": False}
+
+        if not topics:
+            docs, stats["global"] = self._hybrid_retrieve(vectorstore, query_vector)
+            stats["depth"] = len(docs)
+            return docs, stats
+
+        if len(topics) == 1:
+            docs, stats["partitions"][topics[0]] = self._hybrid_retrieve(vectorstore, query_vector, {"topic": topics[0]})
+        else:
+            with ThreadPoolExecutor(max_workers=len(topics)) as pool:
+                results = list(pool.map(
+                    lambda topic: self._hybrid_retrieve(vectorstore, query_vector, {"topic": topic}),
+                    topics,
+                ))
+            groups = [group for group, _ in results]
+            stats["partitions"] = {topic: result[1] for topic, result in zip(topics, results)}
+            interleaved = [d for row in zip(*groups) for d in row]
+            docs = self._unique_docs(interleaved + [d for g in groups for d in g])[:MAX_K]
+
+        relevant = any(
+            p["best_distance"] is not None and p["best_distance"] <= MAX_DISTANCE
+            for p in stats["partitions"].values()
+        )
+        if not relevant:
+            # Wrong route: answer from the global index instead
+            global_docs, stats["global"] = self._hybrid_retrieve(vectorstore, query_vector)
+            docs = global_docs or docs
+            stats["fallback"] = True
+        elif len(docs) < MIN_K:
+            global_docs, stats["global"] = self._hybrid_retrieve(vectorstore, query_vector)
+            docs = self._unique_docs(docs + global_docs)[:max(len(docs), stats["global"]["depth"])]
+            stats["fallback"] = True
+
+        stats["depth"] = len(docs)
+        return docs, stats
+
+    def _prepare(self, vectorstore, question):
+        """Classify, retrieve, compress and pack. Returns (docs, prompt docs,
+        context, question class, stats); context is None when nothing was
+        found."""
+        # ------------------ QUERY REWRITE ------------------
+        rewritten_question = self._rewrite_query(question)
+        topics = classify_topics(rewritten_question)
+
+        # ------------------ QUESTION CLASS -> BUDGET ------------------
+        question_class = classify_question(question)
+        profile = PROFILES[question_class]
+
+        # ------------------ ROUTED, SCORE-CUT RETRIEVAL ------------------
+        query_vector = np.asarray(self.query_embedder.embed_query(rewritten_question), dtype=np.float32)
+        docs, stats = self._routed_retrieve(vectorstore, query_vector, topics)
+        stats["class"] = question_class
+
+        if not docs:
+            return docs, docs, None, question_class, stats
+
+        # ------------------ CONTEXT COMPRESSION ------------------
+        prompt_docs = docs
+        if COMPRESSION_ENABLED:
+            prompt_docs, stats["compression"] = self.compressor.compress(docs, query_vector)
+
+        context = self._format_docs(prompt_docs, budget=profile["context_chars"])
+        stats["context_chars"] = len(context)
+        return docs, prompt_docs, context, question_class, stats
+
+    def _generate(self, context, question, question_class, deadline=None):
+        profile = PROFILES[question_class]
+        return self.llm.complete(
+            context,
+            question,
+            deadline=deadline,
+            system_prompt=PROMPTS[profile["prompt"]],
+            max_tokens=profile["max_tokens"],
+        )
+
+    def _degraded_reason(self, error):
+        if isinstance(error, CircuitOpenError):
+            return "circuit_open"
+        if isinstance(error, TimeoutError):
+            return "timeout"
+        return "llm_error"
 
-    def ask(self, question):
+    def ask(self, question, short_only=False):
+        """Full answer, or with short_only just SHORT_ANSWER plus an
+        answer_id for ask_long()."""
         docs = []
+        started = time.perf_counter()
 
         try:
-            if not self.vectorstore:
+            # Capture once so a concurrent index swap cannot change it mid-request
+            vectorstore = self.vectorstore
+            if not vectorstore:
                 raise ValueError("Vectorstore not loaded")
 
-            if not self.prompt or not self.llm:
+            # ------------------ DIRECT LOOKUP (no retrieval, no LLM) ------------------
+            lookup = self.lookup
+            match = lookup.match(question) if lookup is not None else None
+            if match:
+                entry, lookup_stats = match
+                self.fallback_metrics.record()
+                return dict(lookup_answer(entry), degraded=False, stats={"lookup": lookup_stats})
+
+            if not self.llm:
                 raise ValueError("QA chain not initialized")
 
-            # ------------------ QUERY REWRITE ------------------
-            rewritten_question = self._rewrite_query(question)
-            q = rewritten_question.lower()
-
-            # ------------------ DYNAMIC RETRIEVAL DEPTH ------------------
-            k = 15
-            if "complete" in q or "full" in q:
-                k = 30
-            if any(x in q for x in ["gst", "gstr", "tax", "rcm"]):
-                k = 35
-            if any(x in q for x in ["security", "user", "permission"]):
-                k = 30
-            if any(x in q for x in ["inventory", "stock", "reorder"]):
-                k = 30
-
-            # ------------------ HYBRID RETRIEVAL ------------------
-            docs = self._hybrid_retrieve(rewritten_question, k=k)
-
-            if not docs:
+            docs, prompt_docs, context, question_class, stats = self._prepare(vectorstore, question)
+
+            if context is None:
                 return {
                     "short_answer": "No relevant documentation found.",
                     "long_answer": "The system could not retrieve relevant TallyPrime documentation for this topic.",
                     "sources": [],
                     "watch_video": False,
-                    "video_links": []
+                    "video_links": [],
+                    "stats": stats
                 }
 
-            # ------------------ GENERATION ------------------
-            context = self._format_docs(docs)
-            chain = self.prompt | self.llm | StrOutputParser()
-
-            raw_response = chain.invoke({
-                "context": context,
-                "question": question
-            })
-
-            # ------------------ PARSE RESPONSE ------------------
-            if "SHORT_ANSWER:" in raw_response and "LONG_ANSWER:" in raw_response:
-                short = raw_response.split("SHORT_ANSWER:")[1].split("LONG_ANSWER:")[0].strip()
-                long = raw_response.split("LONG_ANSWER:")[1].strip()
-            else:
-                short = raw_response[:300]
-                long = raw_response
-
-            # ------------------ SAFE SOURCE BUILD ------------------
-            related_articles = []
-            seen = set()
-
-            for d in docs:
-                source = d.metadata.get("source", "")
-                title = d.metadata.get("title", "Unknown")
-
-                if not source:
-                    continue
-                # 🔥 NORMALIZE URL (remove fragments + query params)
-                clean_source = source.split("#")[0].split("?")[0].strip().lower()
-
-                if clean_source not in seen:
-                    related_articles.append({
-                        "title": title,
-                        "source": clean_source
-                    })
-                    seen.add(clean_source)
-            # ------------------ VIDEO DETECTION ------------------
-            watch_video = False
-            video_links = []
-
-            for article in related_articles:
-                src = article["source"].lower()
-
-                # Detect video pages automatically
-                if "video" in src or "youtube.com" in src or "youtu.be" in src:
-                    watch_video = True
-                    video_links.append({
-                        "title": article["title"],
-                        "source": article["source"]
-                    })
+            # ------------------ GENERATION (within the SLO) ------------------
+            # The LLM only gets the time that is left; if it cannot answer in
+            # time (or is failing) the retrieved passages are the answer
+            budget = ANSWER_SLO - (time.perf_counter() - started) - FALLBACK_MARGIN
+            degraded = None
+            try:
+                if budget < MIN_LLM_BUDGET:
+                    degraded = "no_budget"
+                elif short_only:
+                    raw_response, stats["llm"] = self.llm.complete(
+                        context, question, deadline=budget,
+                        system_prompt=PROMPTS["short"], max_tokens=SHORT_MAX_TOKENS,
+                    )
+                    short, long = self._parse_response(raw_response)[0], None
+                else:
+                    raw_response, stats["llm"] = self._generate(context, question, question_class, deadline=budget)
+                    short, long = self._parse_response(raw_response)
+            except Exception as e:
+                print("⚠️ LLM unavailable, answering from retrieval:", type(e).__name__, str(e))
+                degraded = self._degraded_reason(e)
+
+            if degraded:
+                fallback = extractive_answer(prompt_docs)
+                short, long = fallback["short_answer"], fallback["long_answer"]
+                stats["degraded_reason"] = degraded
+            self.fallback_metrics.record(degraded)
+
+            answer_id = None
+            if short_only:
+                answer_id = self.contexts.put({
+                    "question": question,
+                    "context": context,
+                    "class": question_class,
+                    "docs": prompt_docs,
+                })
+
+            related_articles, watch_video, video_links = self._sources(docs)
 
             # ------------------ FINAL RETURN ------------------
-            return {
+            if not degraded:
+                self.class_metrics.record(question_class, time.perf_counter() - started, stats["llm"])
+            result = {
                 "short_answer": short,
                 "long_answer": long,
                 "sources": related_articles[:5],
                 "watch_video": watch_video,
-                "video_links": video_links
+                "video_links": video_links,
+                "degraded": bool(degraded),
+                "stats": stats,
+                # For the answer cache (popped by server.py before responding)
+                "dependencies": answer_dependencies(docs),
             }
+            if short_only:
+                result["answer_id"] = answer_id
+            return result
 
         except Exception as e:
             print("🔥 ask() ERROR:", str(e))
@@ -241,12 +376,128 @@ class TallyQASystem:
                 "video_links": []
             }
 
+    def ask_long(self, answer_id, question=None):
+        """LONG_ANSWER for a short-first answer, from the stored context.
+        If the context has expired (or lives in another worker) it is
+        rebuilt from question."""
+        try:
+            if not self.llm:
+                raise ValueError("QA chain not initialized")
+
+            entry = self.contexts.get(answer_id) if answer_id else None
+            stats = {"context_reused": entry is not None}
+
+            if entry is None:
+                if not question:
+                    raise KeyError("Unknown or expired answer_id; send the question to rebuild it")
+                vectorstore = self.vectorstore
+                if not vectorstore:
+                    raise ValueError("Vectorstore not loaded")
+                _, prompt_docs, context, question_class, stats["retrieval"] = self._prepare(vectorstore, question)
+                if context is None:
+                    return {
+                        "answer_id": answer_id,
+                        "long_answer": "The system could not retrieve relevant TallyPrime documentation for this topic.",
+                        "stats": stats
+                    }
+                entry = {"question": question, "context": context, "class": question_class, "docs": prompt_docs}
+
+            try:
+                raw_response, stats["llm"] = self._generate(
+                    entry["context"], entry["question"], entry["class"],
+                    deadline=ANSWER_SLO - FALLBACK_MARGIN,
+                )
+                long, degraded = self._parse_response(raw_response)[1], None
+            except Exception as e:
+                print("⚠️ LLM unavailable, answering from retrieval:", type(e).__name__, str(e))
+                long, degraded = extractive_answer(entry["docs"])["long_answer"], self._degraded_reason(e)
+                stats["degraded_reason"] = degraded
+            self.fallback_metrics.record(degraded)
+
+            return {
+                "answer_id": answer_id,
+                "long_answer": long,
+                "degraded": bool(degraded),
+                "stats": stats
+            }
+
+        except Exception as e:
+            print("🔥 ask_long() ERROR:", str(e))
+            return {
+                "answer_id": answer_id,
+                "long_answer": "An internal error occurred: " + str(e),
+                "error": True
+            }
+
+    # ------------------ PARSE RESPONSE ------------------
+
+    def _parse_response(self, raw_response):
+        """(short, long) from a SHORT_ANSWER:/LONG_ANSWER: reply."""
+        if "SHORT_ANSWER:" in raw_response and "LONG_ANSWER:" in raw_response:
+            short = raw_response.split("SHORT_ANSWER:")[1].split("LONG_ANSWER:")[0].strip()
+            long = raw_response.split("LONG_ANSWER:")[1].strip()
+        elif "SHORT_ANSWER:" in raw_response:
+            short = raw_response.split("SHORT_ANSWER:")[1].strip()
+            long = short
+        else:
+            short = raw_response[:300]
+            long = raw_response
+        return short, long
+
+    # ------------------ SAFE SOURCE BUILD ------------------
+
+    def _sources(self, docs):
+        """(related articles, watch_video, video links) for the answer."""
+        related_articles = []
+        seen = set()
+
+        for d in docs:
+            source = d.metadata.get("source", "")
+            title = d.metadata.get("title", "Unknown")
+
+            if not source:
+                continue
+            # 🔥 NORMALIZE URL (remove fragments + query params)
+            clean_source = source.split("#")[0].split("?")[0].strip().lower()
+
+            if clean_source not in seen:
+                related_articles.append({
+                    "title": title,
+                    "source": clean_source
+                })
+                seen.add(clean_source)
+
+        # ------------------ VIDEO DETECTION ------------------
+        watch_video = False
+        video_links = []
+
+        for article in related_articles:
+            src = article["source"].lower()
+
+            # Detect video pages automatically
+            if "video" in src or "youtube.com" in src or "youtu.be" in src:
+                watch_video = True
+                video_links.append({
+                    "title": article["title"],
+                    "source": article["source"]
+                })
+
+        return related_articles, watch_video, video_links
+
     # ------------------ FORMAT DOCS ------------------
 
-    def _format_docs(self, docs):
-        return "\n\n".join(
-            f"Title: {doc.metadata.get('title')}\n"
-            f"Source: {doc.metadata.get('source')}\n"
-            f"{doc.page_content}"
-            for doc in docs
-        )
+    def _format_docs(self, docs, budget=None):
+        """Docs in retrieval order until the character budget is spent
+        (the first one always goes in)."""
+        blocks, used = [], 0
+        for doc in docs:
+            block = (
+                f"Title: {doc.metadata.get('title')}\n"
+                f"Source: {doc.metadata.get('source')}\n"
+                f"{doc.page_content}"
+            )
+            if budget and blocks and used + len(block) > budget:
+                break
+            blocks.append(block)
+            used += len(block) + 2
+        return "\n\n".join(blocks)
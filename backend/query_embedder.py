@@ -0,0 +1,151 @@
+"""
+query_embedder.py
+Micro-batching query embedder.
+
+Concurrent /ask requests each used to run their own one-sentence MiniLM
+forward pass, and those threads fought over torch's intra-op pool. Here a
+single worker thread owns the model: callers queue their text and wait on a
+Future; the worker collects up to MAX_BATCH texts (or whatever arrived
+within MAX_WAIT_MS of the first one), runs them as one forward pass with a
+fixed torch thread count and hands each caller its own vector.
+embed_many() queues a list of texts the same way (context compression
+embeds its sentences through it), so every query-time forward pass shares
+the one worker and its thread setting.
+
+The worker thread starts on first use, so a gunicorn master that preloads
+the model never starts one; a forked worker notices the pid change and
+starts its own.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from langchain_core.embeddings import Embeddings
+
+MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "32"))
+MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "5"))
+QUERY_TIMEOUT = 30
+
+
+def default_torch_threads(workers=None):
+    """Physical cores (or the CPUs this process may run on) split across the
+    web workers, so gunicorn workers do not oversubscribe the machine."""
+    workers = workers or int(os.getenv("WEB_CONCURRENCY", "1"))
+    try:
+        import psutil
+        cores = psutil.cpu_count(logical=False)
+    except ImportError:
+        cores = None
+    if not cores:
+        cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    return max(1, cores // max(1, workers))
+
+
+TORCH_THREADS = int(os.getenv("EMBED_TORCH_THREADS", "0")) or default_torch_threads()
+
+
+class MicroBatchEmbedder(Embeddings):
+    """Embeddings whose embed_query / embed_many go through a shared batching
+    worker; embed_documents (index builds) is passed straight to the wrapped
+    embeddings."""
+
+    def __init__(self, embeddings, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS, torch_threads=TORCH_THREADS):
+        self.embeddings = embeddings
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.torch_threads = torch_threads
+
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+        self.batches = 0
+        self.queries = 0
+        self.largest_batch = 0
+
+    @property
+    def model_name(self):
+        return self.embeddings.model_name
+
+    # ------------------ WORKER ------------------
+
+    def _ensure_worker(self):
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            # A thread (and anything queued for it) does not survive a fork
+            self._queue = queue.Queue()
+            self._thread = threading.Thread(target=self._run, args=(self._queue,), name="query-embedder", daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def _collect(self, pending):
+        batch = [pending.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self, pending):
+        if self.torch_threads:  # 0 leaves torch's own setting alone
+            import torch
+            torch.set_num_threads(self.torch_threads)
+
+        # Queries skip the on-disk document cache and go straight to the model
+        model = getattr(self.embeddings, "embeddings", self.embeddings)
+
+        while True:
+            batch = self._collect(pending)
+            texts = [text for text, _ in batch]
+            try:
+                vectors = model.embed_documents(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.queries += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+    # ------------------ EMBEDDINGS API ------------------
+
+    def submit(self, text):
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def embed_query(self, text):
+        return self.submit(text).result(timeout=QUERY_TIMEOUT)
+
+    def embed_many(self, texts):
+        """Query-time vectors for several texts, batched with concurrent queries."""
+        futures = [self.submit(text) for text in texts]
+        return [future.result(timeout=QUERY_TIMEOUT) for future in futures]
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    def info(self):
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "queries": self.queries,
+            "mean_batch": round(self.queries / self.batches, 2) if self.batches else 0,
+            "largest_batch": self.largest_batch,
+        }
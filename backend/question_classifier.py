@@ -0,0 +1,78 @@
+"""
+question_classifier.py
+Cheap local question classifier and per-class generation budgets.
+
+    lookup      "what is the shortcut for ...", "where is ...", "which form ..."
+                -> one-line answer, small context, small output cap
+    procedural  "how do I ...", "steps to ...", "configure ..."
+                -> full step-by-step prompt, largest context and output cap
+    conceptual  everything else ("what is RCM", "difference between ...")
+                -> short structured explanation, medium budget
+
+Keyword rules only (microseconds, no model call). ClassMetrics keeps per
+class latency and token usage for /metrics.
+"""
+import re
+import threading
+from collections import defaultdict, deque
+
+import numpy as np
+
+LOOKUP_RE = re.compile(
+    r"\b(shortcut|hot ?key|key ?board|which key|what key|alt ?\+|ctrl ?\+|"
+    r"where (is|can i find|do i find)|which (menu|form|report|screen)|menu path|"
+    r"form (no|number)|hsn|sac code)\b",
+    re.IGNORECASE,
+)
+PROCEDURAL_RE = re.compile(
+    r"\b(how (to|do|can|should)|steps?|process|procedure|configure|set ?up|create|enable|"
+    r"activate|record|enter|pass|file|generate|alter|delete|reconcile|import|export|print)\b",
+    re.IGNORECASE,
+)
+LOOKUP_MAX_WORDS = 14
+
+# prompt: key into llm_client.PROMPTS; context_chars: budget for retrieved
+# text; max_tokens: output cap
+PROFILES = {
+    "lookup": {"prompt": "lookup", "context_chars": 2500, "max_tokens": 300},
+    "conceptual": {"prompt": "conceptual", "context_chars": 5000, "max_tokens": 700},
+    "procedural": {"prompt": "procedural", "context_chars": 9000, "max_tokens": 1024},
+}
+
+
+def classify_question(question):
+    words = len(question.split())
+    if LOOKUP_RE.search(question) and words <= LOOKUP_MAX_WORDS:
+        return "lookup"
+    if PROCEDURAL_RE.search(question):
+        return "procedural"
+    return "conceptual"
+
+
+class ClassMetrics:
+
+    def __init__(self, window=200):
+        self._latency = defaultdict(lambda: deque(maxlen=window))
+        self._counts = defaultdict(int)
+        self._tokens = defaultdict(lambda: defaultdict(int))
+        self._lock = threading.Lock()
+
+    def record(self, question_class, seconds, usage):
+        with self._lock:
+            self._counts[question_class] += 1
+            self._latency[question_class].append(seconds)
+            for field, value in (usage or {}).items():
+                self._tokens[question_class][field] += value
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for name, count in self._counts.items():
+                latency = list(self._latency[name])
+                result[name] = {
+                    "requests": count,
+                    "latency_p50_s": round(float(np.percentile(latency, 50)), 3),
+                    "latency_p90_s": round(float(np.percentile(latency, 90)), 3),
+                    "mean_tokens": {f: round(v / count, 1) for f, v in self._tokens[name].items()},
+                }
+            return result
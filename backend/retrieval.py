@@ -0,0 +1,145 @@
+"""
+retrieval.py
+Score-based helpers for the retrieval step in qa_system.
+
+Retrieval over-fetches FETCH_K candidates with their distances (squared L2
+on normalized MiniLM vectors, so 0 = identical, 2 = orthogonal) and then
+decides how many to keep from the scores themselves instead of from keywords
+in the question:
+
+    1. drop candidates farther than MAX_DISTANCE,
+    2. cut at the largest jump between consecutive distances (if it is at
+       least MIN_GAP),
+    3. clamp to [MIN_K, MAX_K].
+
+When the index has a document-level table (one title + summary vector per
+page), the search is coarse-to-fine: fetch_pages picks the COARSE_PAGES
+nearest pages and the chunk search only looks at those pages' chunks.
+
+The candidates come from one store query that also returns their vectors
+(fetch_candidates), so diversity is a NumPy MMR over that matrix (mmr)
+rather than a second store round-trip. All bounds are configurable through
+the environment.
+"""
+import os
+
+import numpy as np
+
+from index_snapshot import PAGE_COLLECTION
+
+FETCH_K = int(os.getenv("RETRIEVAL_FETCH_K", "50"))
+MIN_K = int(os.getenv("RETRIEVAL_MIN_K", "4"))
+MAX_K = int(os.getenv("RETRIEVAL_MAX_K", "35"))
+MAX_DISTANCE = float(os.getenv("RETRIEVAL_MAX_DISTANCE", "1.3"))
+MIN_GAP = float(os.getenv("RETRIEVAL_MIN_GAP", "0.08"))
+MMR_LAMBDA = float(os.getenv("RETRIEVAL_MMR_LAMBDA", "0.7"))  # 1 = pure relevance
+COARSE_PAGES = int(os.getenv("RETRIEVAL_COARSE_PAGES", "12"))  # 0 = chunk search only
+
+
+def choose_depth(distances, min_k=MIN_K, max_k=MAX_K, max_distance=MAX_DISTANCE, min_gap=MIN_GAP):
+    """How many of the (ascending) distances to keep; returns (k, reason)."""
+    count = len(distances)
+    if count <= min_k:
+        return count, "all"
+
+    d = np.asarray(distances[:max_k], dtype=np.float32)
+    within = int(np.searchsorted(d, max_distance, side="right"))
+    if within <= min_k:
+        return min_k, "min_k"
+
+    if within < len(d):
+        reason = "threshold"
+    else:
+        reason = "max_k" if count > max_k else "all"
+
+    # gaps[j] separates candidate j from j+1; cutting there keeps j+1 of them
+    tail = np.diff(d[:within])[min_k - 1:]
+    if len(tail):
+        i = int(np.argmax(tail))
+        if tail[i] >= min_gap:
+            return min_k + i, "gap"
+
+    return within, reason
+
+
+def depth_stats(distances, k, reason):
+    return {
+        "candidates": len(distances),
+        "depth": k,
+        "cut": reason,
+        "best_distance": round(float(distances[0]), 4) if len(distances) else None,
+        "cutoff_distance": round(float(distances[k - 1]), 4) if k else None,
+    }
+
+
+def fetch_pages(vectorstore, query_vector, m=COARSE_PAGES, filter=None):
+    """Sources of the m pages nearest to the query, or None when the index
+    was built without a document-level table."""
+    if hasattr(vectorstore, "search_pages"):
+        return vectorstore.search_pages(query_vector, m, filter) if vectorstore.has_pages() else None
+
+    try:
+        pages = vectorstore._client.get_collection(PAGE_COLLECTION)
+    except Exception:  # the not-found error type differs across chromadb versions
+        return None
+
+    result = pages.query(
+        query_embeddings=[list(query_vector)],
+        n_results=m,
+        where=filter or None,
+        include=["metadatas"],
+    )
+    return [metadata["source"] for metadata in result["metadatas"][0]]
+
+
+def fetch_candidates(vectorstore, query_vector, fetch_k=FETCH_K, filter=None):
+    """One nearest-neighbour query returning (docs, distances, vectors),
+    nearest first, from a SnapshotVectorStore or a Chroma store."""
+    if hasattr(vectorstore, "search_with_vectors"):
+        return vectorstore.search_with_vectors(query_vector, fetch_k, filter)
+
+    from langchain_core.documents import Document
+
+    result = vectorstore._collection.query(
+        query_embeddings=[list(query_vector)],
+        n_results=fetch_k,
+        where=filter or None,
+        include=["documents", "metadatas", "distances", "embeddings"],
+    )
+    docs = [
+        Document(id=id_, page_content=text, metadata=metadata or {})
+        for id_, text, metadata in zip(result["ids"][0], result["documents"][0], result["metadatas"][0])
+    ]
+    vectors = np.asarray(result["embeddings"][0], dtype=np.float32).reshape(len(docs), -1)
+    return docs, list(result["distances"][0]), vectors
+
+
+def mmr(query_vector, vectors, k, lambda_mult=MMR_LAMBDA):
+    """Row indices of up to k vectors picked by maximal marginal relevance
+    (cosine similarity), in pick order."""
+    count = len(vectors)
+    if k <= 0 or count == 0:
+        return []
+
+    v = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+    q = np.asarray(query_vector, dtype=np.float32)
+    q = q / max(float(np.linalg.norm(q)), 1e-12)
+
+    relevance = v @ q
+    similarity = v @ v.T
+
+    first = int(np.argmax(relevance))
+    picked = [first]
+    redundancy = similarity[first].copy()  # max similarity to anything picked
+    available = np.ones(count, dtype=bool)
+    available[first] = False
+
+    while len(picked) < min(k, count):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        i = int(np.argmax(scores))
+        picked.append(i)
+        available[i] = False
+        np.maximum(redundancy, similarity[i], out=redundancy)
+
+    return picked
@@ -1,8 +1,12 @@
 import os
+import time
 import datetime
 import asyncio
+import importlib
+import json
+import threading
+import uuid
 from contextlib import asynccontextmanager
-from functools import lru_cache
 
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
@@ -14,7 +18,10 @@ from slowapi import Limiter
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 
-from qa_system import TallyQASystem
+from answer_cache import (
+    AnswerCache, INDEX_CHANGES_FILE, WARM_CACHE_FILE,
+    is_usable, load_warm_cache, normalize_question, read_index_changes,
+)
 
 
 # --------------------------------------------------
@@ -33,34 +40,164 @@ initialization_error = None
 
 semaphore = asyncio.Semaphore(5)  # max concurrent requests
 
+# Startup runs in the background; /status reports where it is
+READY_WAIT_SECONDS = float(os.getenv("READY_WAIT_SECONDS", "15"))
+REQUIRE_BAKED_ARTIFACTS = os.getenv("REQUIRE_BAKED_ARTIFACTS") == "1"
+init_progress = {
+    "stage": "pending",       # pending | startup_check | import | construct | vectorstore | embedding_model
+                              # | warm_cache | warm_up | qa_chain | ready | failed
+    "started_at": None,
+    "ready_at": None,
+    "stages": {},             # stage -> seconds
+}
+qa_ready_event = asyncio.Event()
+
+answer_cache = AnswerCache(maxsize=1000)
+# After an index swap, serve affected answers until they are regenerated
+# in the background instead of dropping them
+REVALIDATE_ON_SWAP = os.getenv("ANSWER_CACHE_REVALIDATE") == "1"
+
+# Optional JSONL log of asked questions, input for precompute_faq.py
+QUESTION_LOG = os.getenv("QUESTION_LOG")
+question_log_lock = threading.Lock()
+
+# Multi-worker mode (gunicorn --preload): shared state loaded before fork
+PRELOAD_QA_SYSTEM = os.getenv("PRELOAD_QA_SYSTEM") == "1"
+preloaded_system = None
+
+# Blue/green index swap. Each gunicorn worker holds its own index handle and
+# answer cache, so the worker that takes the request publishes the swap to
+# ACTIVE_INDEX_FILE and every worker (itself included) polls that file and
+# applies what it has not applied yet. A worker that restarts later picks
+# up the active index the same way.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+ACTIVE_INDEX_FILE = os.getenv("ACTIVE_INDEX_FILE", "active_index.json")
+INDEX_WATCH_SECONDS = float(os.getenv("INDEX_WATCH_SECONDS", "5"))  # 0 = single process, no watching
+index_swap = {
+    "id": None,               # id of the last swap this worker started
+    "state": "idle",          # idle | queued | loading | warming | swapped | failed
+    "path": None,
+    "started_at": None,
+    "finished_at": None,
+    "vector_documents": None,
+    "invalidated": None,      # cached answers dropped (or marked stale), or "all"
+    "error": None,
+}
+swap_lock = asyncio.Lock()
+
+# The event loop only keeps weak references to tasks, so fire-and-forget
+# tasks (index swaps, stale-answer revalidation) are held here until done
+background_tasks = set()
+
 
 # --------------------------------------------------
 # Lifespan Startup (Modern FastAPI)
 # --------------------------------------------------
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    global qa_system, qa_ready, initialization_error
+def _timed(stage, fn):
+    init_progress["stage"] = stage
+    start = time.perf_counter()
+    result = fn()
+    init_progress["stages"][stage] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def load_shared_state():
+    """Everything that is safe to share across forked workers: the code, the
+    embedding model weights and a memory-mapped snapshot index."""
+    if REQUIRE_BAKED_ARTIFACTS:
+        # Fail before touching the model/index rather than fall back to the network
+        from baked_artifacts import check
+        _timed("startup_check", check)
+
+    module = _timed("import", lambda: importlib.import_module("qa_system"))
+    system = _timed("construct", module.TallyQASystem)
+
+    # A Chroma client (sqlite handles, threads) must not cross a fork, so
+    # only the snapshot store is opened before forking
+    if os.path.isfile(system.snapshot_file):
+        _timed("vectorstore", system.load_vectorstore)
+
+    _timed("embedding_model", system.load_embedding_model)
+    return system
+
+
+def initialize_qa_system():
+    """Runs in a worker thread so the app accepts connections immediately."""
+    global qa_system
+
+    system = preloaded_system or load_shared_state()
+
+    if system.vectorstore is None:
+        _timed("vectorstore", system.load_vectorstore)
+    index_key = system.index_key()
+    changes = read_index_changes(INDEX_CHANGES_FILE, index_key)
+    warmed = _timed("warm_cache", lambda: load_warm_cache(answer_cache, WARM_CACHE_FILE, index_key, changes))
+    print(f"🔥 Loaded {warmed} warm answers")
+    _timed("warm_up", system.warm_up)
+    _timed("qa_chain", system.create_qa_chain)
+
+    qa_system = system
+
+
+def configure_worker(workers):
+    """gunicorn post_fork hook: give each worker its share of torch threads
+    instead of every worker spinning up one thread per core."""
+    from query_embedder import default_torch_threads
+
+    threads = int(os.getenv("TORCH_THREADS_PER_WORKER", "0")) or default_torch_threads(workers)
+
+    import torch
+    torch.set_num_threads(threads)
+    print(f"👷 Worker {os.getpid()}: {threads} torch threads")
+
+
+async def initialize_in_background():
+    global qa_ready, initialization_error
 
     try:
         print("🚀 Initializing QA system...")
+        init_progress["started_at"] = datetime.datetime.utcnow().isoformat()
 
-        qa_system = TallyQASystem()
-        qa_system.load_vectorstore()
-        qa_system.create_qa_chain()
+        await asyncio.to_thread(initialize_qa_system)
 
         qa_ready = True
-        print("✅ QA system ready.")
+        init_progress["stage"] = "ready"
+        init_progress["ready_at"] = datetime.datetime.utcnow().isoformat()
+        print("✅ QA system ready.", init_progress["stages"])
 
     except Exception as e:
         initialization_error = str(e)
+        init_progress["stage"] = "failed"
         print("❌ QA initialization failed:", initialization_error)
 
+    finally:
+        qa_ready_event.set()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_task = asyncio.create_task(initialize_in_background())
+    watch_task = asyncio.create_task(watch_active_index()) if INDEX_WATCH_SECONDS > 0 else None
+
     yield
 
+    init_task.cancel()
+    if watch_task:
+        watch_task.cancel()
     print("🛑 Shutting down...")
 
 
+if PRELOAD_QA_SYSTEM:
+    # Imported by the gunicorn master: load once, then fork copy-on-write.
+    # gc.freeze keeps the collector from touching (and so copying) these pages.
+    import gc
+
+    print("🚀 Preloading shared QA state before fork...")
+    preloaded_system = load_shared_state()
+    gc.freeze()
+
+
 # --------------------------------------------------
 # Create App FIRST
 # --------------------------------------------------
@@ -105,15 +242,56 @@ async def rate_limit_handler(request: Request, exc):
 
 class QuestionRequest(BaseModel):
     question: str
+    mode: str = "full"  # "short": SHORT_ANSWER only, LONG_ANSWER via /ask/long
+
+
+class LongAnswerRequest(BaseModel):
+    answer_id: str
+    question: str = ""  # lets any worker rebuild an expired context
+
+
+class IndexSwapRequest(BaseModel):
+    path: str = "./tally_chroma_db_new"  # Chroma directory or .snap file
 
 
 # --------------------------------------------------
 # Caching Layer (Cost Reduction)
 # --------------------------------------------------
 
-@lru_cache(maxsize=1000)
-def cached_ask(question: str):
-    return qa_system.ask(question.lower().strip())
+def cached_ask(question: str, short_only: bool = False):
+    cached = answer_cache.get(question)
+    # A short-first entry has no long answer yet, so it only serves short mode
+    if cached is not None and (short_only or cached.get("long_answer") is not None):
+        return cached
+
+    result = qa_system.ask(normalize_question(question), short_only=short_only)
+    dependencies = result.pop("dependencies", None)
+    if is_usable(result):
+        answer_cache.put(question, result, dependencies)  # errors and degraded answers are retried next time
+    return result
+
+
+def cached_ask_long(answer_id: str, question: str):
+    result = qa_system.ask_long(answer_id, normalize_question(question) if question else None)
+
+    # Complete the cached short-first entry so the next full /ask is a hit
+    cached = answer_cache.get(question) if question else None
+    if cached is not None and cached.get("answer_id") == answer_id and not (result.get("error") or result.get("degraded")):
+        answer_cache.put(question, dict(cached, long_answer=result["long_answer"]))
+    return result
+
+
+def log_question(question: str, request: Request):
+    if not QUESTION_LOG:
+        return
+    record = {
+        "time": datetime.datetime.utcnow().isoformat(),
+        "question": question,
+        "origin": request.headers.get("origin"),  # tenant subdomain
+    }
+    with question_log_lock:
+        with open(QUESTION_LOG, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
 
 
 # --------------------------------------------------
@@ -130,7 +308,9 @@ async def root():
         "endpoints": {
             "health": "/health",
             "status": "/status",
+            "metrics": "/metrics",
             "ask": "/ask (POST)",
+            "ask_long": "/ask/long (POST)",
             "docs": "/docs"
         }
     }
@@ -139,7 +319,7 @@ async def root():
 @app.get("/health")
 def health():
     try:
-        count = qa_system.vectorstore._collection.count()
+        count = qa_system.vector_count()
         return {
             "status": "healthy",
             "vector_documents": count,
@@ -161,18 +341,59 @@ async def status():
         "qa_ready": qa_ready,
         "api_key_present": bool(api_key),
         "vector_db_exists": os.path.exists("./tally_chroma_db"),
+        "index_snapshot_exists": os.path.exists(qa_system.snapshot_file if qa_system else "tally_index.snap"),
+        "index_path": qa_system.index_path if qa_system else None,
         "docs_file_exists": os.path.exists("tally_docs.json"),
-        "initialization_error": initialization_error
+        "initialization_error": initialization_error,
+        "init": init_progress,
+        "worker_pid": os.getpid(),
+        "answer_cache": answer_cache.info(),
+        "query_embedder": qa_system.query_embedder.info() if qa_system else None,
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    return {
+        "worker_pid": os.getpid(),
+        "llm": qa_system.llm.metrics() if qa_system and qa_system.llm else None,
+        "answer_cache": answer_cache.info(),
+        "query_embedder": qa_system.query_embedder.info() if qa_system else None,
+        "classes": qa_system.class_metrics.snapshot() if qa_system else None,
+        "long_answer_contexts": qa_system.contexts.info() if qa_system else None,
+        "fallback": qa_system.fallback_metrics.snapshot() if qa_system else None,
+        "lookup": qa_system.lookup.info() if qa_system and qa_system.lookup else None,
     }
 
 
 @app.post("/ask")
 @limiter.limit("10/minute")
 async def ask_question(request: Request, req: QuestionRequest):
+    log_question(req.question, request)
+
+    if not qa_ready:
+        # Serve what we already know, otherwise queue until startup finishes
+        cached = answer_cache.get(req.question)
+        if cached is not None:
+            return cached
+
+        try:
+            await asyncio.wait_for(qa_ready_event.wait(), timeout=READY_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+        if not qa_ready:
+            return {
+                "short_answer": "The assistant is still starting up.",
+                "long_answer": "Please try again in a few seconds.",
+                "sources": [],
+                "status": init_progress["stage"],
+            }
+
     async with semaphore:
         try:
             result = await asyncio.wait_for(
-                asyncio.to_thread(cached_ask, req.question),
+                asyncio.to_thread(cached_ask, req.question, req.mode == "short"),
                 timeout=20
             )
             return result
@@ -193,6 +414,199 @@ async def ask_question(request: Request, req: QuestionRequest):
             }
 
 
+@app.post("/ask/long")
+@limiter.limit("10/minute")
+async def ask_long_answer(request: Request, req: LongAnswerRequest):
+    if not qa_ready:
+        raise HTTPException(status_code=503, detail="QA system is not ready.")
+
+    async with semaphore:
+        try:
+            return await asyncio.wait_for(
+                asyncio.to_thread(cached_ask_long, req.answer_id, req.question),
+                timeout=20
+            )
+
+        except asyncio.TimeoutError:
+            return {
+                "answer_id": req.answer_id,
+                "long_answer": "The system took too long to respond.",
+                "error": True
+            }
+
+
+# --------------------------------------------------
+# Admin: blue/green index swap
+# --------------------------------------------------
+
+def require_admin(request: Request):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN not set).")
+    if request.headers.get("x-admin-token") != ADMIN_TOKEN:
+        raise HTTPException(status_code=401, detail="Invalid admin token.")
+
+
+def load_and_warm_index(path):
+    """Runs in a worker thread; the live index keeps serving meanwhile."""
+    index_swap["state"] = "loading"
+    new_store = qa_system.open_vectorstore(path)
+
+    index_swap["state"] = "warming"
+    count = qa_system.vector_count(new_store)
+    if count == 0:
+        raise ValueError(f"Index at {path} is empty")
+    new_store.similarity_search("Gateway of Tally", k=1)  # loads the HNSW segment
+
+    old_key = qa_system.index_key()
+    qa_system.swap_vectorstore(new_store, path)
+    new_key = qa_system.index_key()
+
+    # Answers were built from the old index: drop only those that used a
+    # changed or removed page, if the pipeline recorded what changed
+    changes = read_index_changes(INDEX_CHANGES_FILE, new_key, old_key)
+    if changes is None:
+        answer_cache.clear()
+        index_swap["invalidated"] = "all"
+    else:
+        affected = answer_cache.invalidate(changes["changed"] + changes["removed"], stale=REVALIDATE_ON_SWAP)
+        index_swap["invalidated"] = len(affected)
+        print(f"♻️ {len(affected)} cached answers depend on changed pages"
+              f"{' (serving stale until refreshed)' if REVALIDATE_ON_SWAP else ''}")
+
+    warmed = load_warm_cache(answer_cache, WARM_CACHE_FILE, new_key, changes)
+    print(f"🔥 Loaded {warmed} warm answers for the new index")
+    return count
+
+
+async def revalidate_stale_answers():
+    """Regenerate stale answers one at a time, sharing the request semaphore."""
+    questions = answer_cache.stale_questions()
+    refreshed = 0
+    for question in questions:
+        async with semaphore:
+            try:
+                result = await asyncio.to_thread(qa_system.ask, question)
+            except Exception as e:
+                print("🔥 Revalidation failed:", str(e))
+                result = {"degraded": True}
+
+        dependencies = result.pop("dependencies", None)
+        if is_usable(result):
+            answer_cache.put(question, result, dependencies)
+            refreshed += 1
+        else:
+            answer_cache.discard(question)
+    print(f"♻️ Revalidated {refreshed} of {len(questions)} stale answers")
+
+
+def _background_task_done(task):
+    background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"🔥 Background task {task.get_name()} failed:", repr(task.exception()))
+
+
+def start_background_task(coro, name=None):
+    task = asyncio.create_task(coro, name=name)
+    background_tasks.add(task)
+    task.add_done_callback(_background_task_done)
+    return task
+
+
+async def run_index_swap(path):
+    async with swap_lock:
+        try:
+            count = await asyncio.to_thread(load_and_warm_index, path)
+            index_swap.update(state="swapped", vector_documents=count)
+            if REVALIDATE_ON_SWAP:
+                start_background_task(revalidate_stale_answers(), name="revalidate-stale-answers")
+        except Exception as e:
+            print("❌ Index swap failed:", str(e))
+            index_swap.update(state="failed", error=str(e))
+        index_swap["finished_at"] = datetime.datetime.utcnow().isoformat()
+
+
+def start_index_swap(swap_id, path):
+    index_swap.update(
+        id=swap_id,
+        state="queued",
+        path=path,
+        started_at=datetime.datetime.utcnow().isoformat(),
+        finished_at=None,
+        vector_documents=None,
+        invalidated=None,
+        error=None,
+    )
+    start_background_task(run_index_swap(path), name=f"index-swap-{swap_id}")
+
+
+def read_active_index():
+    try:
+        with open(ACTIVE_INDEX_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def publish_active_index(swap_id, path):
+    tmp = f"{ACTIVE_INDEX_FILE}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"id": swap_id, "path": path, "requested_at": datetime.datetime.utcnow().isoformat()}, f)
+    os.replace(tmp, ACTIVE_INDEX_FILE)
+
+
+async def watch_active_index():
+    """Apply swaps published by other workers (and by earlier lives of this one)."""
+    while True:
+        await asyncio.sleep(INDEX_WATCH_SECONDS)
+        if not qa_ready or swap_lock.locked():
+            continue
+
+        active = read_active_index()
+        if active is None or active.get("id") == index_swap["id"]:
+            continue
+        path = active.get("path")
+        if not path or not os.path.exists(path):
+            print(f"⚠️ Active index {path} from {ACTIVE_INDEX_FILE} does not exist; ignoring")
+            index_swap["id"] = active.get("id")
+            continue
+
+        print(f"🔁 Worker {os.getpid()}: applying index swap {active['id']} ({path})")
+        start_index_swap(active["id"], path)
+
+
+@app.post("/admin/index/swap", status_code=202)
+async def swap_index(request: Request, req: IndexSwapRequest):
+    require_admin(request)
+
+    if not qa_ready:
+        raise HTTPException(status_code=503, detail="QA system is not ready.")
+
+    path = os.path.realpath(req.path)
+    if not path.startswith(os.path.realpath(".") + os.sep) or not os.path.exists(path):
+        raise HTTPException(status_code=400, detail="Index path must be an existing snapshot or directory inside the app.")
+
+    if swap_lock.locked() or index_swap["state"] in ("queued", "loading", "warming"):
+        raise HTTPException(status_code=409, detail="An index swap is already running.")
+
+    swap_id = uuid.uuid4().hex
+    start_index_swap(swap_id, path)
+    if INDEX_WATCH_SECONDS > 0:
+        publish_active_index(swap_id, path)  # the other workers follow
+    return index_swap
+
+
+@app.get("/admin/index")
+async def index_status(request: Request):
+    require_admin(request)
+
+    return {
+        "worker_pid": os.getpid(),
+        "active_path": qa_system.index_path if qa_system else None,
+        "published": read_active_index(),
+        "swap": index_swap,
+    }
+
+
 # --------------------------------------------------
 # Entry point (HF / Docker / Local)
 # --------------------------------------------------
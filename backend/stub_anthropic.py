@@ -0,0 +1,283 @@
+"""
+stub_anthropic.py
+Local stand-in for the Anthropic Messages API, for development and tests.
+
+Records every request payload (in memory and, with --record, as JSON lines)
+and answers with a canned SHORT_ANSWER/LONG_ANSWER reply, as JSON or as an
+SSE stream when the request has "stream": true. Usage numbers
+imitate prompt caching: the prefix up to the last cache_control breakpoint
+is "written" the first time it is seen and "read" afterwards within the
+5-minute TTL, if it reaches the model's minimum cacheable length (estimated
+at 4 characters per token).
+
+Fault injection (flags at startup, or POST /_stub/config at runtime):
+    ttft_delay      seconds before the first token (after message_start)
+    slow_fraction   share of requests that wait slow_delay instead
+    slow_delay
+    token_delay     seconds between streamed text deltas
+    error_rate      share of requests answered with error_status
+    error_status    e.g. 429, 500, 529
+
+Usage:
+    python stub_anthropic.py --port 8765 --record stub_requests.jsonl
+    python stub_anthropic.py --slow-fraction 0.1 --slow-delay 6 --error-rate 0.05
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8765 ANTHROPIC_API_KEY=stub python server.py
+
+    GET  /_stub/requests    recorded payloads
+    POST /_stub/config      {"ttft_delay": 0.2, ...}; returns the active config
+    POST /_stub/reset       forget payloads and cached prefixes
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CACHE_TTL = 300
+CHARS_PER_TOKEN = 4
+
+# Minimum cacheable prefix, in tokens; Haiku models need twice as much
+MIN_CACHEABLE_TOKENS = {"haiku": 2048}
+DEFAULT_MIN_CACHEABLE = 1024
+
+DEFAULT_CONFIG = {
+    "ttft_delay": 0.0,
+    "slow_fraction": 0.0,
+    "slow_delay": 0.0,
+    "token_delay": 0.0,
+    "error_rate": 0.0,
+    "error_status": 529,
+}
+ERROR_TYPES = {429: "rate_limit_error", 500: "api_error", 529: "overloaded_error"}
+
+
+def _tokens(value):
+    return max(1, len(json.dumps(value, ensure_ascii=False)) // CHARS_PER_TOKEN)
+
+
+def _min_cacheable(model):
+    for name, tokens in MIN_CACHEABLE_TOKENS.items():
+        if name in model:
+            return tokens
+    return DEFAULT_MIN_CACHEABLE
+
+
+def split_prefix(payload):
+    """(cacheable prefix, rest) of the prompt: everything up to and
+    including the last block with cache_control, in tools/system/messages
+    order."""
+    blocks = []
+    system = payload.get("system") or []
+    if isinstance(system, str):
+        system = [{"type": "text", "text": system}]
+    blocks.extend(system)
+    for message in payload.get("messages", []):
+        content = message["content"]
+        if isinstance(content, str):
+            content = [{"type": "text", "text": content}]
+        blocks.extend(content)
+
+    last = max((i for i, b in enumerate(blocks) if b.get("cache_control")), default=-1)
+    return blocks[:last + 1], blocks[last + 1:]
+
+
+class StubState:
+
+    def __init__(self, record_path=None, **config):
+        self.record_path = record_path
+        self.config = dict(DEFAULT_CONFIG, **{k: v for k, v in config.items() if v is not None})
+        self.requests = []
+        self.prefixes = {}  # prefix json -> expiry
+        self.lock = threading.Lock()
+
+    def usage(self, payload):
+        prefix, rest = split_prefix(payload)
+        prefix_tokens = _tokens(prefix) if prefix else 0
+        usage = {
+            "input_tokens": _tokens(rest),
+            "output_tokens": 0,
+            "cache_creation_input_tokens": 0,
+            "cache_read_input_tokens": 0,
+        }
+
+        if not prefix or prefix_tokens < _min_cacheable(payload.get("model", "")):
+            usage["input_tokens"] += prefix_tokens
+            return usage
+
+        key = json.dumps([payload.get("model"), prefix], sort_keys=True)
+        now = time.time()
+        with self.lock:
+            hit = self.prefixes.get(key, 0) > now
+            self.prefixes[key] = now + CACHE_TTL
+        usage["cache_read_input_tokens" if hit else "cache_creation_input_tokens"] = prefix_tokens
+        return usage
+
+    def record(self, payload):
+        with self.lock:
+            self.requests.append(payload)
+            number = len(self.requests)
+            if self.record_path:
+                with open(self.record_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(payload, ensure_ascii=False) + "\n")
+        return number
+
+    def reset(self):
+        with self.lock:
+            self.requests.clear()
+            self.prefixes.clear()
+
+    def first_token_delay(self):
+        config = self.config
+        if random.random() < config["slow_fraction"]:
+            return config["slow_delay"]
+        return config["ttft_delay"]
+
+
+def reply_text(number):
+    return (
+        "SHORT_ANSWER:\n"
+        "Stub answer from stub_anthropic.py.\n"
+        "LONG_ANSWER:\n"
+        f"1. This reply is canned (request #{number}).\n"
+        "2. Inspect /_stub/requests to see the payload that was sent."
+    )
+
+
+def make_response(number, payload, usage):
+    text = reply_text(number)
+    usage["output_tokens"] = max(1, len(text) // CHARS_PER_TOKEN)
+    return {
+        "id": f"msg_stub_{number:06d}",
+        "type": "message",
+        "role": "assistant",
+        "model": payload.get("model", "stub"),
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": usage,
+    }
+
+
+def stream_events(number, payload, usage):
+    """SSE events of a streamed reply, split into a few text deltas."""
+    message = make_response(number, payload, dict(usage))
+    text = message["content"][0]["text"]
+    output_tokens = message["usage"]["output_tokens"]
+    message.update(content=[], stop_reason=None)
+    message["usage"]["output_tokens"] = 1
+
+    yield "message_start", {"type": "message_start", "message": message}
+    yield "content_block_start", {"type": "content_block_start", "index": 0,
+                                  "content_block": {"type": "text", "text": ""}}
+    for line in text.splitlines(keepends=True):
+        yield "content_block_delta", {"type": "content_block_delta", "index": 0,
+                                      "delta": {"type": "text_delta", "text": line}}
+    yield "content_block_stop", {"type": "content_block_stop", "index": 0}
+    yield "message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                            "usage": {"output_tokens": output_tokens}}
+    yield "message_stop", {"type": "message_stop"}
+
+
+def make_handler(state):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def _send(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _payload(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def do_GET(self):
+            if self.path == "/_stub/requests":
+                with state.lock:
+                    self._send(200, {"requests": list(state.requests)})
+            else:
+                self._send(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+
+        def _stream(self, number, payload, usage):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+
+            delay = state.first_token_delay()
+            try:
+                for name, event in stream_events(number, payload, usage):
+                    if event["type"] == "content_block_delta":
+                        time.sleep(delay)
+                        delay = state.config["token_delay"]
+                    self.wfile.write(f"event: {name}\ndata: {json.dumps(event)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the client cancelled (e.g. the losing hedge)
+
+        def do_POST(self):
+            if self.path == "/_stub/reset":
+                state.reset()
+                self._send(200, {"ok": True})
+                return
+
+            if self.path == "/_stub/config":
+                state.config.update(self._payload())
+                self._send(200, state.config)
+                return
+
+            if self.path.split("?")[0] != "/v1/messages":
+                self._send(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+                return
+
+            payload = self._payload()
+            number = state.record(payload)
+
+            if random.random() < state.config["error_rate"]:
+                status = int(state.config["error_status"])
+                self._send(status, {"type": "error", "error": {
+                    "type": ERROR_TYPES.get(status, "api_error"), "message": "Injected by stub_anthropic.py",
+                }})
+                return
+
+            usage = state.usage(payload)
+            if payload.get("stream"):
+                self._stream(number, payload, usage)
+            else:
+                time.sleep(state.first_token_delay())
+                self._send(200, make_response(number, payload, usage))
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(port=8765, record_path=None, **config):
+    """Start the stub in a background thread; returns (server, state)."""
+    state = StubState(record_path, **config)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Anthropic Messages API stub")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--record", help="append request payloads to this JSONL file")
+    for name, default in DEFAULT_CONFIG.items():
+        parser.add_argument("--" + name.replace("_", "-"), type=type(default))
+    args = parser.parse_args()
+
+    state = StubState(args.record, **{name: getattr(args, name) for name in DEFAULT_CONFIG})
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(state))
+    print(f"🧪 Anthropic stub on http://127.0.0.1:{args.port} (set ANTHROPIC_BASE_URL to this)")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import json
+
+import pytest
+
+from answer_cache import (
+    AnswerCache, is_usable, load_warm_cache, read_index_changes, read_warm_cache, save_index_changes, save_warm_cache,
+)
+from precompute_faq import read_log
+
+ANSWER = {"short_answer": "Press Alt+F2.", "long_answer": "Press Alt+F2.", "sources": [{"source": "https://h/"}]}
+
+
+def test_warm_cache_loads_for_the_same_index(tmp_path):
+    path = str(tmp_path / "warm_cache.json")
+    save_warm_cache(path, {"how to change period": ANSWER}, "index-a")
+
+    cache = AnswerCache()
+    assert load_warm_cache(cache, path, "index-a") == 1
+    assert cache.get("  How to change period ") == ANSWER
+
+
+def cache_with_dependencies():
+    cache = AnswerCache()
+    cache.put("gst rates", {"a": 1}, {"chunks": ["c1"], "sources": ["https://h/gst/"]})
+    cache.put("payroll", {"a": 2}, {"chunks": ["c2"], "sources": ["https://h/payroll/"]})
+    cache.put("legacy", {"a": 3})
+    return cache
+
+
+def test_invalidate_drops_only_dependent_answers():
+    cache = cache_with_dependencies()
+    # sources are normalized; answers without dependencies always go
+    assert cache.invalidate(sources=["https://H/gst/#rates"]) == ["gst rates", "legacy"]
+    assert cache.get("gst rates") is None
+    assert cache.get("payroll") == {"a": 2}
+    assert cache.invalidate(chunk_ids=["c2"]) == ["payroll"]
+    assert len(cache) == 0
+    assert cache.info()["tracked"] == 0
+
+
+def test_stale_answers_are_served_until_replaced():
+    cache = cache_with_dependencies()
+    assert cache.invalidate(sources=["https://h/payroll/"], stale=True) == ["legacy", "payroll"]
+    assert cache.get("payroll") == {"a": 2}
+    assert sorted(cache.stale_questions()) == ["legacy", "payroll"]
+
+    cache.put("payroll", {"a": 20})
+    assert cache.stale_questions() == ["legacy"]
+    # put without dependencies keeps the recorded ones
+    assert cache.dependents(chunk_ids=["c2"]) == {"legacy", "payroll"}
+
+
+def test_eviction_untracks_dependencies():
+    cache = AnswerCache(maxsize=1)
+    cache.put("gst rates", {"a": 1}, {"chunks": ["c1"], "sources": ["https://h/gst/"]})
+    cache.put("payroll", {"a": 2}, {"chunks": ["c2"], "sources": ["https://h/payroll/"]})
+    assert cache.dependents(chunk_ids=["c1"]) == set()
+    assert cache.info()["tracked"] == 1
+
+
+def test_warm_cache_is_ignored_for_another_index(tmp_path):
+    path = str(tmp_path / "warm_cache.json")
+    save_warm_cache(path, {"how to change period": ANSWER}, "index-a")
+
+    cache = AnswerCache()
+    assert load_warm_cache(cache, path, "index-b") == 0
+    assert len(cache) == 0
+    assert load_warm_cache(cache, str(tmp_path / "missing.json"), "index-a") == 0
+
+
+def test_unknown_format_version_is_rejected(tmp_path):
+    path = tmp_path / "warm_cache.json"
+    path.write_text(json.dumps({"format_version": 99, "entries": []}))
+    with pytest.raises(ValueError):
+        read_warm_cache(str(path))
+
+
+def test_read_log_ranks_by_frequency(tmp_path):
+    path = tmp_path / "questions.jsonl"
+    lines = [json.dumps({"question": q}) for q in ["GST?", "gst?", "Payroll?", "GST?", "payroll?", "TDS?"]]
+    path.write_text("\n".join(lines + ['{"question": "trunc']) + "\n")
+    assert read_log(str(path), top=10, min_count=2) == ["gst?", "payroll?"]
+
+
+def test_only_usable_answers_are_warmed():
+    assert is_usable(ANSWER)
+    assert not is_usable(dict(ANSWER, degraded=True))
+    assert not is_usable(dict(ANSWER, sources=[]))
+    assert not is_usable(dict(ANSWER, short_answer="An internal error occurred: boom"))
+    assert not is_usable(dict(ANSWER, error=True))
+
+
+def test_warm_cache_carries_unaffected_answers_to_a_new_index(tmp_path):
+    path = str(tmp_path / "warm_cache.json")
+    gst = dict(ANSWER, dependencies={"chunks": ["c1"], "sources": ["https://h/gst/"]})
+    payroll = dict(ANSWER, dependencies={"chunks": ["c2"], "sources": ["https://h/payroll/"]})
+    save_warm_cache(path, {"gst rates": gst, "payroll": payroll, "legacy": ANSWER}, "index-a")
+
+    changes_path = str(tmp_path / "index_changes.json")
+    save_index_changes(changes_path, "index-a", "index-b", changed=["https://h/gst/"], removed=[], added=[])
+    changes = read_index_changes(changes_path, "index-b", "index-a")
+    assert read_index_changes(changes_path, "index-c") is None
+    assert read_index_changes(changes_path, "index-b", "index-z") is None
+
+    cache = AnswerCache()
+    assert load_warm_cache(cache, path, "index-b", changes) == 1
+    assert cache.get("payroll") == ANSWER
+    assert cache.dependents(chunk_ids=["c2"]) == {"payroll"}
+    assert cache.get("gst rates") is None
+    assert cache.get("legacy") is None
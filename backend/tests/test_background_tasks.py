@@ -0,0 +1,20 @@
+import asyncio
+
+import server
+
+
+async def fail():
+    raise RuntimeError("swap failed")
+
+
+def test_background_tasks_are_held_until_done(capsys):
+    async def run():
+        task = server.start_background_task(fail(), name="index-swap-1")
+        assert task in server.background_tasks
+        await asyncio.gather(task, return_exceptions=True)
+        await asyncio.sleep(0)  # done callbacks run on the next loop iteration
+        return task
+
+    task = asyncio.run(run())
+    assert task not in server.background_tasks
+    assert "index-swap-1 failed: RuntimeError('swap failed')" in capsys.readouterr().out
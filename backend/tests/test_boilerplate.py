@@ -0,0 +1,54 @@
+from boilerplate import find_boilerplate, strip_boilerplate
+
+
+def _page(i, body):
+    return {"url": f"https://help.tallysolutions.com/page-{i}", "content": body}
+
+
+def _corpus(n=12):
+    docs = []
+    for i in range(n):
+        docs.append(_page(i, "\n".join([
+            f"Topic {i} explains one feature of the product in some detail.",
+            "Gateway of Tally > Display More Reports > Reorder Status",
+            "Gateway of Tally",
+            "Press",
+            "Ctrl+A",
+            f"Step {i}: fill in the details for this screen and save.",
+            "Was this helpful?",
+        ])))
+    return docs
+
+
+def test_repeated_sentence_is_stripped():
+    docs, report = strip_boilerplate(_corpus())
+    assert "was this helpful?" in report["boilerplate_lines"]
+    assert all("Was this helpful?" not in d["content"] for d in docs)
+    assert report["bytes_removed"] > 0
+
+
+def test_shared_menu_path_line_survives():
+    docs, report = strip_boilerplate(_corpus())
+    for doc in docs:
+        assert "Gateway of Tally > Display More Reports > Reorder Status" in doc["content"]
+    assert not any(">" in line for line in report["boilerplate_lines"])
+
+
+def test_inline_fragments_are_not_candidates():
+    lines, _ = find_boilerplate([d["content"] for d in _corpus()])
+    assert "gateway of tally" not in lines
+    assert "press" not in lines
+    assert "ctrl+a" not in lines
+
+
+def test_repeated_short_line_block_is_stripped():
+    docs = [_page(i, f"Body text number {i} for this page.\nHome\nProducts\nSupport") for i in range(10)]
+    docs, report = strip_boilerplate(docs)
+    assert report["boilerplate_blocks"] == ["home\nproducts\nsupport"]
+    assert docs[0]["content"] == "Body text number 0 for this page."
+
+
+def test_small_corpus_is_left_alone():
+    docs = [_page(i, "Was this helpful?") for i in range(3)]
+    docs, report = strip_boilerplate(docs)
+    assert report["bytes_removed"] == 0
@@ -0,0 +1,59 @@
+from langchain_core.documents import Document
+
+from context_compressor import ContextCompressor
+from query_embedder import MicroBatchEmbedder
+
+VOCAB = ["reorder", "stock", "company", "gst"]
+
+
+class KeywordEmbeddings:
+    """One dimension per vocabulary word; records every call it gets."""
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(word in t.lower()) for word in VOCAB] + [0.1] for t in texts]
+
+
+def _compressor():
+    model = KeywordEmbeddings()
+    embedder = MicroBatchEmbedder(model, max_batch=8, max_wait_ms=1, torch_threads=0)
+    return ContextCompressor(embedder), embedder, model
+
+
+def test_sentences_are_embedded_through_the_batcher():
+    compressor, embedder, model = _compressor()
+    doc = Document(page_content=(
+        "Set reorder levels on the stock item. Companies are created once. "
+        "GST rates live on the ledger. The reorder report lists shortfalls."
+    ))
+    docs, stats = compressor.compress([doc], [1.0, 0, 0, 0, 0])
+
+    assert embedder.info()["queries"] == 4
+    assert sum(len(call) for call in model.calls) == 4
+    assert "reorder levels" in docs[0].page_content
+    assert "GST" not in docs[0].page_content
+    assert stats["units_kept"] < stats["units_total"]
+
+
+def test_cached_sentences_are_not_embedded_again():
+    compressor, embedder, _ = _compressor()
+    doc = Document(page_content="Reorder levels. Stock items. Company setup.")
+    compressor.compress([doc], [1.0, 0, 0, 0, 0])
+    compressor.compress([doc], [0, 1.0, 0, 0, 0])
+    assert embedder.info()["queries"] == 3
+
+
+def test_step_runs_are_kept_whole():
+    compressor, _, _ = _compressor()
+    doc = Document(page_content="\n".join([
+        "To set a reorder level:",
+        "1. Open the stock item.",
+        "2. Enable the option.",
+        "3. Save.",
+        "GST is configured elsewhere.",
+    ]))
+    docs, _ = compressor.compress([doc], [1.0, 0, 0, 0, 0])
+    assert "3. Save." in docs[0].page_content
@@ -0,0 +1,58 @@
+from context_store import ContextStore
+from qa_system import TallyQASystem
+
+
+class FakeLLM:
+
+    def __init__(self):
+        self.calls = []
+
+    def complete(self, context, question, system_prompt=None, max_tokens=None, **kwargs):
+        self.calls.append((context, question, max_tokens))
+        return "SHORT_ANSWER: Short.\nLONG_ANSWER: Long answer.", {"output_tokens": 5}
+
+
+def make_qa():
+    qa = TallyQASystem()  # the embedding model loads lazily
+    qa.llm = FakeLLM()
+    return qa
+
+
+def test_put_and_get():
+    store = ContextStore()
+    answer_id = store.put({"context": "c"})
+    assert store.get(answer_id) == {"context": "c"}
+    assert store.get("missing") is None
+    assert store.info()["hits"] == 1
+    assert store.info()["misses"] == 1
+
+
+def test_entries_expire():
+    store = ContextStore(ttl=0)
+    answer_id = store.put({"context": "c"})
+    assert store.get(answer_id) is None
+
+
+def test_oldest_entry_is_evicted_at_maxsize():
+    store = ContextStore(maxsize=2)
+    first, second, third = (store.put({"n": n}) for n in range(3))
+    assert store.get(first) is None
+    assert store.get(second) == {"n": 1}
+    assert store.get(third) == {"n": 2}
+
+
+def test_ask_long_reuses_the_stored_context():
+    qa = make_qa()
+    answer_id = qa.contexts.put({"question": "q", "context": "packed context", "class": "procedural"})
+
+    result = qa.ask_long(answer_id)
+    assert result["long_answer"] == "Long answer."
+    assert result["stats"]["context_reused"] is True
+    assert qa.llm.calls == [("packed context", "q", 1024)]
+
+
+def test_ask_long_without_context_or_question_is_an_error():
+    qa = make_qa()
+    result = qa.ask_long("expired")
+    assert result["error"] is True
+    assert qa.llm.calls == []
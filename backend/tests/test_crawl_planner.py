@@ -0,0 +1,59 @@
+import gzip
+
+import crawl_planner
+from crawl_planner import CrawlPlanner, canonicalize_url, discover_sitemap_entries
+
+BASE = "https://help.tallysolutions.com"
+
+
+def test_canonical_variants_collapse():
+    variants = [
+        "https://help.tallysolutions.com/Create-Ledger/",
+        "https://HELP.tallysolutions.com/create-ledger",
+        "https://help.tallysolutions.com:443/create-ledger/#steps",
+        "https://help.tallysolutions.com/docs/../create-ledger/?utm_source=x&fbclid=1",
+    ]
+    assert {canonicalize_url(u) for u in variants} == {"https://help.tallysolutions.com/create-ledger/"}
+
+
+def test_query_is_sorted_and_files_stay_bare():
+    assert canonicalize_url(f"{BASE}/?s=gst&lang=en") == f"{BASE}/?lang=en&s=gst"
+    assert canonicalize_url(f"{BASE}/files/Guide.PDF") == f"{BASE}/files/guide.pdf"
+
+
+def test_frontier_order_and_duplicates():
+    planner = CrawlPlanner(is_allowed=lambda url: "erp9" not in url)
+    assert planner.add(f"{BASE}/found-while-crawling")
+    assert planner.add(f"{BASE}/old", lastmod=100, tier=crawl_planner.TIER_SITEMAP_DATED)
+    assert planner.add(f"{BASE}/undated", tier=crawl_planner.TIER_SITEMAP_DATED)
+    assert planner.add(f"{BASE}/new", lastmod=200, tier=crawl_planner.TIER_SITEMAP_DATED)
+    assert not planner.add(f"{BASE}/new/#top")
+    assert not planner.add(f"{BASE}/tally-erp9/")
+
+    order = [planner.pop() for _ in range(len(planner))]
+    assert order == [f"{BASE}/new/", f"{BASE}/old/", f"{BASE}/undated/", f"{BASE}/found-while-crawling/"]
+    assert planner.pop() is None
+
+
+def test_sitemap_index_is_followed(monkeypatch):
+    ns = 'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"'
+    bodies = {
+        f"{BASE}/robots.txt": f"User-agent: *\nSitemap: {BASE}/sitemap_index.xml\n".encode(),
+        f"{BASE}/sitemap_index.xml": (
+            f'<sitemapindex {ns}><sitemap><loc>{BASE}/pages.xml.gz</loc></sitemap>'
+            f'<sitemap><loc>{BASE}/sitemap_index.xml</loc></sitemap></sitemapindex>'
+        ).encode(),
+        f"{BASE}/pages.xml.gz": gzip.compress((
+            f'<urlset {ns}><url><loc>{BASE}/a/</loc><lastmod>2024-05-01T00:00:00Z</lastmod></url>'
+            f'<url><loc>{BASE}/b/</loc></url></urlset>'
+        ).encode()),
+    }
+
+    def fake_fetch(url):
+        body = bodies[url]
+        return gzip.decompress(body) if body[:2] == b"\x1f\x8b" else body
+
+    monkeypatch.setattr(crawl_planner, "_fetch", fake_fetch)
+    entries = list(discover_sitemap_entries(BASE))
+    assert [loc for loc, _ in entries] == [f"{BASE}/a/", f"{BASE}/b/"]
+    assert entries[0][1] is not None and entries[1][1] is None
@@ -0,0 +1,58 @@
+import threading
+
+import numpy as np
+
+from embedding_cache import CachedEmbeddings, EmbeddingCache, text_key
+
+
+class CountingEmbeddings:
+
+    def __init__(self):
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return [[float(len(t)), 1.0, 0.0] for t in texts]
+
+
+def test_round_trip_through_disk(tmp_path):
+    cache = EmbeddingCache("test-model", str(tmp_path))
+    cache.add(["a", "b"], np.array([[1, 2], [3, 4]], dtype=np.float32))
+
+    reopened = EmbeddingCache("test-model", str(tmp_path))
+    matrix, missing = reopened.lookup(["b", "c", "a"])
+    assert missing == [1]
+    assert matrix[0].tolist() == [3, 4]
+    assert matrix[2].tolist() == [1, 2]
+
+
+def test_only_new_texts_are_embedded(tmp_path):
+    model = CountingEmbeddings()
+    embeddings = CachedEmbeddings("test-model", str(tmp_path), embeddings=model)
+    embeddings.embed_documents(["one", "three"])
+    vectors = embeddings.embed_documents(["three", "fifteen"])
+    assert model.texts == ["one", "three", "fifteen"]
+    assert vectors == [[5.0, 1.0, 0.0], [7.0, 1.0, 0.0]]
+
+
+def test_lookup_while_adding(tmp_path):
+    cache = EmbeddingCache("test-model", str(tmp_path))
+    cache.add(["seed"], np.ones((1, 4), dtype=np.float32))
+    errors = []
+
+    def reader():
+        try:
+            for _ in range(300):
+                matrix, _ = cache.lookup(["seed"])
+                assert matrix[0].tolist() == [1, 1, 1, 1]
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=reader) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for i in range(100):
+        cache.add([text_key(str(i))], np.full((1, 4), i, dtype=np.float32))
+    for t in threads:
+        t.join()
+    assert errors == []
@@ -0,0 +1,76 @@
+from langchain_core.documents import Document
+
+from fallback_answer import NOTICE, FallbackMetrics, extractive_answer, find_nav_paths, find_shortcuts
+from qa_system import TallyQASystem
+
+
+def test_find_nav_paths():
+    text = "To record a payment, go to Gateway of Tally > Vouchers > press F5 (Payment). Enter the details."
+    assert find_nav_paths(text) == ["Gateway of Tally > Vouchers > F5 (Payment)"]
+    assert find_nav_paths("Profit > loss is not a menu path") == []
+
+
+def test_find_shortcuts():
+    assert find_shortcuts("Press Alt + F2 to change the period, or Ctrl+A to accept.") == ["Alt+F2", "Ctrl+A"]
+
+
+def test_extractive_answer():
+    docs = [
+        Document(page_content="Go to Gateway of Tally > Vouchers > press F5 (Payment).\nPress Ctrl+A to save.",
+                 metadata={"title": "Payment voucher"}),
+        Document(page_content="Bank details are entered in the ledger.", metadata={}),
+    ]
+    answer = extractive_answer(docs)
+
+    assert answer["nav_paths"] == ["Gateway of Tally > Vouchers > F5 (Payment)"]
+    assert "Ctrl+A" in answer["shortcuts"]
+    assert answer["short_answer"].startswith(NOTICE)
+    assert "Path: **Gateway of Tally > Vouchers > F5 (Payment)**" in answer["short_answer"]
+    assert "**Payment voucher**" in answer["long_answer"]
+    assert "**Documentation**" in answer["long_answer"]
+
+
+def test_headline_path_comes_from_the_lead_doc_only():
+    docs = [
+        Document(page_content="Bank details are entered in the ledger.", metadata={}),
+        Document(page_content="Go to Gateway of Tally > Vouchers > press F5 (Payment).", metadata={}),
+    ]
+    answer = extractive_answer(docs)
+    assert "Path:" not in answer["short_answer"]
+    assert answer["nav_paths"] == ["Gateway of Tally > Vouchers > F5 (Payment)"]
+
+
+def test_extractive_answer_without_docs():
+    assert extractive_answer([])["short_answer"] == NOTICE
+
+
+class FailingLLM:
+
+    def complete(self, context, question, **kwargs):
+        raise RuntimeError("overloaded")
+
+
+def test_ask_long_answers_from_the_stored_docs_when_the_llm_fails():
+    qa = TallyQASystem()
+    qa.llm = FailingLLM()
+    docs = [Document(page_content="Press Alt+F2 to change the period.", metadata={"title": "Period"})]
+    answer_id = qa.contexts.put({"question": "q", "context": "c", "class": "lookup", "docs": docs})
+
+    result = qa.ask_long(answer_id)
+    assert result["degraded"] is True
+    assert "Alt+F2" in result["long_answer"]
+    assert qa.fallback_metrics.snapshot()["reasons"] == {"llm_error": 1}
+
+
+def test_fallback_metrics():
+    metrics = FallbackMetrics()
+    metrics.record()
+    metrics.record("timeout")
+    metrics.record("circuit_open")
+    metrics.record()
+    assert metrics.snapshot() == {
+        "answers": 4,
+        "degraded": 2,
+        "rate": 0.5,
+        "reasons": {"timeout": 1, "circuit_open": 1},
+    }
@@ -0,0 +1,49 @@
+from html_extractor import extract_page
+
+FILLER = "This paragraph describes the feature in enough detail to be the article. " * 4
+
+ARTICLE_PAGE = f"""
+<html><head><title>Reorder Status</title></head><body>
+  <nav class="menu"><a href="/">Home</a></nav>
+  <main>
+    <h1>Reorder Status</h1>
+    <p>{FILLER}</p>
+    <p class="menu-path">Gateway of Tally &gt; <b>Display More Reports</b> &gt; Reorder Status</p>
+    <p>Press <kbd>Ctrl+A</kbd> to accept the screen.</p>
+    <div class="shared-note">This note is shared by several articles.</div>
+    <ul><li>First item</li><li>Second <em>item</em></li></ul>
+  </main>
+  <div class="sidebar"><p>Related articles</p></div>
+</body></html>
+"""
+
+PLAIN_PAGE = f"""
+<html><body>
+  <div class="sidebar"><p>{"Sidebar link text that goes on and on. " * 10}</p></div>
+  <div class="post">
+    <p>{FILLER}</p>
+    <p>{FILLER}</p>
+  </div>
+</body></html>
+"""
+
+
+def test_inline_markup_stays_on_one_line():
+    lines = extract_page(ARTICLE_PAGE)["content"].splitlines()
+    assert "Gateway of Tally > Display More Reports > Reorder Status" in lines
+    assert "Press Ctrl+A to accept the screen." in lines
+    assert "Second item" in lines
+
+
+def test_content_classes_inside_article_are_kept():
+    content = extract_page(ARTICLE_PAGE)["content"]
+    assert "Display More Reports" in content
+    assert "This note is shared by several articles." in content
+    assert "Related articles" not in content
+    assert "Home" not in content
+
+
+def test_hints_drop_chrome_without_marked_article():
+    content = extract_page(PLAIN_PAGE)["content"]
+    assert "Sidebar link text" not in content
+    assert "describes the feature" in content
@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from index_snapshot import SnapshotVectorStore, load_snapshot, write_snapshot
+
+IDS = ["c0", "c1", "c2", "c3"]
+TEXTS = ["GST rates on ledgers", "Payroll setup", "GST returns", "Payroll vouchers"]
+METADATAS = [
+    {"source": "https://h/gst-rates/", "title": "GST rates", "topic": "gst"},
+    {"source": "https://h/payroll/", "title": "Payroll", "topic": "payroll"},
+    {"source": "https://h/gst-returns/", "title": "GST returns", "topic": "gst"},
+    {"source": "https://h/payroll/", "title": "Payroll", "topic": "payroll", "page": 2},
+]
+VECTORS = np.array([[1, 0, 0], [0, 1, 0], [0.9, 0.1, 0], [0, 0.8, 0.2]], dtype=np.float32)
+PAGES = [
+    {"text": "GST rates summary", "metadata": {"source": "https://h/gst-rates/", "title": "GST rates", "topic": "gst"}},
+    {"text": "Payroll summary", "metadata": {"source": "https://h/payroll/", "title": "Payroll", "topic": "payroll"}},
+    {"text": "GST returns summary",
+     "metadata": {"source": "https://h/gst-returns/", "title": "GST returns", "topic": "gst"}},
+]
+PAGE_VECTORS = np.array([[1, 0, 0], [0, 1, 0], [0.8, 0.2, 0]], dtype=np.float32)
+
+
+class FixedEmbeddings:
+
+    def __init__(self, vector):
+        self.vector = vector
+
+    def embed_query(self, text):
+        return self.vector
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    path = str(tmp_path / "index.snap")
+    write_snapshot(path, IDS, TEXTS, METADATAS, VECTORS, {"embedding_model": "test-model", "index_key": "k1"},
+                   partition_key="topic", pages=PAGES, page_vectors=PAGE_VECTORS)
+    return path
+
+
+def test_round_trip(snapshot_path):
+    snapshot = load_snapshot(snapshot_path, verify=True)
+    assert len(snapshot) == 4
+    assert snapshot.manifest["index_key"] == "k1"
+    assert snapshot.manifest["embedding_model"] == "test-model"
+    assert snapshot.manifest["partitions"] == {"gst": [0, 2], "payroll": [2, 4]}
+
+    docs = {snapshot.ids[i]: snapshot.document(i) for i in range(len(snapshot))}
+    assert docs["c3"].page_content == "Payroll vouchers"
+    assert docs["c3"].metadata["page"] == "2"
+    assert docs["c1"].metadata["page"] == ""
+    row = [snapshot.ids[i] for i in range(4)].index("c2")
+    assert snapshot.vectors[row].tolist() == pytest.approx([0.9, 0.1, 0])
+
+
+def test_corruption_is_detected(snapshot_path):
+    with open(snapshot_path, "r+b") as f:
+        f.seek(-1, 2)
+        last = f.read(1)
+        f.seek(-1, 2)
+        f.write(bytes([last[0] ^ 0xFF]))
+    with pytest.raises(ValueError, match="checksum"):
+        load_snapshot(snapshot_path, verify=True)
+
+
+def test_not_a_snapshot(tmp_path):
+    path = tmp_path / "other.snap"
+    path.write_bytes(b"not a snapshot at all")
+    with pytest.raises(ValueError):
+        load_snapshot(str(path))
+
+
+def test_search_returns_nearest_first(snapshot_path):
+    store = SnapshotVectorStore(load_snapshot(snapshot_path), FixedEmbeddings([1.0, 0.0, 0.0]))
+    assert [d.id for d in store.similarity_search("gst", k=2)] == ["c0", "c2"]
+
+    results = store.similarity_search_with_score("gst", k=4)
+    assert [d.id for d, _ in results] == ["c0", "c2", "c3", "c1"]
+    assert [score for _, score in results] == pytest.approx([0.0, 0.02, 1.68, 2.0])
+
+
+def test_search_within_a_partition(snapshot_path):
+    store = SnapshotVectorStore(load_snapshot(snapshot_path), FixedEmbeddings([1.0, 0.0, 0.0]))
+    results = store.similarity_search_with_score("gst", k=2, filter={"topic": "payroll"})
+    assert [d.id for d, _ in results] == ["c3", "c1"]
+    assert [score for _, score in results] == pytest.approx([1.68, 2.0])
+    assert store.similarity_search("gst", k=2, filter={"topic": "unknown"}) == []
+
+
+def test_page_search_and_source_filter(snapshot_path):
+    store = SnapshotVectorStore(load_snapshot(snapshot_path), FixedEmbeddings([0.0, 1.0, 0.0]))
+    assert store.search_pages([0.0, 1.0, 0.0], m=1) == ["https://h/payroll/"]
+    assert store.search_pages([1.0, 0.0, 0.0], m=5, filter={"topic": "gst"}) == [
+        "https://h/gst-rates/", "https://h/gst-returns/",
+    ]
+
+    docs = store.similarity_search("payroll", k=5, filter={"source": {"$in": ["https://h/payroll/"]}})
+    assert sorted(d.id for d in docs) == ["c1", "c3"]
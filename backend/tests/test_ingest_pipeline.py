@@ -0,0 +1,66 @@
+import json
+
+from ingest_pipeline import Stage, build_stages
+
+
+def _docs_file(tmp_path, docs):
+    path = tmp_path / "docs.json"
+    path.write_text(json.dumps(docs), encoding="utf-8")
+    return str(path)
+
+
+DOCS = [{"url": f"https://help.tallysolutions.com/p{i}/", "title": f"Page {i}",
+         "content": f"Page {i} explains feature number {i} of the product.", "category": "TallyPrime"}
+        for i in range(3)]
+
+
+def test_key_depends_on_params_and_upstream(tmp_path):
+    root = Stage("root", lambda _: 1, {}, key="k1", cache_dir=str(tmp_path))
+    a = Stage("double", lambda x, factor: x * factor, {"factor": 2}, upstream=root, cache_dir=str(tmp_path))
+    same = Stage("double", lambda x, factor: x * factor, {"factor": 2}, upstream=root, cache_dir=str(tmp_path))
+    other = Stage("double", lambda x, factor: x * factor, {"factor": 3}, upstream=root, cache_dir=str(tmp_path))
+    moved = Stage("double", lambda x, factor: x * factor, {"factor": 2},
+                  upstream=Stage("root", lambda _: 1, {}, key="k2", cache_dir=str(tmp_path)),
+                  cache_dir=str(tmp_path))
+
+    assert a.key == same.key
+    assert len({a.key, other.key, moved.key}) == 3
+
+
+def test_cached_artifact_is_reused_unless_forced(tmp_path):
+    calls = []
+
+    def run(_, value):
+        calls.append(value)
+        return {"value": value}
+
+    first = Stage("step", run, {"value": 7}, key="fixed", cache_dir=str(tmp_path))
+    assert first.result() == {"value": 7}
+
+    again = Stage("step", run, {"value": 7}, key="fixed", cache_dir=str(tmp_path))
+    assert again.is_cached()
+    assert again.result() == {"value": 7}
+    assert calls == [7]
+
+    forced = Stage("step", run, {"value": 7}, key="fixed", cache_dir=str(tmp_path), force=True)
+    forced.result()
+    assert calls == [7, 7]
+
+
+def test_chunk_size_only_invalidates_downstream_stages(tmp_path):
+    docs_file = _docs_file(tmp_path, DOCS)
+    cache_dir = str(tmp_path / "cache")
+    before = build_stages(docs_file, chunk_size=1000, cache_dir=cache_dir)
+    after = build_stages(docs_file, chunk_size=800, cache_dir=cache_dir)
+
+    for name in ("crawl", "clean", "dedupe"):
+        assert before[name].key == after[name].key
+    for name in ("chunk", "embed"):
+        assert before[name].key != after[name].key
+
+
+def test_corpus_change_invalidates_every_stage(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    before = build_stages(_docs_file(tmp_path, DOCS), cache_dir=cache_dir)
+    after = build_stages(_docs_file(tmp_path, DOCS[:2]), cache_dir=cache_dir)
+    assert all(before[name].key != after[name].key for name in before)
@@ -0,0 +1,154 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import anthropic
+import pytest
+
+import llm_client
+from llm_client import CircuitBreaker, CircuitOpenError, LLMClient
+from stub_anthropic import DEFAULT_CONFIG, serve
+
+
+@pytest.fixture(scope="module")
+def stub():
+    server, state = serve(port=0)
+    yield server, state
+    server.shutdown()
+
+
+@pytest.fixture
+def llm(stub, monkeypatch):
+    server, state = stub
+    state.reset()
+    state.config.update(DEFAULT_CONFIG)
+    monkeypatch.setattr(llm_client, "BACKOFF_BASE", 0.01)
+    client = anthropic.Anthropic(
+        base_url=f"http://127.0.0.1:{server.server_address[1]}", api_key="stub", max_retries=0, timeout=5,
+    )
+    return LLMClient(client=client, hedging=False, max_retries=2), state
+
+
+# ------------------ THROUGH THE HTTP STUB ------------------
+
+def test_complete_streams_text_and_usage(llm):
+    client, state = llm
+    text, usage = client.complete("Context here", "How do I create a ledger?")
+
+    assert "SHORT_ANSWER:" in text
+    assert set(usage) == set(llm_client.USAGE_FIELDS)
+    assert usage["output_tokens"] > 0
+
+    payload, = state.requests
+    assert payload["stream"] is True
+    assert payload["system"][0]["cache_control"] == {"type": "ephemeral"}
+    assert payload["messages"][0]["content"].endswith("Question:\nHow do I create a ledger?")
+
+
+def test_server_errors_are_retried_then_raised(llm):
+    client, state = llm
+    state.config.update(error_rate=1.0, error_status=529)
+
+    with pytest.raises(anthropic.APIStatusError):
+        client.complete("c", "q")
+    assert len(state.requests) == 3
+    assert client.metrics()["counters"]["retries"] == 2
+
+
+def test_client_errors_are_not_retried(llm):
+    client, state = llm
+    state.config.update(error_rate=1.0, error_status=400)
+
+    with pytest.raises(anthropic.BadRequestError):
+        client.complete("c", "q")
+    assert len(state.requests) == 1
+    assert client.breaker.state == "closed"
+
+
+def test_breaker_opens_and_fails_fast(llm):
+    client, state = llm
+    client.breaker = CircuitBreaker(threshold=2, cooldown=60)
+    client.max_retries = 0
+    state.config.update(error_rate=1.0, error_status=500)
+
+    for _ in range(2):
+        with pytest.raises(anthropic.APIStatusError):
+            client.complete("c", "q")
+    sent = len(state.requests)
+    with pytest.raises(CircuitOpenError):
+        client.complete("c", "q")
+    assert len(state.requests) == sent
+    assert client.metrics()["breaker"]["state"] == "open"
+
+
+def test_deadline_raises_timeout(llm):
+    client, state = llm
+    state.config.update(ttft_delay=2.0)
+
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        client.complete("c", "q", deadline=0.3)
+    assert time.monotonic() - start < 1.5
+
+
+# ------------------ HEDGING (IN-PROCESS TRANSPORT) ------------------
+
+class FakeStream:
+
+    def __init__(self, text, delay):
+        self.text = text
+        self.delay = delay
+        self.closed = threading.Event()
+
+    def close(self):
+        self.closed.set()
+
+    def __iter__(self):
+        usage = SimpleNamespace(input_tokens=10, output_tokens=0,
+                                cache_creation_input_tokens=0, cache_read_input_tokens=0)
+        yield SimpleNamespace(type="message_start", message=SimpleNamespace(usage=usage))
+        if self.closed.wait(self.delay):
+            return
+        yield SimpleNamespace(type="content_block_delta", delta=SimpleNamespace(type="text_delta", text=self.text))
+        yield SimpleNamespace(type="message_delta", usage=SimpleNamespace(output_tokens=3))
+
+
+class FakeClient:
+    """messages.create(stream=True) returning scripted (text, delay) streams."""
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.streams = []
+        self.messages = self
+
+    def create(self, stream=False, **request):
+        text, delay = self.script.pop(0)
+        self.streams.append(FakeStream(text, delay))
+        return self.streams[-1]
+
+
+def test_hedge_wins_over_slow_primary():
+    fake = FakeClient([("slow", 5.0), ("fast", 0.0)])
+    client = LLMClient(client=fake, hedging=True, max_retries=0)
+    client.hedge_delay = lambda: 0.05
+
+    start = time.monotonic()
+    text, usage = client.complete("c", "q", deadline=3)
+
+    assert text == "fast"
+    assert usage["output_tokens"] == 3
+    assert time.monotonic() - start < 1.0
+    assert fake.streams[0].closed.is_set()
+    counters = client.metrics()["counters"]
+    assert counters["hedges_fired"] == 1
+    assert counters["hedges_won"] == 1
+
+
+def test_no_hedge_when_primary_is_fast():
+    fake = FakeClient([("primary", 0.0)])
+    client = LLMClient(client=fake, hedging=True, max_retries=0)
+    client.hedge_delay = lambda: 1.0
+
+    assert client.complete("c", "q")[0] == "primary"
+    assert len(fake.streams) == 1
+    assert "hedges_fired" not in client.metrics()["counters"]
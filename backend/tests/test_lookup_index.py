@@ -0,0 +1,80 @@
+from lookup_index import LookupIndex, build_lookup_table, extract_entries, lookup_answer
+
+
+def _doc(i, content, title="Budgets"):
+    return {"url": f"https://help.tallysolutions.com/budget-{i}", "title": title, "content": content}
+
+
+FRAGMENTED = _doc(0, "\n".join([
+    "To create a budget, press",
+    "Alt+G",
+    "(Go To)",
+    ">",
+    "Create Master",
+    ">",
+    "Budget.",
+    "",
+    "Press",
+    "Alt+C",
+    "(Create)",
+    "to add a new master.",
+]))
+
+
+def _values(entries, kind):
+    return {value for k, value, *_ in entries if k == kind}
+
+
+def test_paths_and_shortcuts_are_extracted_across_line_breaks():
+    entries = extract_entries(FRAGMENTED)
+    assert _values(entries, "path") == {"Alt+G (Go To) > Create Master > Budget"}
+    shortcuts = {(value, label) for kind, value, label, *_ in entries if kind == "shortcut"}
+    assert ("Alt+G", "Go To") in shortcuts
+    assert ("Alt+C", "Create") in shortcuts
+
+
+def test_paragraph_breaks_end_a_sentence():
+    entries = extract_entries(_doc(1, "Gateway of Tally\n\n> Reports are listed here"))
+    assert _values(entries, "path") == set()
+
+
+def test_gst_form_is_indexed_with_its_context():
+    entries = extract_entries(_doc(2, "File GSTR-1 for outward supplies every month.", title="GST Returns"))
+    (kind, value, label, keywords, _), = [e for e in entries if e[0] == "form"]
+    assert value == "GSTR-1"
+    assert {"outward", "supplie", "month"} <= keywords
+
+
+def _index():
+    docs = [
+        _doc(0, "Gateway of Tally > Display More Reports > Reorder Status."),
+        _doc(1, "Gateway of Tally > Display More Reports > Reorder Status."),
+        _doc(2, "Press Alt+C (Create Master) to add a master in any report."),
+    ]
+    return LookupIndex(build_lookup_table(docs))
+
+
+def test_specific_question_is_answered():
+    index = _index()
+    entry, stats = index.match("Where is reorder status?")
+    assert entry["value"] == "Gateway of Tally > Display More Reports > Reorder Status"
+    assert stats["support"] == 2
+    answer = lookup_answer(entry)
+    assert answer["short_answer"].startswith("Go to **Gateway of Tally")
+    assert answer["dependencies"]["sources"] == [
+        "https://help.tallysolutions.com/budget-0",
+        "https://help.tallysolutions.com/budget-1",
+    ]
+
+
+def test_weak_match_falls_through():
+    index = _index()
+    assert index.match("keyboard shortcut for master") is None
+    assert index.info()["tried"] == 1
+    assert index.info()["answered"] == 0
+
+
+def test_non_lookup_question_is_not_tried():
+    index = _index()
+    assert index.match("Explain step by step how to configure reorder levels for all stock items") is None
+    assert index.info()["tried"] == 0
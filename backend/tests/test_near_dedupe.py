@@ -0,0 +1,42 @@
+from near_dedupe import cluster_near_duplicates, dedupe_near_duplicates
+
+ARTICLE = " ".join(
+    f"Step {i}: open the voucher screen, select the ledger and record the amount for entry {i}."
+    for i in range(40)
+)
+OTHER = " ".join(
+    f"Payroll item {i} is configured under pay heads with attendance type {i} and a calculation rule."
+    for i in range(40)
+)
+
+
+def _doc(url, content):
+    return {"url": url, "title": url, "content": content}
+
+
+def test_near_identical_pages_cluster():
+    texts = [ARTICLE, ARTICLE + " Was this helpful?", OTHER]
+    assert cluster_near_duplicates(texts) == [[0, 1]]
+
+
+def test_distinct_pages_do_not_cluster():
+    assert cluster_near_duplicates([ARTICLE, OTHER]) == []
+
+
+def test_article_url_is_kept_over_search_page():
+    docs = [
+        _doc("https://help.tallysolutions.com/?s=voucher", ARTICLE + " Search results"),
+        _doc("https://help.tallysolutions.com/voucher-entry/", ARTICLE),
+        _doc("https://help.tallysolutions.com/payroll/", OTHER),
+    ]
+    kept, clusters = dedupe_near_duplicates(docs)
+
+    assert [d["url"] for d in kept] == [
+        "https://help.tallysolutions.com/voucher-entry/",
+        "https://help.tallysolutions.com/payroll/",
+    ]
+    assert kept[0]["aliases"] == ["https://help.tallysolutions.com/?s=voucher"]
+    assert clusters == [{
+        "kept": "https://help.tallysolutions.com/voucher-entry/",
+        "aliases": ["https://help.tallysolutions.com/?s=voucher"],
+    }]
@@ -0,0 +1,40 @@
+import pytest
+
+from question_classifier import LOOKUP_MAX_WORDS, PROFILES, ClassMetrics, classify_question
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("What is the shortcut for day book?", "lookup"),
+    ("Where is the GST rate setup screen?", "lookup"),
+    ("Which form is used for TDS returns?", "lookup"),
+    ("How do I create a sales voucher?", "procedural"),
+    ("Steps to reconcile a bank statement", "procedural"),
+    ("What is reverse charge mechanism?", "conceptual"),
+    ("Difference between a group and a ledger", "conceptual"),
+])
+def test_classify_question(question, expected):
+    assert classify_question(question) == expected
+
+
+def test_long_lookup_wording_is_not_a_lookup():
+    question = "Where is the option " + "really " * LOOKUP_MAX_WORDS + "hidden?"
+    assert classify_question(question) == "conceptual"
+
+
+def test_every_class_has_a_profile():
+    for question_class in ("lookup", "conceptual", "procedural"):
+        assert set(PROFILES[question_class]) == {"prompt", "context_chars", "max_tokens"}
+    assert PROFILES["lookup"]["max_tokens"] < PROFILES["procedural"]["max_tokens"]
+
+
+def test_class_metrics_snapshot():
+    metrics = ClassMetrics()
+    metrics.record("lookup", 0.2, {"input_tokens": 100, "output_tokens": 10})
+    metrics.record("lookup", 0.4, {"input_tokens": 200, "output_tokens": 30})
+    metrics.record("procedural", 1.0, None)
+
+    snapshot = metrics.snapshot()
+    assert snapshot["lookup"]["requests"] == 2
+    assert snapshot["lookup"]["latency_p50_s"] == pytest.approx(0.3)
+    assert snapshot["lookup"]["mean_tokens"] == {"input_tokens": 150.0, "output_tokens": 20.0}
+    assert snapshot["procedural"]["mean_tokens"] == {}
@@ -0,0 +1,39 @@
+import numpy as np
+
+from retrieval import choose_depth, mmr
+
+
+def test_few_candidates_are_all_kept():
+    assert choose_depth([0.1, 0.2], min_k=4) == (2, "all")
+
+
+def test_never_below_min_k():
+    assert choose_depth([0.1, 0.2, 1.5, 1.6, 1.7], min_k=2, max_distance=1.3) == (2, "min_k")
+
+
+def test_cut_at_max_distance():
+    distances = [0.1, 0.15, 0.2, 0.25, 1.5, 1.6]
+    assert choose_depth(distances, min_k=2, max_distance=1.3, min_gap=0.08) == (4, "threshold")
+
+
+def test_cut_at_largest_gap():
+    distances = [0.1, 0.12, 0.14, 0.5, 0.52, 0.54]
+    assert choose_depth(distances, min_k=2, max_distance=1.3, min_gap=0.08) == (3, "gap")
+
+
+def test_clamped_to_max_k():
+    distances = [0.1 + 0.01 * i for i in range(10)]
+    assert choose_depth(distances, min_k=2, max_k=5, max_distance=1.3, min_gap=0.08) == (5, "max_k")
+
+
+def test_mmr_edge_cases():
+    vectors = np.eye(3, dtype=np.float32)
+    assert mmr([1, 0, 0], vectors, 0) == []
+    assert mmr([1, 0, 0], np.zeros((0, 3), dtype=np.float32), 3) == []
+    assert sorted(mmr([1, 0, 0], vectors, 10)) == [0, 1, 2]
+
+
+def test_mmr_trades_relevance_for_diversity():
+    vectors = np.array([[1, 0, 0], [0.99, 0.01, 0], [0.7, 0.7, 0]], dtype=np.float32)
+    assert mmr([1, 0, 0], vectors, 3, lambda_mult=1.0) == [0, 1, 2]
+    assert mmr([1, 0, 0], vectors, 2, lambda_mult=0.3) == [0, 2]
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from index_snapshot import SnapshotVectorStore, load_snapshot, write_snapshot
+from qa_system import TallyQASystem
+
+GST = [[1, 0, 0], [0.95, 0.31, 0], [0.95, 0, 0.31], [0.9, 0.3, 0.3]]
+PAYROLL = [[0, 1, 0], [0, 0.9, 0.44]]
+
+
+def unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+@pytest.fixture
+def store(tmp_path):
+    ids = [f"gst{i}" for i in range(len(GST))] + [f"payroll{i}" for i in range(len(PAYROLL))]
+    topics = ["gst"] * len(GST) + ["payroll"] * len(PAYROLL)
+    metadatas = [{"source": f"https://h/{id_}/", "title": id_, "topic": t} for id_, t in zip(ids, topics)]
+    vectors = np.array([unit(v) for v in GST + PAYROLL])
+    path = str(tmp_path / "index.snap")
+    write_snapshot(path, ids, ids, metadatas, vectors, {"index_key": "k"}, partition_key="topic")
+    return SnapshotVectorStore(load_snapshot(path), None)
+
+
+def test_irrelevant_partition_falls_back_to_the_global_index(store):
+    docs, stats = TallyQASystem()._routed_retrieve(store, unit([1, 0, 0]), ["payroll"])
+    assert stats["fallback"] is True
+    assert docs
+    assert all(d.id.startswith("gst") for d in docs)
+
+
+def test_short_partition_is_topped_up_after_its_own_hits(store):
+    docs, stats = TallyQASystem()._routed_retrieve(store, unit([0.3, 0.95, 0]), ["payroll"])
+    assert stats["fallback"] is True
+    assert sorted(d.id for d in docs[:2]) == ["payroll0", "payroll1"]
+    assert len(docs) > 2
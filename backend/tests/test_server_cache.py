@@ -0,0 +1,46 @@
+import pytest
+
+import server
+
+SOURCES = [{"title": "Payment", "source": "https://h/payment/"}]
+
+
+class FakeQA:
+
+    def __init__(self, result):
+        self.result = result
+        self.calls = 0
+
+    def ask(self, question, short_only=False):
+        self.calls += 1
+        return dict(self.result, dependencies={"chunks": ["c1"], "sources": ["https://h/payment/"]})
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setattr(server, "answer_cache", server.AnswerCache())
+    return server.answer_cache
+
+
+@pytest.mark.parametrize("result", [
+    {"short_answer": "An internal error occurred.", "long_answer": "boom", "sources": []},
+    {"short_answer": "No relevant documentation found.", "long_answer": "", "sources": []},
+    {"short_answer": "Quick answer", "long_answer": "", "sources": SOURCES, "degraded": True},
+])
+def test_unusable_answers_are_not_cached(monkeypatch, cache, result):
+    qa = FakeQA(result)
+    monkeypatch.setattr(server, "qa_system", qa)
+    server.cached_ask("How to record a payment?")
+    server.cached_ask("How to record a payment?")
+    assert qa.calls == 2
+    assert len(cache) == 0
+
+
+def test_answers_are_cached_with_their_dependencies(monkeypatch, cache):
+    qa = FakeQA({"short_answer": "Press F5.", "long_answer": "Press F5.", "sources": SOURCES})
+    monkeypatch.setattr(server, "qa_system", qa)
+    first = server.cached_ask("How to record a payment?")
+    assert "dependencies" not in first
+    assert server.cached_ask("how to record a payment? ") is first
+    assert qa.calls == 1
+    assert cache.dependents(chunk_ids=["c1"]) == {"how to record a payment?"}
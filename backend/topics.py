@@ -0,0 +1,48 @@
+"""
+topics.py
+Topic partitions shared by the ingest pipeline and the query router.
+
+At build time every page gets one topic (from its category, title and URL),
+stored on its chunks as the "topic" metadata field; the snapshot keeps each
+topic's rows contiguous and Chroma filters on the field. At query time the
+question's keywords pick the partition(s) to search.
+"""
+GENERAL = "general"
+
+# Question keywords -> topic partition(s) to search
+QUERY_TOPICS = {
+    "gst": ["gst", "gstr", "tax", "rcm"],
+    "security": ["security", "user", "permission"],
+    "inventory": ["inventory", "stock", "reorder"],
+}
+
+# Page title / URL / category keywords -> topic. Broader than QUERY_TOPICS
+# because page names use the specific feature ("e-way bill", "godown").
+PAGE_TOPICS = {
+    "gst": ["gst", "gstr", "rcm", "e-way", "eway", "e-invoice", "einvoice", "tds", "tcs", "tax"],
+    "security": ["security", "user", "permission", "password", "access", "tallyvault", "audit"],
+    "inventory": ["inventory", "stock", "reorder", "godown", "batch", "bill-of-material", "bom",
+                  "manufactur", "job-work"],
+}
+
+
+def classify_topics(question):
+    """Topics whose keywords appear in the question, in QUERY_TOPICS order."""
+    q = question.lower()
+    return [
+        topic for topic, keywords in QUERY_TOPICS.items()
+        if any(k in q for k in keywords)
+    ]
+
+
+def page_topic(doc, rules=PAGE_TOPICS):
+    """Single topic for a page: the one with the most keyword hits in its
+    category, title and URL path (ties go to the earlier topic)."""
+    text = " ".join([doc.get("category", ""), doc.get("title", ""), doc.get("url", "")]).lower()
+
+    best, best_hits = GENERAL, 0
+    for topic, keywords in rules.items():
+        hits = sum(text.count(k) for k in keywords)
+        if hits > best_hits:
+            best, best_hits = topic, hits
+    return best
@@ -1,53 +1,11 @@
 import json
-import requests
-from bs4 import BeautifulSoup
-import html2text
 import os
-from datetime import datetime
+
+from html_extractor import scrape_tally_url as extract_tally_url
 
 def scrape_tally_url(url):
     """Scrape content from Tally help URL"""
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Remove navigation, header, footer elements
-        for element in soup(['nav', 'header', 'footer', 'script', 'style']):
-            element.decompose()
-        
-        # Convert to markdown
-        h = html2text.HTML2Text()
-        h.ignore_links = False
-        h.ignore_images = True
-        h.ignore_emphasis = False
-        h.body_width = 0
-        
-        content = h.handle(str(soup))
-        
-        # Get title
-        title = soup.find('title')
-        if title:
-            title = title.get_text().strip()
-        else:
-            title = "Security and User Permissions Setup"
-            
-        return {
-            'title': title,
-            'content': content,
-            'url': url,
-            'category': 'Security',
-            'scraped_at': datetime.now().isoformat()
-        }
-        
-    except Exception as e:
-        print(f"Error scraping {url}: {e}")
-        return None
+    return extract_tally_url(url, category="Security", default_title="Security and User Permissions Setup")
 
 def update_security_content():
     """Replace old security content with new TallyPrime content"""
@@ -98,9 +56,9 @@ def main():
     if update_security_content():
         print("\n✅ Security content updated successfully!")
         print("🎯 Next steps:")
-        print("1. Stop the backend server (Ctrl+C)")
-        print("2. Delete the vector store: Remove-Item -Recurse -Force tally_chroma_db")
-        print("3. Restart the backend server")
+        print("1. Build the new index: python ingest_pipeline.py --output ./tally_chroma_db_new")
+        print("2. Swap it into the running server: POST /admin/index/swap (X-Admin-Token header)")
+        print("3. Check GET /admin/index until the swap reports 'swapped'")
         print("4. Test with questions about security and user permissions")
     else:
         print("❌ Failed to update security content")
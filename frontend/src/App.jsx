@@ -88,9 +88,10 @@ function TallyChatInterface({ brandConfig }) {
         try {
             // 2. Call backend
             const response = await axios.post(`${API_BASE}/ask`, {
-                question: userMsg
+                question: userMsg,
+                mode: 'short'
             });
-            const { short_answer, long_answer, sources, watch_video, video_links } = response.data;
+            const { short_answer, long_answer, answer_id, sources, watch_video, video_links } = response.data;
 
             // 3. Push ASSISTANT message (after response exists!)
             setMessages(prev => [
@@ -99,6 +100,9 @@ function TallyChatInterface({ brandConfig }) {
                     role: 'assistant',
                     shortAnswer: short_answer,
                     longAnswer: long_answer || null,
+                    answerId: answer_id || null,
+                    question: userMsg,
+                    loadingLong: false,
                     sources: dedupeSources(sources),
                     watchVideo: watch_video || false,
                     videoLinks: video_links || [],
@@ -125,6 +129,39 @@ function TallyChatInterface({ brandConfig }) {
         }
     };
 
+    // Short-first answers: the detailed answer is generated on first expand
+    const toggleLong = async (i) => {
+        const msg = messages[i];
+        if (msg.longAnswer || !msg.answerId) {
+            setMessages(prev =>
+                prev.map((m, idx) =>
+                    idx === i ? { ...m, showLong: !m.showLong } : m
+                )
+            );
+            return;
+        }
+        if (msg.loadingLong) return;
+
+        setMessages(prev =>
+            prev.map((m, idx) => idx === i ? { ...m, loadingLong: true } : m)
+        );
+        let longAnswer = "Could not load the detailed answer. Please try again.";
+        try {
+            const response = await axios.post(`${API_BASE}/ask/long`, {
+                answer_id: msg.answerId,
+                question: msg.question
+            });
+            if (!response.data.error) longAnswer = response.data.long_answer;
+        } catch (error) {
+            console.log("LONG ANSWER ERROR:", error);
+        }
+        setMessages(prev =>
+            prev.map((m, idx) =>
+                idx === i ? { ...m, longAnswer, loadingLong: false, showLong: true } : m
+            )
+        );
+    };
+
     return (
         <div className="min-h-screen flex flex-col items-center bg-bg-dark text-text-main font-sans selection:bg-blue-500/30">
             <div className="fixed inset-0 -z-10 bg-[radial-gradient(circle_at_top_right,_rgba(37,99,235,0.15),_transparent_px)] pointer-events-none" />
@@ -175,17 +212,12 @@ function TallyChatInterface({ brandConfig }) {
 
                                 {/* Buttons after short answer - show both if not expanded */}
                                 {msg.role === 'assistant' && !msg.showLong && 
-                                    (msg.longAnswer || msg.sources?.length > 0 || msg.watchVideo) && (
+                                    (msg.longAnswer || msg.answerId || msg.sources?.length > 0 || msg.watchVideo) && (
                                     <div className="flex gap-3 mt-4">
-                                        {msg.longAnswer && (
+                                        {(msg.longAnswer || msg.answerId) && (
                                             <button
-                                                onClick={() =>
-                                                    setMessages(prev =>
-                                                        prev.map((m, idx) =>
-                                                            idx === i ? { ...m, showLong: !m.showLong } : m
-                                                        )
-                                                    )
-                                                }
+                                                onClick={() => toggleLong(i)}
+                                                disabled={msg.loadingLong}
                                                 className="
                                                     text-sm md:text-xs
                                                     px-4 py-2 md:px-3 md:py-1
@@ -195,7 +227,7 @@ function TallyChatInterface({ brandConfig }) {
                                                     transition-all
                                                 "
                                             >
-                                                Answer in Detail
+                                                {msg.loadingLong ? 'Loading Detail…' : 'Answer in Detail'}
                                             </button>
                                         )}
                                         